@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+# Compare merge_subtitle_lines against the array-based merge_subtitle_columns
+# on the longest episodes in the corpus, and check the chunks are identical.
+# "loop" times merge_subtitle_lines alone on prebuilt srt.Subtitle objects;
+# "loop+objs" also builds those objects, which the loop version needs and
+# the columnar version does not.
+#
+#   python bench_chunking.py [transcript_dir] [n_episodes]
+
+import os
+import sys
+import time
+from fast_srt import load_srt
+from chunk_transcripts import merge_subtitle_lines, merge_subtitle_columns
+from config import tscript_dir
+
+def best_of(fn, repeats=5):
+    """Return the fastest of several timed runs of fn()."""
+    best = float('inf')
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start_time)
+    return best
+
+def main():
+    directory = sys.argv[1] if len(sys.argv) > 1 else tscript_dir
+    n_episodes = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    files = [os.path.join(directory, f) for f in os.listdir(directory) if f.endswith('.srt')]
+    if not files:
+        print(f"No .srt files found in {directory}")
+        return
+
+    transcripts = [(path, load_srt(path, cache_dir=None)[0]) for path in files]
+    transcripts.sort(key=lambda item: len(item[1]), reverse=True)
+    transcripts = transcripts[:n_episodes]
+
+    print(f"{'episode':<40} {'lines':>7} {'loop ms':>9} {'loop+objs':>10} {'numpy ms':>9} {'speedup':>8}")
+    total_loop = total_objs = total_numpy = 0.0
+    for path, transcript in transcripts:
+        subtitles = transcript.subtitles()
+        if merge_subtitle_lines(subtitles) != merge_subtitle_columns(transcript):
+            print(f"WARNING: chunks differ for {os.path.basename(path)}")
+        loop = best_of(lambda: merge_subtitle_lines(subtitles))
+        with_objects = best_of(lambda: merge_subtitle_lines(transcript.subtitles()))
+        vectorized = best_of(lambda: merge_subtitle_columns(transcript))
+        total_loop += loop
+        total_objs += with_objects
+        total_numpy += vectorized
+        print(f"{os.path.basename(path)[:40]:<40} {len(transcript):>7} {loop * 1000:>9.2f} "
+              f"{with_objects * 1000:>10.2f} {vectorized * 1000:>9.2f} {with_objects / vectorized:>7.1f}x")
+
+    print(f"\nTotal: loop {total_loop * 1000:.1f} ms, loop+objs {total_objs * 1000:.1f} ms, "
+          f"numpy {total_numpy * 1000:.1f} ms ({total_objs / total_numpy:.1f}x)")
+
+if __name__ == "__main__":
+    main()
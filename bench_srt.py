@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+# Compare the columnar SRT reader in fast_srt against srt.parse on the
+# transcript corpus, and check that both produce the same subtitles.
+#
+#   python bench_srt.py [transcript_dir]
+
+import os
+import sys
+import time
+import tempfile
+from datetime import timedelta
+import srt
+from fast_srt import parse_srt_columns, load_srt
+from config import tscript_dir
+
+def timed(label, fn, files):
+    start_time = time.perf_counter()
+    n_lines = 0
+    for path in files:
+        n_lines += fn(path)
+    elapsed = time.perf_counter() - start_time
+    print(f"{label:<28} {elapsed:8.3f}s  {n_lines / elapsed:12,.0f} lines/sec")
+    return elapsed
+
+def read_text(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def check_identical(path):
+    """Return True if fast_srt and srt.parse agree on every subtitle in the file."""
+    content = read_text(path)
+    expected = [(s.index, s.start // timedelta(milliseconds=1), s.end // timedelta(milliseconds=1), s.content)
+                for s in srt.parse(content)]
+    columns = parse_srt_columns(content)
+    actual = list(zip(columns.index.tolist(), columns.start_ms.tolist(),
+                      columns.end_ms.tolist(), columns.contents()))
+    return expected == actual
+
+def main():
+    directory = sys.argv[1] if len(sys.argv) > 1 else tscript_dir
+    files = sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.endswith('.srt'))
+    if not files:
+        print(f"No .srt files found in {directory}")
+        return
+    total_bytes = sum(os.path.getsize(path) for path in files)
+    print(f"Benchmarking {len(files)} transcripts ({total_bytes / 1e6:.1f} MB)\n")
+
+    mismatched = [path for path in files if not check_identical(path)]
+    if mismatched:
+        print(f"WARNING: {len(mismatched)} files parse differently:")
+        for path in mismatched:
+            print(f" - {os.path.basename(path)}")
+        print()
+
+    baseline = timed("srt.parse", lambda path: len(list(srt.parse(read_text(path)))), files)
+    parse = timed("fast_srt parse", lambda path: len(parse_srt_columns(read_text(path))), files)
+
+    with tempfile.TemporaryDirectory(prefix='srt_cache_') as cache_dir:
+        cold = timed("fast_srt cache (cold)", lambda path: len(load_srt(path, cache_dir)[0]), files)
+        warm = timed("fast_srt cache (mmap)", lambda path: len(load_srt(path, cache_dir)[0]), files)
+
+    print(f"\nSpeedup over srt.parse: parse {baseline / parse:.1f}x, "
+          f"cold cache {baseline / cold:.1f}x, warm cache {baseline / warm:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,10 @@
 
 import os
 import json
-import srt
-from datetime import datetime
+from datetime import datetime, timedelta
 import openai
 from dotenv import load_dotenv
+from fast_srt import load_srt
 from config import tscript_dir, pod_prefix
 import sys
 
@@ -118,15 +118,15 @@ def process_transcript_file(client, filepath, output_dir):
     print(f"Processing: {metadata['title']}")
     
     # Read and parse the SRT file
-    with open(filepath, 'r') as f:
-        try:
-            subtitles = list(srt.parse(f))
-        except Exception as e:
-            print(f"Error parsing {filename}: {e}")
-            return
+    try:
+        transcript, _ = load_srt(filepath)
+    except Exception as e:
+        print(f"Error parsing {filename}: {e}")
+        return
+    contents = transcript.contents()
     
     # Process the entire transcript at once
-    transcript_text = "\n".join(sub.content for sub in subtitles)
+    transcript_text = "\n".join(contents)
     
     # Get suggestions for the transcript
     suggestions = check_transcript(client, transcript_text, metadata)
@@ -135,10 +135,10 @@ def process_transcript_file(client, filepath, output_dir):
     for suggestion in suggestions:
         original_text = suggestion['original_text']
         # Find the subtitle entry containing this text
-        for subtitle in subtitles:
-            if original_text in subtitle.content:
-                suggestion['start_time'] = str(subtitle.start)
-                suggestion['end_time'] = str(subtitle.end)
+        for i, content in enumerate(contents):
+            if original_text in content:
+                suggestion['start_time'] = str(timedelta(milliseconds=int(transcript.start_ms[i])))
+                suggestion['end_time'] = str(timedelta(milliseconds=int(transcript.end_ms[i])))
                 break
     
     # Save suggestions if any were found
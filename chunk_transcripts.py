@@ -2,10 +2,28 @@
 
 import os
 import re
+import time
+import argparse
+import functools
 import srt
+import numpy as np
 from datetime import timedelta
-from libPodSemSearch import get_db_connection
-from config import tscript_dir
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from fast_srt import load_srt, ms_to_srt_timestamps
+from libPodSemSearch import get_episode_records, mark_stages, episode_basename
+from config import (
+    tscript_dir,
+    max_tokens,
+    CHUNK_WORKERS,
+    CHUNK_STRATEGY,
+    CHUNK_TARGET_TOKENS,
+    CHUNK_OVERLAP_TOKENS,
+    EMBEDDING_MODEL,
+)
+
+# [CLS] and [SEP], which the embedding model adds to every chunk
+SPECIAL_TOKENS = 2
 
 def merge_subtitle_lines(subtitles, target_chunk_size=500, max_chunk_size=800):
     """
@@ -76,83 +94,332 @@ def merge_subtitle_lines(subtitles, target_chunk_size=500, max_chunk_size=800):
     
     return chunks
 
-def process_transcripts():
-    """Process all transcript files into chunks with metadata."""
-    connection = get_db_connection()
-    cursor = connection.cursor()
+# Characters str.rstrip() treats as whitespace, and the sentence-ending
+# punctuation merge_subtitle_lines looks for, as byte values
+IS_WHITESPACE = np.zeros(256, dtype=bool)
+IS_WHITESPACE[list(b' \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f')] = True
+IS_SENTENCE_END = np.zeros(256, dtype=bool)
+IS_SENTENCE_END[list(b'.!?')] = True
+
+def next_true(mask):
+    """For each position, the index of the first True at or after it (len(mask) if none)."""
+    n = len(mask)
+    positions = np.where(mask, np.arange(n), n)
+    return np.append(np.minimum.accumulate(positions[::-1])[::-1], n)
+
+def merge_subtitle_columns(transcript, target_chunk_size=500, max_chunk_size=800,
+                           sizes=None, hard_max=False, overlap=0):
+    """
+    Array-based equivalent of merge_subtitle_lines for fast_srt columns.
+
+    With the default arguments it produces exactly the same chunks.
+    Cumulative sizes, the gap after each subtitle and a sentence-end mask
+    are computed in bulk, and from them the end a chunk would have if it
+    started at any subtitle. The only per-chunk Python work left is
+    following those ends and building the chunk dicts.
+
+    Parameters beyond merge_subtitle_lines:
+    - sizes: Per-subtitle sizes to chunk by, e.g. token counts (default: characters)
+    - hard_max: Break before the subtitle that would take a chunk past
+      max_chunk_size, instead of after it
+    - overlap: Start each chunk with up to this much (in sizes units) of
+      the end of the previous one
+    """
+    n = len(transcript)
+    if n == 0:
+        return []
+    contents = transcript.contents()
+    start_ms = np.asarray(transcript.start_ms)
+    end_ms = np.asarray(transcript.end_ms)
+    offsets = np.asarray(transcript.offsets)
+    text = np.frombuffer(transcript.text, dtype=np.uint8)
+
+    if not (text >= 0x80).any():
+        # ASCII transcript: bytes are characters, so lengths and each
+        # subtitle's last character come straight from the buffer
+        cum_chars = offsets[1:] - offsets[0]
+        nonempty = offsets[1:] > offsets[:-1]
+        last_byte = np.append(text, 0)[np.where(nonempty, offsets[1:] - 1, len(text))]
+        sentence_end = nonempty & IS_SENTENCE_END[last_byte]
+        # Only subtitles with trailing whitespace need rstrip() to find their last character
+        for i in np.flatnonzero(nonempty & IS_WHITESPACE[last_byte]).tolist():
+            sentence_end[i] = contents[i].rstrip().endswith(('.', '!', '?'))
+    else:
+        cum_chars = np.cumsum(np.fromiter(map(len, contents), dtype=np.int64, count=n))
+        sentence_end = np.fromiter((c.rstrip().endswith(('.', '!', '?')) for c in contents), dtype=bool, count=n)
+    # Pause before the next subtitle; the last subtitle has nothing after it
+    gaps = np.zeros(n, dtype=np.int64)
+    gaps[:-1] = start_ms[1:] - end_ms[:-1]
+
+    if sizes is None:
+        cum_size = cum_chars
+    else:
+        cum_size = np.cumsum(np.asarray(sizes, dtype=np.int64))
+
+    # Size before each possible chunk start, and the first subtitles at
+    # which a chunk starting there reaches the target and max sizes
+    base = np.concatenate(([0], cum_size[:-1]))
+    position = np.arange(n)
+    at_target = np.maximum(np.searchsorted(cum_size, base + target_chunk_size), position)
+    if hard_max:
+        # First subtitle that would go past the limit
+        at_max = np.maximum(np.searchsorted(cum_size, base + max_chunk_size, side='right'), position)
+    else:
+        at_max = np.maximum(np.searchsorted(cum_size, base + max_chunk_size), position)
+
+    # 3. Long pause (> 4 seconds) while still under the target size
+    long_pause = next_true(gaps > 4000)[:n]
+    # 2. Sentence end or pause (> 2 seconds) once the target size is reached
+    soft_break = next_true(sentence_end | (gaps > 2000))[at_target]
+    # 1. Otherwise the max size forces a break (or the transcript ends)
+    if hard_max:
+        chunk_end = np.minimum(np.maximum(at_max - 1, position), n - 1)
+    else:
+        chunk_end = np.minimum(at_max, n - 1)
+    chunk_end = np.where(soft_break < at_max, soft_break, chunk_end)
+    chunk_end = np.where(long_pause < at_target, long_pause, chunk_end).tolist()
+
+    # Where the next chunk starts after one ending at each subtitle: the
+    # earliest subtitle such that it and those after it fit in the overlap
+    if overlap:
+        next_first = np.searchsorted(base, cum_size - overlap).tolist()
+    else:
+        next_first = (position + 1).tolist()
+
+    firsts = []
+    lasts = []
+    first = 0
+    while first < n:
+        last = chunk_end[first]
+        firsts.append(first)
+        lasts.append(last)
+        if last == n - 1:
+            break
+        # Always move forward, even if one subtitle is bigger than the overlap,
+        # and drop the overlap if the new chunk would end where this one did
+        # (e.g. at a long pause), since it would only repeat this chunk's tail
+        first = max(next_first[last], first + 1)
+        if chunk_end[first] <= last:
+            first = last + 1
+
+    # Join the whole transcript once; each chunk's text is then one slice,
+    # since subtitle i starts at (characters before it) + (i separators)
+    joined = ' '.join(contents)
+    char_base = np.concatenate(([0], cum_chars[:-1]))
+    text_start = (char_base + position)[firsts].tolist()
+    text_end = (cum_chars + position)[lasts].tolist()
+
+    starts = ms_to_srt_timestamps(start_ms[firsts])
+    ends = ms_to_srt_timestamps(end_ms[lasts])
+    # timedelta64 arrays convert to datetime.timedelta objects in bulk
+    start_times = start_ms[firsts].astype('timedelta64[ms]').tolist()
+    end_times = end_ms[lasts].astype('timedelta64[ms]').tolist()
+    return [
+        {
+            'text': joined[text_start[i]:text_end[i]],
+            'start_time': start_times[i],
+            'end_time': end_times[i],
+            'start_timecode': starts[i],
+            'end_timecode': ends[i]
+        }
+        for i in range(len(firsts))
+    ]
+
+@functools.lru_cache(maxsize=None)
+def load_tokenizer(model=EMBEDDING_MODEL):
+    """Load (once per process) the embedding model's tokenizer, without truncation or padding."""
+    from tokenizers import Tokenizer
+    tokenizer = Tokenizer.from_pretrained(model)
+    tokenizer.no_truncation()
+    tokenizer.no_padding()
+    return tokenizer
+
+def count_tokens(texts, add_special_tokens=False, model=EMBEDDING_MODEL):
+    """Return the number of tokens in each text as an array."""
+    encodings = load_tokenizer(model).encode_batch(list(texts), add_special_tokens=add_special_tokens)
+    return np.fromiter((len(encoding.ids) for encoding in encodings), dtype=np.int64, count=len(encodings))
+
+def chunk_by_chars(transcript):
+    """The original character-based chunking: ~500 characters, 800 at most."""
+    return merge_subtitle_columns(transcript)
+
+def chunk_by_tokens(transcript):
+    """
+    Chunk by embedding-model tokens so no chunk is longer than the model
+    reads (max_tokens, less its [CLS]/[SEP] tokens), with
+    CHUNK_OVERLAP_TOKENS of context carried over between chunks.
+    """
+    if not len(transcript):
+        return []
+    # WordPiece splits on whitespace first, so subtitle token counts add up
+    sizes = count_tokens(transcript.contents())
+    return merge_subtitle_columns(transcript, CHUNK_TARGET_TOKENS, max_tokens - SPECIAL_TOKENS,
+                                  sizes=sizes, hard_max=True, overlap=CHUNK_OVERLAP_TOKENS)
+
+# Chunking strategies by name; each takes fast_srt columns and returns chunk dicts
+CHUNKING_STRATEGIES = {
+    'chars': chunk_by_chars,
+    'tokens': chunk_by_tokens,
+}
+
+def chunk_transcript(transcript, episode, strategy=CHUNK_STRATEGY):
+    """
+    Chunk one transcript, given as fast_srt columns.
+
+    Every chunk holds a reference to the same episode dict (filename, title,
+    description, url, date) rather than its own copy of the metadata.
+    """
+    chunks = CHUNKING_STRATEGIES[strategy](transcript)
+    for chunk in chunks:
+        chunk['episode'] = episode
+    return chunks
+
+def chunk_file(job):
+    """
+    Read and chunk one transcript file. Runs in a worker process, so it takes
+    a single picklable (filename, record, strategy) tuple and reports errors
+    instead of raising them.
+
+    Returns (episode, chunks, content_hash, seconds, error).
+    """
+    filename, (title, description, url, date), strategy = job
+    episode = {
+        'filename': filename,
+        'title': title,
+        'description': description,
+        'url': url,
+        'date': date,
+    }
+    start_time = time.monotonic()
+    try:
+        # Parse the SRT file (or map its compiled cache)
+        transcript, content_hash = load_srt(os.path.join(tscript_dir, filename))
+        # Create chunks from the subtitles
+        chunks = chunk_transcript(transcript, episode, strategy)
+    except Exception as e:
+        return episode, [], None, 0.0, str(e)
+    return episode, chunks, content_hash, time.monotonic() - start_time, None
+
+def ordered_map(executor, fn, items, window):
+    """
+    Like executor.map, but with at most `window` results in flight so a
+    slow consumer can't let finished episodes pile up in memory.
+    """
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def iter_transcript_chunks(workers=CHUNK_WORKERS, strategy=CHUNK_STRATEGY):
+    """
+    Yield (episode, chunks) for every transcript, one episode at a time.
+
+    Episode metadata is fetched in one query, then files are parsed and
+    chunked across a process pool. Episodes are yielded in sorted filename
+    order regardless of which worker finishes first, and only a small
+    window of episodes is held in memory at once.
+    """
+    records = get_episode_records()
+    
+    jobs = []
+    for filename in sorted(os.listdir(tscript_dir)):
+        if not filename.endswith('.srt'):
+            continue
+        record = records.get(filename)
+        if not record:
+            print(f"No database record found for {filename}")
+            continue
+        jobs.append((filename, record, strategy))
     
-    all_chunks = []
+    n_chunks = 0
     total_chars = 0
+    chunked_records = []
     
-    try:
-        # Process each transcript file
-        for filename in os.listdir(tscript_dir):
-            if not filename.endswith('.srt'):
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        window = 2 * (workers or os.cpu_count() or 1)
+        for episode, chunks, content_hash, seconds, error in ordered_map(executor, chunk_file, jobs, window):
+            filename = episode['filename']
+            if error:
+                print(f"Error parsing {filename}: {error}")
                 continue
             
-            # Get episode metadata from database
-            cursor.execute("""
-                SELECT title, description, url, date 
-                FROM episodes 
-                WHERE filename = %s
-            """, (filename,))
-            record = cursor.fetchone()
-            
-            if not record:
-                print(f"No database record found for {filename}")
-                continue
-            
-            title, description, url, date = record
-            print(f"Processing: {title}")
-            
-            # Parse the SRT file
-            with open(os.path.join(tscript_dir, filename), 'r') as f:
-                try:
-                    subtitles = list(srt.parse(f))
-                except Exception as e:
-                    print(f"Error parsing {filename}: {e}")
-                    continue
-            
-            # Create chunks from the subtitles
-            chunks = merge_subtitle_lines(subtitles)
-            
-            # Add metadata to each chunk
-            for chunk in chunks:
-                chunk.update({
-                    'title': title,
-                    'description': description,
-                    'url': url,
-                    'date': date,
-                    'filename': filename
-                })
-                total_chars += len(chunk['text'])
-                all_chunks.append(chunk)
-            
+            n_chunks += len(chunks)
+            total_chars += sum(len(chunk['text']) for chunk in chunks)
             print(f"Created {len(chunks)} chunks from {filename}")
+            chunked_records.append((episode_basename(filename), content_hash, seconds))
+            yield episode, chunks
     
-    finally:
-        cursor.close()
-        connection.close()
+    mark_stages(chunked_records, 'chunked')
     
     # Calculate and print statistics
-    if all_chunks:
-        avg_chunk_size = total_chars / len(all_chunks)
+    if n_chunks:
+        avg_chunk_size = total_chars / n_chunks
         print(f"\nChunking Statistics:")
-        print(f"Total chunks created: {len(all_chunks)}")
+        print(f"Total chunks created: {n_chunks}")
         print(f"Average chunk size: {avg_chunk_size:.1f} characters")
-    
-    return all_chunks
+
+def iter_chunks(workers=CHUNK_WORKERS, strategy=CHUNK_STRATEGY):
+    """Yield every chunk of every transcript as a flat stream."""
+    for episode, chunks in iter_transcript_chunks(workers, strategy):
+        yield from chunks
+
+def process_transcripts(workers=CHUNK_WORKERS, strategy=CHUNK_STRATEGY):
+    """Process all transcript files into a list of chunks with metadata."""
+    return list(iter_chunks(workers, strategy))
+
+def truncation_report(strategies=None, sample=None):
+    """
+    Chunk the transcripts with each strategy and report how much of each
+    strategy's text the embedding model would cut off at max_tokens.
+    """
+    strategies = strategies or list(CHUNKING_STRATEGIES)
+    files = sorted(f for f in os.listdir(tscript_dir) if f.endswith('.srt'))
+    if sample:
+        files = files[:sample]
+    transcripts = [load_srt(os.path.join(tscript_dir, filename))[0] for filename in files]
+    print(f"Truncation at {max_tokens} tokens ({EMBEDDING_MODEL}) over {len(files)} transcripts:\n")
+    print(f"{'strategy':<10} {'chunks':>8} {'avg tokens':>11} {'max tokens':>11} {'truncated':>10} {'tokens lost':>12}")
+
+    for strategy in strategies:
+        lengths = [count_tokens([chunk['text'] for chunk in CHUNKING_STRATEGIES[strategy](transcript)],
+                                add_special_tokens=True)
+                   for transcript in transcripts]
+        lengths = np.concatenate(lengths) if lengths else np.zeros(0, dtype=np.int64)
+        if not len(lengths):
+            print(f"{strategy:<10} {0:>8}")
+            continue
+        lost = np.maximum(lengths - max_tokens, 0)
+        print(f"{strategy:<10} {len(lengths):>8} {lengths.mean():>11.1f} {lengths.max():>11} "
+              f"{(lost > 0).mean():>9.1%} {lost.sum() / lengths.sum():>11.1%}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Chunk transcripts for semantic indexing')
+    parser.add_argument('--strategy', choices=sorted(CHUNKING_STRATEGIES), default=CHUNK_STRATEGY,
+                      help=f'Chunking strategy (default: {CHUNK_STRATEGY})')
+    parser.add_argument('--report', action='store_true',
+                      help='Compare the truncation rate of every strategy instead of chunking')
+    parser.add_argument('--sample', type=int,
+                      help='Only use the first N transcripts for --report')
+    return parser.parse_args()
 
 def main():
+    args = parse_args()
+    if args.report:
+        truncation_report(sample=args.sample)
+        return
+
     print("Starting transcript chunking process...")
-    chunks = process_transcripts()
+    chunks = process_transcripts(strategy=args.strategy)
     print(f"\nProcessed {len(chunks)} total chunks from all transcripts.")
     
     # Print a sample chunk for verification
     if chunks:
         print("\nSample chunk:")
         sample = chunks[0]
-        print(f"Title: {sample['title']}")
+        print(f"Title: {sample['episode']['title']}")
         print(f"Time: {sample['start_timecode']} --> {sample['end_timecode']}")
         print(f"Length: {len(sample['text'])} characters")
         print(f"Text: {sample['text']}")
@@ -10,11 +10,48 @@ tscript_dir=f'{pod_prefix}/transcripts'
 audio_dir = f'{pod_prefix}/audio'
 wav_dir = f'{pod_prefix}/wav'
 index_dir = f'{pod_prefix}/indexdir'
+feed_state_file = f'{pod_prefix}/feed_state.json'
+SRT_CACHE_DIR = f'{pod_prefix}/srt_cache'  # Compiled, memory-mappable transcripts keyed by file hash
+
+# FEEDS
+feed_stop_after_known = 5  # Consecutive known items before the streaming reader stops
+
+# CHUNKING
+CHUNK_WORKERS = None  # Processes used to parse and chunk transcripts (None uses every core)
+CHUNK_STRATEGY = 'chars'  # 'chars' uses the original 500/800 characters; 'tokens' sizes chunks to the embedding model (max_tokens)
+CHUNK_TARGET_TOKENS = 160  # Preferred chunk length; chunks end at the next sentence break after this
+CHUNK_OVERLAP_TOKENS = 32  # Tokens of the previous chunk repeated at the start of the next one
+EMBEDDING_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'  # Embeds chunks and sizes them; must match the collection's embedding function
 
 # CHROMA
 chromadb_name = f'{pod_prefix}/chroma.db'
 chroma_collection = f'{pod_prefix}_{max_tokens}T_Collection'
-collection_metadata = {"hnsw:space": "cosine", "model.max_seq_length": max_tokens}
+EMBEDDING_CACHE_FILE = f'{pod_prefix}/embedding_cache.sqlite'  # Chunk embeddings keyed by sha256(model + text)
+EMBED_WORKERS = 0  # Processes computing embeddings client-side (0 embeds in the indexing process)
+EMBED_THREADS = 1  # Intra-op threads per embedding process
+EMBED_BATCH_SIZE = 64  # Texts per embedding call in each process
+UPLOAD_TARGET_BYTES = 4 * 1024 * 1024  # Approximate payload per Chroma upsert; batches grow or shrink to match
+UPLOAD_MAX_BATCH = 5000  # Upper bound on records per upsert, below Chroma's max batch size
+HNSW_SPACE = "cosine"  # Distance metric: cosine, l2 or ip
+HNSW_M = 16  # Graph links per node; higher improves recall at the cost of memory and build time
+HNSW_CONSTRUCTION_EF = 100  # Candidate list size while building; higher gives a better graph, slower build
+HNSW_SEARCH_EF = 100  # Candidate list size while querying; higher improves recall, slower queries
+collection_metadata = {
+    "hnsw:space": HNSW_SPACE,
+    "hnsw:M": HNSW_M,
+    "hnsw:construction_ef": HNSW_CONSTRUCTION_EF,
+    "hnsw:search_ef": HNSW_SEARCH_EF,
+    "model.max_seq_length": max_tokens,
+}
+
+# ELASTICSEARCH
+ES_BULK_THREADS = 4  # Concurrent bulk requests during a full load
+ES_BULK_CHUNK_SIZE = 2000  # Max documents per bulk request
+ES_BULK_CHUNK_BYTES = 10 * 1024 * 1024  # Max bytes per bulk request
+ES_BULK_MAX_RETRIES = 5  # Retries for documents rejected with 429 (queue full), with exponential backoff
+ES_FORCE_MERGE = False  # Force-merge the index to one segment after a full load
+ES_KEEP_GENERATIONS = 2  # Previous versioned indices kept after an alias swap, for rollback
+ES_MIN_COUNT_RATIO = 0.9  # Refuse to swap if the new index has fewer docs than this fraction of the live one
 
 # Transcript server configuration
 TRANSCRIPT_SERVER_URL = "your_transcription_server_url"
@@ -24,6 +61,32 @@ TRANSCRIPT_LANGUAGE = "en"
 TRANSCRIPT_OUTPUT_FORMAT = "srt"
 TRANSCRIPT_TRANSLATE = False
 
+# Transcription worker pool
+TRANSCRIBE_WORKERS = 2  # Episodes transcribed in parallel (server requests or local processes)
+TRANSCRIBE_RETRIES = 2  # Extra attempts per episode before it is marked as failed
+TRANSCRIBE_SEGMENT_SECONDS = 0  # Split episodes into ~N second segments at silences (0 disables, SRT only)
+TRANSCRIBE_SEGMENT_WORKERS = 4  # Segments of one episode transcribed in parallel
+
+# Local whisper.cpp configuration
+WHISPER_CPP_BINARY = "whisper-cli"  # Path to the whisper.cpp executable
+WHISPER_CPP_MODEL = "models/ggml-medium.bin"  # Path to the ggml model file
+WHISPER_CPP_THREADS = 4  # Threads per whisper.cpp process
+WHISPER_CPP_INPUT = "wav"  # "wav" writes a WAV file first; "pipe" or "fifo" stream PCM from ffmpeg
+
+# Distributed transcription queue
+WORK_QUEUE_LEASE_SECONDS = 300  # A job is handed to another worker if its lease isn't renewed in time
+WORK_QUEUE_MAX_ATTEMPTS = 3  # Claims per job before it is marked as failed
+WORK_QUEUE_POLL_SECONDS = 30  # How long an idle worker sleeps before checking for new jobs
 
+# Streaming pipeline configuration
+PIPELINE_QUEUE_SIZE = 2  # Episodes allowed to wait between stages before upstream workers block
 
+# Download configuration
+DOWNLOAD_WORKERS = 8  # Total concurrent episode downloads
+DOWNLOAD_PER_HOST = 4  # Concurrent downloads allowed against any single host
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # Bytes per read/write when streaming audio
+DOWNLOAD_TIMEOUT = 60  # Seconds to wait for the server before giving up
 
+# Database connection pool
+DB_POOL_MIN = 1  # Connections opened when the pool is created
+DB_POOL_MAX = 8  # Upper bound on simultaneous connections per process
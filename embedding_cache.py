@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+# Persistent cache of chunk embeddings. Vectors are stored in SQLite as
+# float32 blobs keyed by sha256(model_id + text), so re-indexing text that
+# has been embedded before - after a metadata-only change, a collection
+# rebuild or a config tweak - reuses the stored vector instead of running
+# the embedding model again. Changing the model changes every key, so stale
+# vectors are never returned for a different model.
+
+import os
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+
+class EmbeddingCache:
+    """Embed texts with embed_fn, remembering every vector on disk."""
+
+    def __init__(self, path, model_id, embed_fn):
+        self.model_id = model_id
+        self.embed_fn = embed_fn
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # The pipeline creates the cache on one thread and indexes on another
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL
+            )
+        """)
+        self.connection.commit()
+
+    def key(self, text):
+        return hashlib.sha256((self.model_id + text).encode('utf-8')).hexdigest()
+
+    def lookup(self, keys):
+        """Return {key: vector} for the keys that are cached."""
+        found = {}
+        keys = list(keys)
+        # Stay well under SQLite's bound-parameter limit
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            placeholders = ','.join('?' * len(batch))
+            rows = self.connection.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch)
+            for key, vector in rows:
+                found[key] = np.frombuffer(vector, dtype=np.float32)
+        return found
+
+    def store(self, vectors):
+        """Save {key: vector} to the cache."""
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+            [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in vectors.items()])
+        self.connection.commit()
+
+    def embed(self, texts):
+        """Return one embedding (list of floats) per text, computing only cache misses."""
+        keys = [self.key(text) for text in texts]
+        with self.lock:
+            vectors = self.lookup(set(keys))
+            missing = {}
+            for key, text in zip(keys, texts):
+                if key not in vectors:
+                    missing.setdefault(key, text)
+            if missing:
+                computed = self.embed_fn(list(missing.values()))
+                new_vectors = dict(zip(missing.keys(), computed))
+                self.store(new_vectors)
+                vectors.update({key: np.asarray(vector, dtype=np.float32) for key, vector in new_vectors.items()})
+            n_missed = sum(1 for key in keys if key in missing)
+            self.misses += n_missed
+            self.hits += len(keys) - n_missed
+        return [vectors[key].tolist() for key in keys]
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def report(self):
+        return (f"Embedding cache: {self.hits} hits, {self.misses} misses "
+                f"({self.hit_rate():.1%} hit rate)")
+
+    def close(self):
+        self.connection.close()
+        # Shut down a ParallelEmbedder's process pool
+        if hasattr(self.embed_fn, 'close'):
+            self.embed_fn.close()
+
+# Thread-count variables read by the native libraries behind the embedding
+# models (OpenMP, MKL, OpenBLAS) when they first start
+THREAD_LIMIT_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS')
+
+def limit_threads(threads):
+    """
+    Cap the intra-op threads of this process's embedding model. Call it
+    before the model is loaded: the libraries read these variables once,
+    when they initialise, and ignore later changes.
+    """
+    for var in THREAD_LIMIT_VARS:
+        os.environ[var] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+
+# Fast SRT reader shared by the chunker, the Elasticsearch indexer and the
+# transcript checker. A transcript is held as columns rather than a list of
+# srt.Subtitle objects: start_ms, end_ms and index arrays, plus one UTF-8
+# text buffer with an offsets array marking where each subtitle's content
+# starts and ends. Parsed transcripts are written to a binary cache keyed by
+# the SRT file's sha256, so later runs memory-map the columns instead of
+# parsing text again.
+#
+# Cache file layout (all integers little-endian int64, 8-byte aligned):
+#   magic b'PSRTCOL1' | n | text_bytes
+#   index[n] | start_ms[n] | end_ms[n] | offsets[n+1] | text[text_bytes]
+
+import os
+import re
+import mmap
+import hashlib
+import tempfile
+from datetime import timedelta
+import numpy as np
+import srt
+from config import SRT_CACHE_DIR
+
+CACHE_MAGIC = b'PSRTCOL1'
+HEADER_SIZE = 24
+
+# One timecode line as written by whisper and most editors. Anything this
+# doesn't match is handed to srt.parse, which copes with the odd cases.
+TIMECODE_REGEX = re.compile(
+    r"(\d+)[,.:](\d+)[,.:](\d+)[,.:]?(\d*) *-[ -] *> *(\d+)[,.:](\d+)[,.:](\d+)[,.:]?(\d*)"
+)
+
+class SrtColumns:
+    """Columnar view of one SRT transcript."""
+    __slots__ = ('index', 'start_ms', 'end_ms', 'offsets', 'text')
+
+    def __init__(self, index, start_ms, end_ms, offsets, text):
+        self.index = index
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.offsets = offsets
+        self.text = text
+
+    def __len__(self):
+        return len(self.start_ms)
+
+    def content(self, i):
+        """Return the text of subtitle i."""
+        return bytes(self.text[self.offsets[i]:self.offsets[i + 1]]).decode('utf-8')
+
+    def contents(self):
+        """Return the text of every subtitle as a list of strings."""
+        raw = bytes(self.text)
+        offsets = self.offsets.tolist()
+        text = raw.decode('utf-8')
+        if len(text) != len(raw):
+            # Multi-byte characters: offsets are byte positions, so decode each slice
+            return [raw[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+        return [text[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+    def timecodes(self):
+        """Return 'start --> end' SRT timecode strings for every subtitle."""
+        starts = ms_to_srt_timestamps(self.start_ms)
+        ends = ms_to_srt_timestamps(self.end_ms)
+        return [f"{start} --> {end}" for start, end in zip(starts, ends)]
+
+    def subtitles(self):
+        """Return the transcript as srt.Subtitle objects, as srt.parse would."""
+        return [
+            srt.Subtitle(index=index, start=timedelta(milliseconds=start),
+                         end=timedelta(milliseconds=end), content=content)
+            for index, start, end, content in zip(self.index.tolist(), self.start_ms.tolist(),
+                                                  self.end_ms.tolist(), self.contents())
+        ]
+
+def ms_to_srt_timestamps(ms):
+    """Format an array of millisecond offsets as SRT timestamps."""
+    hrs, rem = np.divmod(np.asarray(ms, dtype=np.int64), 3600000)
+    mins, rem = np.divmod(rem, 60000)
+    secs, msecs = np.divmod(rem, 1000)
+    return ["%02d:%02d:%02d,%03d" % parts
+            for parts in zip(hrs.tolist(), mins.tolist(), secs.tolist(), msecs.tolist())]
+
+def build_columns(indices, starts, ends, contents):
+    """Pack parallel lists of subtitle fields into an SrtColumns."""
+    encoded = [content.encode('utf-8') for content in contents]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return SrtColumns(
+        np.array(indices, dtype=np.int64),
+        np.array(starts, dtype=np.int64),
+        np.array(ends, dtype=np.int64),
+        offsets,
+        b''.join(encoded),
+    )
+
+def timecode_ms(hrs, mins, secs, msecs):
+    return ((int(hrs) * 60 + int(mins)) * 60 + int(secs)) * 1000 + (int(msecs) if msecs else 0)
+
+def parse_srt_fast(content):
+    """
+    Parse well-formed SRT text straight into columns.
+
+    Returns None if the text has anything unusual (missing or fractional
+    indices, proprietary timecode metadata, blocks without a blank line
+    between them) so the caller can fall back to srt.parse.
+    """
+    indices, starts, ends, contents = [], [], [], []
+    for block in content.replace('\r\n', '\n').split('\n\n'):
+        block = block.lstrip()
+        if not block:
+            continue
+        lines = block.split('\n', 2)
+        if len(lines) < 2 or not lines[0].isdigit():
+            return None
+        match = TIMECODE_REGEX.fullmatch(lines[1])
+        if match is None:
+            return None
+        text = lines[2].rstrip('\n') if len(lines) > 2 else ''
+        if '-->' in text:
+            return None
+        groups = match.groups()
+        indices.append(int(lines[0]))
+        starts.append(timecode_ms(*groups[:4]))
+        ends.append(timecode_ms(*groups[4:]))
+        contents.append(text)
+    return build_columns(indices, starts, ends, contents)
+
+def parse_srt_columns(content):
+    """Parse SRT text into an SrtColumns, raising srt.SRTParseError on bad input."""
+    columns = parse_srt_fast(content)
+    if columns is not None:
+        return columns
+    subtitles = list(srt.parse(content))
+    return build_columns(
+        [subtitle.index or 0 for subtitle in subtitles],
+        [subtitle.start // timedelta(milliseconds=1) for subtitle in subtitles],
+        [subtitle.end // timedelta(milliseconds=1) for subtitle in subtitles],
+        [subtitle.content for subtitle in subtitles],
+    )
+
+def write_cache(path, columns):
+    """Write columns to a cache file atomically."""
+    header = np.array([len(columns), len(columns.text)], dtype='<i8')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(CACHE_MAGIC)
+            f.write(header.tobytes())
+            for array in (columns.index, columns.start_ms, columns.end_ms, columns.offsets):
+                f.write(array.astype('<i8').tobytes())
+            f.write(columns.text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def read_cache(path):
+    """Memory-map a cache file and return its columns, or None if it is unusable."""
+    with open(path, 'rb') as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return None  # Empty file
+    if len(buffer) < HEADER_SIZE or buffer[:8] != CACHE_MAGIC:
+        return None
+    n, text_bytes = np.frombuffer(buffer, dtype='<i8', count=2, offset=8).tolist()
+    if len(buffer) != HEADER_SIZE + 8 * (4 * n + 1) + text_bytes:
+        return None
+
+    def column(i, count):
+        return np.frombuffer(buffer, dtype='<i8', count=count, offset=HEADER_SIZE + 8 * n * i)
+
+    text_offset = HEADER_SIZE + 8 * (4 * n + 1)
+    return SrtColumns(column(0, n), column(1, n), column(2, n), column(3, n + 1),
+                      memoryview(buffer)[text_offset:])
+
+def cache_path(content_hash, cache_dir=SRT_CACHE_DIR):
+    return os.path.join(cache_dir, f"{content_hash}.srtc")
+
+def load_srt(filepath, cache_dir=SRT_CACHE_DIR):
+    """
+    Load an SRT file as columns, using the compiled cache when possible.
+
+    The cache is keyed by the file's sha256, so an edited transcript is
+    parsed again automatically. Pass cache_dir=None to skip the cache.
+    Returns (columns, content_hash).
+    """
+    with open(filepath, 'rb') as f:
+        raw = f.read()
+    content_hash = hashlib.sha256(raw).hexdigest()
+
+    if cache_dir:
+        path = cache_path(content_hash, cache_dir)
+        if os.path.exists(path):
+            columns = read_cache(path)
+            if columns is not None:
+                return columns, content_hash
+
+    columns = parse_srt_columns(raw.decode('utf-8'))
+    if cache_dir:
+        write_cache(path, columns)
+    return columns, content_hash
+
+def transcript_hashes(directory):
+    """Return the set of cache keys (sha256) of the SRT files in directory."""
+    hashes = set()
+    for name in os.listdir(directory):
+        if name.endswith('.srt'):
+            with open(os.path.join(directory, name), 'rb') as f:
+                hashes.add(hashlib.sha256(f.read()).hexdigest())
+    return hashes
+
+def prune_cache(keep_hashes, cache_dir=SRT_CACHE_DIR):
+    """Delete cache files for transcripts that no longer exist. Returns the number removed."""
+    if not os.path.isdir(cache_dir):
+        return 0
+    removed = 0
+    for name in os.listdir(cache_dir):
+        if name.endswith('.srtc') and name[:-5] not in keep_hashes:
+            os.remove(os.path.join(cache_dir, name))
+            removed += 1
+    return removed
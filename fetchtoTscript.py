@@ -18,6 +18,19 @@ from libPodSemSearch import (
     transcribe_episodes,
     parse_feed_urls,
     consolidate_feeds,
+    save_feed_state,
+    get_known_episode_keys,
+    get_db_pool_stats,
+    load_pipeline_state,
+    sync_pipeline_state_from_disk,
+    mark_stages,
+    episode_basename,
+    setup_work_queue,
+    enqueue_transcriptions,
+    collect_transcriptions,
+    requeue_expired_transcriptions,
+    get_transcription_queue_stats,
+    get_episode_records,
 )
 
 # Import config from config.py
@@ -26,6 +39,9 @@ from config import (
     audio_dir,
     tscript_dir,
     wav_dir,
+    WORK_QUEUE_MAX_ATTEMPTS,
+    feed_state_file,
+    feed_stop_after_known,
 )
 
 # Load environment variables
@@ -76,6 +92,20 @@ def parse_args():
                       help='Output format for transcription (default: srt)')
     parser.add_argument('--translate', action='store_true',
                       help='Enable translation')
+    parser.add_argument('--workers', type=int,
+                      help='Number of episodes to transcribe in parallel')
+    parser.add_argument('--yes', action='store_true',
+                      help='Run non-interactively, skipping all confirmation prompts')
+    parser.add_argument('--pipeline', action='store_true',
+                      help='Download, transcribe and index episodes concurrently (implies --yes)')
+    parser.add_argument('--distributed', action='store_true',
+                      help='Queue transcriptions for transcribe_worker.py nodes and collect finished transcripts')
+    parser.add_argument('--rebuild-state', action='store_true',
+                      help='Re-seed the pipeline state table from the audio and transcript directories')
+    parser.add_argument('--refresh-feeds', action='store_true',
+                      help='Ignore stored ETag/Last-Modified values and re-fetch every feed')
+    parser.add_argument('--stream-feeds', action='store_true',
+                      help='Stream feeds incrementally and stop at episodes already in the database')
     return parser.parse_args()
 
 def main():
@@ -108,6 +138,10 @@ def main():
             config.TRANSCRIPT_OUTPUT_FORMAT = args.output_format
         config.TRANSCRIPT_TRANSLATE = args.translate
     
+    if args.workers:
+        import config
+        config.TRANSCRIBE_WORKERS = args.workers
+    
     # Check that all directories exist
     check_dir(pod_prefix, count_files=0, create=1)
     check_dir(audio_dir, count_files=1, create=1)
@@ -118,42 +152,79 @@ def main():
     feed_urls = parse_feed_urls(os.getenv('FEED_URLS'))
     print(f"Found {len(feed_urls)} RSS feeds to process")
     
-    # Consolidate episodes from all feeds
-    episode_dict = consolidate_feeds(feed_urls)
-    if not episode_dict:
-        print("No episodes found in any of the feeds")
-        exit(1)
-    
-    print(f"Successfully obtained {len(episode_dict)} unique episodes from RSS feeds")
-    
     # Setup the database schema if it doesn't exist
     print('Setting up database schema...')
     setup_database()
     
-    # Add the new episodes to the database and get a dataframe of all episodes
-    df_metadata = add_episodes(episode_dict)
-    
-    # Fetch the episodes and save to audio_dir
-    # fetch_episodes checks if episodes are already transcribed
-    fetch_episodes(episode_dict, audio_dir, tscript_dir)
-    
-    # Transcribe the episodes
-    file_list = []
-    for audio_file in os.listdir(audio_dir):
-        audio_basename, _ = os.path.splitext(audio_file)
-        transcript_exists = any(
-            os.path.splitext(srt_file)[0] == audio_basename for srt_file in os.listdir(tscript_dir)
-        )
-        if not transcript_exists:
-            print(f"Transcript for {audio_file} does not exist. Adding to transcription list.")
-            file_list.append(os.path.join(audio_dir, audio_file))
+    # The state is seeded from existing files automatically the first time
+    # it is used; --rebuild-state records them again
+    if args.rebuild_state:
+        print('Recording existing audio and transcripts in the pipeline state...')
+        sync_pipeline_state_from_disk(audio_dir, tscript_dir)
+    
+    # Consolidate episodes from all feeds. Unchanged feeds (HTTP 304) are
+    # skipped, so an empty result just means nothing new was published.
+    if args.refresh_feeds and os.path.exists(feed_state_file):
+        os.remove(feed_state_file)
+    # --stream-feeds skips episodes already in the database; downloads are
+    # planned from the database, so those that failed earlier are still retried
+    known_keys = get_known_episode_keys() if args.stream_feeds else None
+    episode_dict, feed_state = consolidate_feeds(
+        feed_urls,
+        state_file=feed_state_file,
+        known_keys=known_keys,
+        stop_after_known=feed_stop_after_known,
+    )
+    if not episode_dict:
+        print("No new or changed episodes found in any of the feeds")
+    else:
+        print(f"Successfully obtained {len(episode_dict)} unique episodes from RSS feeds")
     
-    # Run the transcription if file_list has any contents
-    if not file_list:
-        print("All episodes have been transcribed.")
+    # Add the new episodes to the database and get a dataframe of the new ones
+    df_metadata = add_episodes(episode_dict)
+    mark_stages(
+        [(episode_basename(episode['filename']), None, None) for episode in episode_dict.values()],
+        'discovered',
+    )
+    # Only remember the feeds' validators now that their episodes are
+    # stored; if anything above failed, the next run fetches them again
+    save_feed_state(feed_state_file, feed_state)
+    
+    succeeded = True
+    if args.distributed:
+        # Remote workers fetch audio themselves, so just queue what is missing
+        setup_work_queue()
+        collected = collect_transcriptions(tscript_dir)
+        print(f"Collected {collected} finished transcripts from the work queue")
+        requeue_expired_transcriptions(WORK_QUEUE_MAX_ATTEMPTS)
+        
+        state = load_pipeline_state()
+        records = get_episode_records()
+        jobs = [
+            (episode_basename(filename), record[2])
+            for filename, record in records.items()
+            if state.get(episode_basename(filename), {}).get('transcribed') != 'done'
+        ]
+        queued = enqueue_transcriptions(jobs)
+        print(f"Queued {queued} new transcription jobs; queue status: {get_transcription_queue_stats()}")
+    elif args.pipeline:
+        # Overlap download, transcription and indexing for every episode
+        from pipeline import run_pipeline
+        results = run_pipeline(episode_dict, load_pipeline_state())
+        succeeded = results is not None and not results['failed']
     else:
-        input("Press Enter to continue with transcription...")
-        transcribe_episodes(wav_dir, tscript_dir, "srt", file_list, audio_dir)
+        # Fetch every episode in the database that has no audio or
+        # transcript yet, including downloads that failed on earlier runs
+        fetch_episodes(audio_dir, tscript_dir, assume_yes=args.yes)
+        
+        # Transcribe the episodes that are downloaded but not yet transcribed
+        transcribe_episodes(wav_dir, tscript_dir, "srt", audio_dir, assume_yes=args.yes)
+    
+    pool_stats = get_db_pool_stats()
+    print(f"Database pool: {pool_stats['checkouts']} checkouts, "
+          f"{pool_stats['avg_wait_seconds'] * 1000:.1f} ms average wait")
+    if not succeeded:
+        exit(1)
 
 if __name__ == "__main__":
     main()
@@ -10,7 +10,7 @@ import random
 from dotenv import load_dotenv
 from config.search_examples import FULLTEXT_EXAMPLES, SEMANTIC_EXAMPLES, RAG_EXAMPLES
 from config.app_settings import (
-    SHOW_PROGRESS, POD_PREFIX, ELASTICSEARCH_INDEX, SEMANTIC_COLLECTION,
+    SHOW_PROGRESS, POD_PREFIX, ELASTICSEARCH_INDEX, ELASTICSEARCH_EPISODES_INDEX, SEMANTIC_COLLECTION,
     LLM_PROVIDER, LLM_API_BASE, LLM_MODEL, LLM_TEMPERATURE, LLM_TOP_P
 )
 from config.config_validator import validate_config
@@ -275,6 +275,18 @@ def rag_search_page():
     examples = get_random_examples(RAG_EXAMPLES)
     return render_template('rag_search.html', examples=examples)
 
+def hydrate_episodes(hits):
+    """Add each hit's episode title and url, fetched once per page from the episodes index."""
+    episode_ids = {hit['_source']['episode_id'] for hit in hits if 'episode_id' in hit['_source']}
+    if not episode_ids:
+        return
+    response = es.mget(index=ELASTICSEARCH_EPISODES_INDEX, ids=list(episode_ids), _source=["title", "url"])
+    episodes = {doc['_id']: doc['_source'] for doc in response['docs'] if doc.get('found')}
+    for hit in hits:
+        episode = episodes.get(hit['_source'].get('episode_id'))
+        if episode:
+            hit['_source'].update(episode)
+
 # API endpoints
 @app.route('/api/search/elastic', methods=['POST'])
 def elastic_search():
@@ -293,9 +305,10 @@ def elastic_search():
         if not es.indices.exists(index=ELASTICSEARCH_INDEX):
             return jsonify({"error": "Elasticsearch index not found"}), 404
 
-        # Get index mapping to check available fields
+        # Get index mapping to check available fields. ELASTICSEARCH_INDEX is an
+        # alias, so the mapping is keyed by the versioned index behind it
         mapping = es.indices.get_mapping(index=ELASTICSEARCH_INDEX)
-        properties = mapping[ELASTICSEARCH_INDEX]['mappings'].get('properties', {})
+        properties = next(iter(mapping.values()))['mappings'].get('properties', {})
         
         # Log available fields
         logging.info(f"Available fields in index: {list(properties.keys())}")
@@ -310,9 +323,8 @@ def elastic_search():
         # Get the correct field name or default to 'text'
         es_field = field_mapping.get(field, 'text')
         
-        # First, get total count of matches
-        count_query = {
-            "query": {
+        if es_field == 'text' or es_field in properties:
+            line_query = {
                 "match": {
                     es_field: {
                         "query": query,
@@ -320,7 +332,20 @@ def elastic_search():
                     }
                 }
             }
-        }
+        else:
+            # Title and description live in the episodes index; match the
+            # episodes there and return their lines
+            episodes = es.search(index=ELASTICSEARCH_EPISODES_INDEX, body={
+                "query": {"match": {es_field: {"query": query, "operator": "and"}}},
+                "_source": False,
+                "size": 10000
+            })
+            episode_ids = [hit['_id'] for hit in episodes['hits']['hits']]
+            line_query = {"terms": {"episode_id": episode_ids}}
+            es_field = 'text'
+        
+        # First, get total count of matches
+        count_query = {"query": line_query}
         
         count_result = es.count(index=ELASTICSEARCH_INDEX, body=count_query)
         total_hits = count_result['count']
@@ -331,14 +356,7 @@ def elastic_search():
         
         # Build the search query with pagination
         es_query = {
-            "query": {
-                "match": {
-                    es_field: {
-                        "query": query,
-                        "operator": "and"
-                    }
-                }
-            },
+            "query": line_query,
             "highlight": {
                 "fields": {
                     es_field: {
@@ -356,7 +374,7 @@ def elastic_search():
                 "number_of_fragments": 1,
                 "no_match_size": 1000
             },
-            "_source": ["title", "date", "timecode", "text", "url", "line_index"],
+            "_source": ["episode_id", "title", "date", "timecode", "text", "url", "line_index"],
             "sort": [
                 {"_score": "desc"},
                 {"line_index": "asc"}
@@ -367,6 +385,7 @@ def elastic_search():
 
         # Execute search
         results = es.search(index=ELASTICSEARCH_INDEX, body=es_query)
+        hydrate_episodes(results['hits']['hits'])
         logging.info(f"Search query executed successfully. Showing results {from_ + 1}-{min(from_ + page_size, total_hits)} out of {total_hits} total matches")
         
         # Add pagination info to response
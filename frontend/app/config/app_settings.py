@@ -38,6 +38,7 @@ LLM_TOP_P = 0.1  # Default top_p for completions
 
 # Search Configuration
 ELASTICSEARCH_INDEX = f'{POD_PREFIX.lower()}'  # Lowercase for ES compatibility
+ELASTICSEARCH_EPISODES_INDEX = f'{POD_PREFIX.lower()}_episodes'  # Episode metadata, one doc per episode
 SEMANTIC_COLLECTION = f'{POD_PREFIX.lower()}_semantic'
 POSTGRES_DB = POD_PREFIX.lower()
 DOCKER_PREFIX = 'podcast-search'  # Base prefix for Docker resources 
\ No newline at end of file
@@ -2,10 +2,30 @@
 
 import chromadb
 from chromadb.config import Settings
+import os
 import json
-from chunk_transcripts import process_transcripts
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+from chunk_transcripts import iter_transcript_chunks
+from fast_srt import transcript_hashes, prune_cache
+from libPodSemSearch import mark_stages, episode_basename
 import hashlib
 from dotenv import load_dotenv
+from embedding_cache import EmbeddingCache, limit_threads
+from config import (
+    collection_metadata,
+    EMBEDDING_MODEL,
+    EMBEDDING_CACHE_FILE,
+    EMBED_WORKERS,
+    EMBED_THREADS,
+    EMBED_BATCH_SIZE,
+    UPLOAD_TARGET_BYTES,
+    UPLOAD_MAX_BATCH,
+    tscript_dir,
+)
 from frontend.app.config.app_settings import SEMANTIC_COLLECTION
 
 # Load environment variables
@@ -18,13 +38,241 @@ def create_chroma_client():
         port="8000"
     )
 
+# Values Chroma uses for HNSW settings missing from a collection's metadata
+CHROMA_HNSW_DEFAULTS = {
+    "hnsw:space": "l2",
+    "hnsw:M": 16,
+    "hnsw:construction_ef": 100,
+    "hnsw:search_ef": 10,
+}
+
+def open_collection(client, name=SEMANTIC_COLLECTION, metadata=collection_metadata):
+    """
+    Get or create a collection with the configured HNSW parameters.
+
+    Space, M and construction_ef are fixed when a collection is created, so
+    an existing collection built with other values keeps them; warn so it
+    can be rebuilt with --full. search_ef only affects queries, so it is
+    updated in place.
+    """
+    collection = client.get_or_create_collection(name=name, metadata=metadata)
+    current = collection.metadata or {}
+    stale = {key: current.get(key, CHROMA_HNSW_DEFAULTS.get(key))
+             for key, value in metadata.items()
+             if key.startswith('hnsw:') and current.get(key, CHROMA_HNSW_DEFAULTS.get(key)) != value}
+    if 'hnsw:search_ef' in stale:
+        print(f"Changing {name} hnsw:search_ef from {stale.pop('hnsw:search_ef')} "
+              f"to {metadata['hnsw:search_ef']}")
+        # modify replaces the metadata and refuses any hnsw:space key
+        updated = {key: value for key, value in current.items() if key != 'hnsw:space'}
+        updated['hnsw:search_ef'] = metadata['hnsw:search_ef']
+        collection.modify(metadata=updated)
+    if stale:
+        print(f"Warning: {name} was built with different HNSW settings "
+              f"({', '.join(f'{key}={value}' for key, value in stale.items())}); run with --full to rebuild it")
+    return collection
+
+def get_embedding_function(model=EMBEDDING_MODEL):
+    """Return the Chroma embedding function for the configured model."""
+    from chromadb.utils import embedding_functions
+    if model.split('/')[-1] == 'all-MiniLM-L6-v2':
+        # Chroma's built-in ONNX copy of the model, which collections use by default
+        return embedding_functions.DefaultEmbeddingFunction()
+    return embedding_functions.SentenceTransformerEmbeddingFunction(model_name=model)
+
+# Embedding function of an embedding worker process
+_worker_embed_fn = None
+
+def init_embed_worker(model, threads):
+    """Limit a worker's intra-op threads, then load the model once for its lifetime."""
+    global _worker_embed_fn
+    # Before the model loads, so its runtime reads the limit when it starts
+    limit_threads(threads)
+    _worker_embed_fn = get_embedding_function(model)
+
+def embed_in_worker(texts):
+    return np.asarray(_worker_embed_fn(texts), dtype=np.float32)
+
+class ParallelEmbedder:
+    """
+    Embedding function that splits texts into batches and embeds them on a
+    pool of processes, each using a fixed number of intra-op threads, so
+    cores are shared out between processes rather than oversubscribed.
+    """
+
+    def __init__(self, model=EMBEDDING_MODEL, workers=EMBED_WORKERS, threads=EMBED_THREADS,
+                 batch_size=EMBED_BATCH_SIZE):
+        self.batch_size = batch_size
+        # spawn, because uploads run on a background thread while workers start
+        self.executor = ProcessPoolExecutor(max_workers=workers,
+                                            mp_context=multiprocessing.get_context('spawn'),
+                                            initializer=init_embed_worker, initargs=(model, threads))
+
+    def __call__(self, texts):
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        return [vector for vectors in self.executor.map(embed_in_worker, batches) for vector in vectors]
+
+    def close(self):
+        self.executor.shutdown()
+
+def create_embedding_cache(path=EMBEDDING_CACHE_FILE, model=EMBEDDING_MODEL, workers=EMBED_WORKERS,
+                           threads=EMBED_THREADS):
+    """
+    Open the on-disk embedding cache for the configured model. Misses are
+    embedded in this process, or on a ParallelEmbedder if workers > 0.
+    """
+    if workers:
+        return EmbeddingCache(path, model, ParallelEmbedder(model, workers, threads))
+    return EmbeddingCache(path, model, get_embedding_function(model))
+
 def generate_chunk_id(chunk):
     """Generate a unique ID for a chunk based on its content and metadata."""
     # Combine unique identifiers to create a stable ID
-    unique_string = f"{chunk['title']}_{chunk['start_timecode']}_{chunk['end_timecode']}"
+    unique_string = f"{chunk['episode']['title']}_{chunk['start_timecode']}_{chunk['end_timecode']}"
     return hashlib.sha256(unique_string.encode()).hexdigest()
 
-def index_chunks(chunks, collection_name=SEMANTIC_COLLECTION):
+def chunk_metadata(chunk):
+    """Prepare metadata (everything except the text content)."""
+    episode = chunk['episode']
+    return {
+        'title': episode['title'],
+        'start_timecode': chunk['start_timecode'],
+        'end_timecode': chunk['end_timecode'],
+        'url': episode['url'],
+        'date': str(episode['date']),  # Convert date to string for ChromaDB
+        'filename': episode['filename']
+    }
+
+def prepare_chunk(chunk):
+    """
+    Return (id, document, metadata) for a chunk. The metadata carries a
+    content_hash of the text and the other metadata, so later runs can tell
+    whether the indexed copy is still current.
+    """
+    metadata = chunk_metadata(chunk)
+    payload = json.dumps([chunk['text'], metadata], sort_keys=True)
+    metadata['content_hash'] = hashlib.sha256(payload.encode()).hexdigest()
+    return generate_chunk_id(chunk), chunk['text'], metadata
+
+def estimate_payload(document, metadata, dimensions):
+    """Rough size in bytes of one record in an upsert request."""
+    # Embeddings travel as JSON numbers, around 12 characters per float
+    return len(document.encode('utf-8')) + len(json.dumps(metadata)) + 12 * dimensions
+
+def upsert_prepared(collection, prepared, batch_size=100, embedder=None, target_bytes=None,
+                    max_batch_size=UPLOAD_MAX_BATCH):
+    """
+    Upsert (id, document, metadata) tuples in batches. Returns the number upserted.
+
+    If embedder (an EmbeddingCache) is given, embeddings are taken from it
+    and passed to Chroma; otherwise Chroma embeds the documents itself.
+    Each batch is uploaded on a background thread while the next one is
+    being embedded. With target_bytes set, batch_size is ignored and a
+    batch is sent once its estimated payload reaches target_bytes, so
+    batches hold more short chunks and fewer long ones.
+    """
+    n_chunks = 0
+    dimensions = 0
+    batch = []
+    batch_bytes = 0
+    pending = None
+    
+    def upload(ids, documents, metadatas, embeddings):
+        collection.upsert(
+            documents=documents,
+            metadatas=metadatas,
+            ids=ids,
+            embeddings=embeddings
+        )
+        print(f"Indexed batch of {len(documents)} chunks")
+    
+    with ThreadPoolExecutor(max_workers=1) as uploader:
+        def flush():
+            nonlocal pending, dimensions
+            ids, documents, metadatas = (list(column) for column in zip(*batch))
+            # Embed this batch while the previous one is still uploading
+            embeddings = embedder.embed(documents) if embedder else None
+            if embeddings:
+                dimensions = len(embeddings[0])
+            if pending is not None:
+                pending.result()
+            pending = uploader.submit(upload, ids, documents, metadatas, embeddings)
+        
+        for chunk_id, document, metadata in prepared:
+            batch.append((chunk_id, document, metadata))
+            n_chunks += 1
+            if target_bytes and (dimensions or not embedder):
+                batch_bytes += estimate_payload(document, metadata, dimensions)
+                full = batch_bytes >= target_bytes or len(batch) >= max_batch_size
+            else:
+                # Fixed-size batches, or the first batch before the embedding size is known
+                full = len(batch) >= batch_size
+            if full:
+                flush()
+                batch = []
+                batch_bytes = 0
+        
+        # Index any remaining chunks
+        if batch:
+            flush()
+        if pending is not None:
+            pending.result()
+    
+    return n_chunks
+
+def add_chunks(collection, chunks, batch_size=100, embedder=None, target_bytes=None):
+    """
+    Upsert chunks into a collection in batches to avoid memory issues.
+
+    chunks may be any iterable, including a generator, so only one batch
+    is held at a time. Returns the number of chunks indexed.
+    """
+    return upsert_prepared(collection, map(prepare_chunk, chunks), batch_size, embedder, target_bytes)
+
+def get_indexed_hashes(collection, where=None, page_size=5000):
+    """Return {id: content_hash} for the chunks in a collection (optionally filtered)."""
+    indexed = {}
+    offset = 0
+    while True:
+        page = collection.get(where=where, include=['metadatas'], limit=page_size, offset=offset)
+        for chunk_id, metadata in zip(page['ids'], page['metadatas']):
+            indexed[chunk_id] = (metadata or {}).get('content_hash')
+        if len(page['ids']) < page_size:
+            return indexed
+        offset += page_size
+
+def sync_chunks(collection, chunks, where=None, batch_size=100, embedder=None, target_bytes=None):
+    """
+    Bring a collection in line with chunks without rebuilding it.
+
+    Only chunks that are new or whose text/metadata changed are upserted
+    (and so embedded). Indexed chunks that are no longer produced are
+    deleted. chunks must be the complete set for the part of the
+    collection selected by where (the whole collection if where is None).
+    Returns a dict of unchanged/upserted/deleted counts.
+    """
+    indexed = get_indexed_hashes(collection, where)
+    seen = set()
+    stats = {'unchanged': 0, 'upserted': 0, 'deleted': 0}
+    
+    def changed_chunks():
+        for chunk in chunks:
+            chunk_id, document, metadata = prepare_chunk(chunk)
+            seen.add(chunk_id)
+            if indexed.get(chunk_id) == metadata['content_hash']:
+                stats['unchanged'] += 1
+                continue
+            yield chunk_id, document, metadata
+    
+    stats['upserted'] = upsert_prepared(collection, changed_chunks(), batch_size, embedder, target_bytes)
+    
+    orphans = [chunk_id for chunk_id in indexed if chunk_id not in seen]
+    for i in range(0, len(orphans), 5000):
+        collection.delete(ids=orphans[i:i + 5000])
+    stats['deleted'] = len(orphans)
+    return stats
+
+def index_chunks(chunks, collection_name=SEMANTIC_COLLECTION, embedder=None, target_bytes=None):
     """Index chunks in ChromaDB."""
     client = create_chroma_client()
     
@@ -36,70 +284,68 @@ def index_chunks(chunks, collection_name=SEMANTIC_COLLECTION):
         pass
     
     # Create new collection
-    collection = client.create_collection(name=collection_name)
+    collection = client.create_collection(name=collection_name, metadata=collection_metadata)
     print(f"Created new collection: {collection_name}")
     
-    # Prepare chunks for indexing
-    documents = []
-    metadatas = []
-    ids = []
-    
-    for chunk in chunks:
-        # Generate unique ID for the chunk
-        chunk_id = generate_chunk_id(chunk)
-        
-        # Prepare metadata (everything except the text content)
-        metadata = {
-            'title': chunk['title'],
-            'start_timecode': chunk['start_timecode'],
-            'end_timecode': chunk['end_timecode'],
-            'url': chunk['url'],
-            'date': str(chunk['date']),  # Convert date to string for ChromaDB
-            'filename': chunk['filename']
-        }
-        
-        documents.append(chunk['text'])
-        metadatas.append(metadata)
-        ids.append(chunk_id)
-        
-        # Index in batches of 100 to avoid memory issues
-        if len(documents) >= 100:
-            collection.add(
-                documents=documents,
-                metadatas=metadatas,
-                ids=ids
-            )
-            print(f"Indexed batch of {len(documents)} chunks")
-            documents = []
-            metadatas = []
-            ids = []
-    
-    # Index any remaining chunks
-    if documents:
-        collection.add(
-            documents=documents,
-            metadatas=metadatas,
-            ids=ids
-        )
-        print(f"Indexed final batch of {len(documents)} chunks")
+    add_chunks(collection, chunks, embedder=embedder, target_bytes=target_bytes)
     
     return collection
 
+def parse_args():
+    parser = argparse.ArgumentParser(description='Index transcript chunks in ChromaDB')
+    parser.add_argument('--full', action='store_true',
+                      help='Delete and rebuild the collection instead of updating it incrementally')
+    parser.add_argument('--no-embedding-cache', action='store_true',
+                      help='Let Chroma embed every document instead of using the on-disk embedding cache')
+    parser.add_argument('--embed-workers', type=int, default=EMBED_WORKERS,
+                      help=f'Processes computing embeddings (default: {EMBED_WORKERS}, 0 embeds in this process)')
+    parser.add_argument('--embed-threads', type=int, default=EMBED_THREADS,
+                      help=f'Intra-op threads per embedding process (default: {EMBED_THREADS})')
+    parser.add_argument('--upload-bytes', type=int, default=UPLOAD_TARGET_BYTES,
+                      help=f'Target payload per upsert request in bytes, 0 for fixed batches of 100 (default: {UPLOAD_TARGET_BYTES})')
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
     print("Starting semantic indexing process...")
     
-    # Get chunks from transcripts
-    print("Processing transcripts into chunks...")
-    chunks = process_transcripts()
-    print(f"Generated {len(chunks)} chunks")
+    # Stream chunks from the transcripts straight into the indexer, one
+    # episode at a time, rather than building the whole corpus in memory
+    print("Processing transcripts into chunks and indexing them in ChromaDB...")
+    indexed_files = []
+    
+    def stream_chunks():
+        for episode, chunks in iter_transcript_chunks():
+            indexed_files.append(episode['filename'])
+            yield from chunks
     
-    # Index chunks in ChromaDB
-    print("\nIndexing chunks in ChromaDB...")
-    collection = index_chunks(chunks)
+    embedder = None
+    if not args.no_embedding_cache:
+        embedder = create_embedding_cache(workers=args.embed_workers, threads=args.embed_threads)
+    target_bytes = args.upload_bytes or None
+    start_time = time.monotonic()
+    if args.full:
+        collection = index_chunks(stream_chunks(), embedder=embedder, target_bytes=target_bytes)
+        n_docs = collection.count()
+    else:
+        collection = open_collection(create_chroma_client())
+        stats = sync_chunks(collection, stream_chunks(), embedder=embedder, target_bytes=target_bytes)
+        n_docs = stats['upserted']
+        print(f"\nUpserted {stats['upserted']} new or changed chunks, "
+              f"skipped {stats['unchanged']} unchanged, deleted {stats['deleted']} orphans")
+    elapsed = time.monotonic() - start_time
+    print(f"Indexed {n_docs} documents in {elapsed:.1f}s ({n_docs / elapsed if elapsed else 0:.1f} docs/sec) "
+          f"with {args.embed_workers} embedding workers x {args.embed_threads} threads")
+    if embedder:
+        print(embedder.report())
+        embedder.close()
     
     # Verify indexing
     count = collection.count()
     print(f"\nIndexing complete. Collection contains {count} chunks.")
+    mark_stages([(episode_basename(filename), None, None) for filename in indexed_files], 'chroma_indexed')
+    # Drop parsed columns of transcripts that were replaced or deleted
+    print(f"Removed {prune_cache(transcript_hashes(tscript_dir))} stale SRT cache files")
     
     # Perform a test query
     print("\nPerforming test query...")
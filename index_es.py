@@ -10,20 +10,44 @@
 # 20250105 - Updated to use title as primary identifier instead of episode number
 # 20250105 - Updated to handle filenames without episode numbers
 # 20250105 - Updated to drop and recreate index on each run
+# 20261017 - Updated to stream one episode at a time into parallel bulk requests
+# 20261017 - Updated to build a timestamped index and swap an alias to it,
+#            instead of dropping the live index
+# 20261017 - Updated to index only new or changed episodes by default,
+#            tracked by a per-episode content hash stored on every line
+# 20261017 - Updated to keep episode metadata in a separate episodes index,
+#            with line documents referencing it by episode_id
+# 20261017 - Updated to version the episodes index with the lines index and
+#            swap both aliases together
 
 # Import the required modules
 import os
 import re
+import json
+import hashlib
+import time
+import argparse
 import srt
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from elasticsearch import Elasticsearch
 from elasticsearch.helpers import bulk
 import datetime
-from libPodSemSearch import get_db_connection
+from fast_srt import load_srt, transcript_hashes, prune_cache
+from libPodSemSearch import get_episode_records, mark_stages, episode_basename
 from dotenv import load_dotenv
 from config import (
     tscript_dir,
+    ES_BULK_THREADS,
+    ES_BULK_CHUNK_SIZE,
+    ES_BULK_CHUNK_BYTES,
+    ES_BULK_MAX_RETRIES,
+    ES_FORCE_MERGE,
+    ES_KEEP_GENERATIONS,
+    ES_MIN_COUNT_RATIO,
 )
-from frontend.app.config.app_settings import ELASTICSEARCH_INDEX
+from frontend.app.config.app_settings import ELASTICSEARCH_INDEX, ELASTICSEARCH_EPISODES_INDEX
 
 # Replace Whoosh-specific imports with Elasticsearch setup
 es = Elasticsearch(
@@ -32,131 +56,93 @@ es = Elasticsearch(
 )
 
 def ep_metadata(directory):
-    # Scan the directory containing the transcript files and create a dict of
-    # the files and their metadata. 
-    metadata = {}
+    # Scan the directory containing the transcript files and yield each
+    # episode's metadata and lines as a (title, data) pair, one episode at a
+    # time, so indexing can start straight away and only one transcript is
+    # held in memory. Each file is read once.
     n_files = 0
     n_srtLines = 0
     skipped_files = []
 
-    # Get the metadata from the database
-    connection = get_db_connection()
-    cursor = connection.cursor()
-    
-    try:
-        for filename in os.listdir(tscript_dir):
-            # Check that the file is not a directory
-            if os.path.isfile(os.path.join(tscript_dir, filename)):
-                try:
-                    with open(os.path.join(tscript_dir, filename), 'r') as f:
-                        ###############################################################
-                        # THE FIRST SECTION WORKS ON THE FILE SYSTEM FILENAME
-                        ###############################################################
-
-                        # Extract the date and title from the filename using a regex
-                        # New format: YYYYMMDD_TITLE.srt
-                        match = re.search(r"^(\d{8})_(.*)\.srt$", filename)
-                        if match is None:
-                            print(f"Warning: {filename} does not match the expected filename format")
-                            skipped_files.append((filename, "Invalid filename format"))
-                            continue
-
-                        # Get the episode metadata from the database using the filename
-                        cursor.execute("""
-                            SELECT title, description, url 
-                            FROM episodes 
-                            WHERE filename = %s
-                        """, (filename,))
-                        db_record = cursor.fetchone()
-                        
-                        if not db_record:
-                            print(f"Warning: No database record found for {filename}")
-                            skipped_files.append((filename, "No database record"))
-                            continue
-                            
-                        title, description, ep_url = db_record
-
-                        # Extract date from filename
-                        date = match.group(1)
-                        
-                        # Add all metadata except that associated with lines of text
-                        # in the srt file to the metadata dict
-                        metadata[title] = {
-                            'filename': filename,
-                            'description': description,
-                            'title': title,
-                            'date': date,
-                            'url': ep_url,
-                            'text': []
-                        }
-                        ###############################################################
-                        # BUT THE LINES ARE EXTRACTED FROM SRT FILES
-                        ###############################################################
-                        n = 0
-                        try:
-                            with open(os.path.join(tscript_dir, filename), 'r') as f_srt:
-                                # Try to detect if this is a valid SRT file
-                                content = f_srt.read()
-                                if not content.strip().startswith('1'):
-                                    raise srt.SRTParseError("File does not appear to be in SRT format", 0, 0, content[:100])
-                                
-                                # Reset file pointer and parse
-                                f_srt.seek(0)
-                                srt_lines = list(srt.parse(f_srt))
-                                
-                                for line in srt_lines:
-                                    index = str(line.index)
-                                    tc_start = srt.timedelta_to_srt_timestamp(line.start)
-                                    tc_end = srt.timedelta_to_srt_timestamp(line.end)
-                                    line_content = line.content
-                                    timecode = tc_start + " --> " + tc_end
-                                    metadata[title]['text'].append((index, timecode, line_content))
-                                    n += 1
-                                n_srtLines += n
-                                n_files += 1
-                        except (srt.SRTParseError, ValueError) as e:
-                            print(f"Warning: Failed to parse {filename} as SRT: {str(e)}")
-                            skipped_files.append((filename, f"SRT parse error: {str(e)}"))
-                            if title in metadata:
-                                del metadata[title]
-                            continue
-                except Exception as e:
-                    print(f"Error processing file {filename}: {str(e)}")
-                    skipped_files.append((filename, f"Processing error: {str(e)}"))
-                    continue
-
-        print(f"{n_files} files were successfully processed.")
-        print(f"{n_srtLines} lines were processed.")
-        if skipped_files:
-            print("\nSkipped files:")
-            for filename, reason in skipped_files:
-                print(f"- {filename}: {reason}")
-    finally:
-        cursor.close()
-        connection.close()
-    
-    return metadata
+    # Get the metadata for every episode from the database in one query
+    records = get_episode_records()
 
-def create_es_index(index_name=ELASTICSEARCH_INDEX):
-    """Create a fresh Elasticsearch index, dropping the existing one if it exists."""
-    # Drop existing index if it exists
-    if es.indices.exists(index=index_name):
-        print(f"Dropping existing index: {index_name}")
-        es.indices.delete(index=index_name)
-    
-    # Create the index with the appropriate mappings
+    for filename in sorted(os.listdir(directory)):
+        # Check that the file is not a directory
+        if not os.path.isfile(os.path.join(directory, filename)):
+            continue
+
+        ###############################################################
+        # THE FIRST SECTION WORKS ON THE FILE SYSTEM FILENAME
+        ###############################################################
+
+        # Extract the date and title from the filename using a regex
+        # New format: YYYYMMDD_TITLE.srt
+        match = re.search(r"^(\d{8})_(.*)\.srt$", filename)
+        if match is None:
+            print(f"Warning: {filename} does not match the expected filename format")
+            skipped_files.append((filename, "Invalid filename format"))
+            continue
+
+        # Get the episode metadata from the database using the filename
+        db_record = records.get(filename)
+        if not db_record:
+            print(f"Warning: No database record found for {filename}")
+            skipped_files.append((filename, "No database record"))
+            continue
+
+        title, description, ep_url, _ = db_record
+
+        ###############################################################
+        # BUT THE LINES ARE EXTRACTED FROM SRT FILES
+        ###############################################################
+        try:
+            lines, file_hash = read_srt_file(os.path.join(directory, filename))
+        except (srt.SRTParseError, ValueError) as e:
+            print(f"Warning: Failed to parse {filename} as SRT: {str(e)}")
+            skipped_files.append((filename, f"SRT parse error: {str(e)}"))
+            continue
+        except Exception as e:
+            print(f"Error processing file {filename}: {str(e)}")
+            skipped_files.append((filename, f"Processing error: {str(e)}"))
+            continue
+
+        n_srtLines += len(lines)
+        n_files += 1
+        data = {
+            'filename': filename,
+            'description': description,
+            'title': title,
+            'date': match.group(1),  # Extract date from filename
+            'url': ep_url,
+            'text': lines
+        }
+        data['content_hash'] = episode_hash(data, file_hash)
+        yield title, data
+
+    print(f"{n_files} files were successfully processed.")
+    print(f"{n_srtLines} lines were processed.")
+    if skipped_files:
+        print("\nSkipped files:")
+        for filename, reason in skipped_files:
+            print(f"- {filename}: {reason}")
+
+def create_es_index(index_name):
+    """
+    Create an Elasticsearch index with the transcript line mappings. Lines
+    refer to their episode by episode_id; the title, description, url and
+    filename are stored once per episode in the episodes index.
+    """
     print(f"Creating new index: {index_name}")
     mapping = {
         "mappings": {
             "properties": {
-                "title": {"type": "keyword"},  # Changed to keyword for exact matches
-                "description": {"type": "text"},
+                "episode_id": {"type": "keyword"},
                 "date": {"type": "date"},
                 "text": {"type": "text"},
                 "line_index": {"type": "keyword"},
                 "timecode": {"type": "keyword"},
-                "url": {"type": "keyword"},
-                "filename": {"type": "keyword"}
+                "content_hash": {"type": "keyword"}
             }
         }
     }
@@ -164,52 +150,547 @@ def create_es_index(index_name=ELASTICSEARCH_INDEX):
     es.indices.create(index=index_name, body=mapping)
     return index_name
 
-def index_files(index_name, metadata):
+def create_episodes_index(index_name):
+    """Create an index for episode metadata documents, one per episode."""
+    print(f"Creating new index: {index_name}")
+    mapping = {
+        "mappings": {
+            "properties": {
+                "title": {"type": "keyword"},  # Changed to keyword for exact matches
+                "description": {"type": "text"},
+                "date": {"type": "date"},
+                "url": {"type": "keyword"},
+                "filename": {"type": "keyword"},
+                "content_hash": {"type": "keyword"}
+            }
+        }
+    }
+    es.indices.create(index=index_name, body=mapping)
+    return index_name
+
+def versioned_index_name(alias=ELASTICSEARCH_INDEX):
+    """
+    Name for a new generation of the index behind an alias, e.g.
+    podcast-20261017093000123456. The microseconds keep two builds started
+    in the same second apart.
+    """
+    return f"{alias}-{datetime.datetime.now():%Y%m%d%H%M%S%f}"
+
+def paired_episodes_index(index_name, alias=ELASTICSEARCH_INDEX, episodes_alias=ELASTICSEARCH_EPISODES_INDEX):
+    """
+    Return the episodes index that belongs with a lines index. Each
+    generation of lines has its own episodes index with the same timestamp,
+    e.g. podcast-20261017093000 and podcast_episodes-20261017093000; the
+    live alias pairs with the live episodes alias.
+    """
+    if index_name == alias:
+        return episodes_alias
+    return episodes_alias + index_name[len(alias):]
+
+def index_generations(alias=ELASTICSEARCH_INDEX):
+    """Return the versioned indices for an alias, oldest first."""
+    # Generations built before microseconds were added have 14 digits
+    pattern = re.compile(rf"^{re.escape(alias)}-\d{{14}}(\d{{6}})?$")
+    indices = es.indices.get(index=f"{alias}-*", ignore_unavailable=True, allow_no_indices=True)
+    return sorted(name for name in indices if pattern.match(name))
+
+def alias_target(alias=ELASTICSEARCH_INDEX):
+    """Return the index the alias points to, or None if the alias doesn't exist."""
+    if not es.indices.exists_alias(name=alias):
+        return None
+    return next(iter(es.indices.get_alias(name=alias)))
+
+def alias_actions(index_name, alias):
+    """Return the update_aliases actions that move alias to index_name, and its current target."""
+    actions = []
+    current = alias_target(alias)
+    if current:
+        actions.append({"remove": {"index": current, "alias": alias}})
+    elif es.indices.exists(index=alias):
+        print(f"Replacing unversioned index {alias} with an alias")
+        actions.append({"remove_index": {"index": alias}})
+    actions.append({"add": {"index": index_name, "alias": alias}})
+    return actions, current
+
+def swap_alias(index_name, alias=ELASTICSEARCH_INDEX, episodes_alias=ELASTICSEARCH_EPISODES_INDEX):
+    """
+    Point the alias at index_name, and the episodes alias at its paired
+    episodes index if there is one, in a single atomic update, so searches
+    move from the old generation to the new one with no gap and never see
+    lines and episode metadata from different generations. Old concrete
+    indices with the aliases' names are removed in the same update.
+    """
+    actions, current = alias_actions(index_name, alias)
+    episodes_index = paired_episodes_index(index_name, alias, episodes_alias)
+    if es.indices.exists(index=episodes_index):
+        actions.extend(alias_actions(episodes_index, episodes_alias)[0])
+    es.indices.update_aliases(actions=actions)
+    print(f"Alias {alias}: {current or alias} -> {index_name}")
+
+def validate_index(index_name, expected, alias=ELASTICSEARCH_INDEX, min_ratio=ES_MIN_COUNT_RATIO):
+    """
+    Check a freshly loaded index before it goes live: it must hold every
+    document that was indexed, and not be much smaller than the index
+    currently behind the alias. Returns a list of problems, empty if none.
+    """
+    problems = []
+    es.indices.refresh(index=index_name)
+    count = es.count(index=index_name)['count']
+    if count == 0:
+        problems.append(f"{index_name} is empty")
+    if count != expected:
+        problems.append(f"{index_name} has {count} documents, expected {expected}")
+    if es.indices.exists(index=alias):
+        live = es.count(index=alias)['count']
+        if count < live * min_ratio:
+            problems.append(f"{index_name} has {count} documents, the live index has {live} "
+                            f"(minimum ratio {min_ratio})")
+    print(f"{index_name}: {count} documents")
+    return problems
+
+def prune_generations(alias=ELASTICSEARCH_INDEX, keep=ES_KEEP_GENERATIONS):
+    """
+    Delete all but the newest `keep` generations that the alias doesn't
+    point to, together with their episodes indices.
+    """
+    current = alias_target(alias)
+    previous = [name for name in index_generations(alias) if name != current]
+    stale = previous[:-keep] if keep > 0 else previous
+    for name in stale:
+        print(f"Deleting old index: {name}")
+        es.indices.delete(index=name)
+        es.indices.delete(index=paired_episodes_index(name, alias), ignore_unavailable=True)
+    return stale
+
+def rollback(alias=ELASTICSEARCH_INDEX):
+    """Point the alias back at the generation before the current one."""
+    current = alias_target(alias)
+    older = [name for name in index_generations(alias) if current is None or name < current]
+    if not older:
+        print(f"No earlier generation of {alias} to roll back to")
+        return None
+    swap_alias(older[-1], alias)
+    return older[-1]
+
+def ensure_es_index(alias=ELASTICSEARCH_INDEX, episodes_alias=ELASTICSEARCH_EPISODES_INDEX):
+    """
+    Create a first generation behind the alias if it doesn't exist, leaving
+    an existing index untouched. A live index without episode metadata gets
+    an empty episodes index paired with it.
+    """
+    if not es.indices.exists(index=alias):
+        index_name = create_es_index(versioned_index_name(alias))
+        create_episodes_index(paired_episodes_index(index_name, alias, episodes_alias))
+        swap_alias(index_name, alias, episodes_alias)
+    elif not es.indices.exists(index=episodes_alias):
+        episodes_index = paired_episodes_index(alias_target(alias) or alias, alias, episodes_alias)
+        create_episodes_index(episodes_index)
+        if episodes_index != episodes_alias:
+            es.indices.update_aliases(actions=[{"add": {"index": episodes_index, "alias": episodes_alias}}])
+    return alias
+
+def has_episode_ids(index_name):
+    """True if an index uses the episode_id line mappings rather than per-line episode metadata."""
+    mapping = es.indices.get_mapping(index=index_name)
+    return 'episode_id' in next(iter(mapping.values()))['mappings'].get('properties', {})
+
+def read_srt_file(filepath):
+    """Read one SRT file and return ([(index, timecode, text), ...], sha256 of the file)."""
+    transcript, file_hash = load_srt(filepath)
+    if not len(transcript):
+        raise srt.SRTParseError("File does not appear to be in SRT format", 0, 0, "")
+    indices = [str(index) for index in transcript.index.tolist()]
+    return list(zip(indices, transcript.timecodes(), transcript.contents())), file_hash
+
+def read_srt_lines(filepath):
+    """Read one SRT file and return a list of (index, timecode, text) tuples."""
+    return read_srt_file(filepath)[0]
+
+def episode_hash(data, file_hash):
+    """
+    Hash of an episode's transcript file and database metadata. It is stored
+    on every line, so a later run can tell whether the indexed copy of the
+    episode is still current.
+    """
+    payload = json.dumps([file_hash, data['title'], data['description'], data['url'], data['date']])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def episode_id(filename):
+    """ID of an episode's document in the episodes index, shared by its lines."""
+    return episode_basename(filename)
+
+def episode_actions(index_name, data):
+    """Generate the bulk actions for every line of one episode."""
+    # Convert date string to ISO format for Elasticsearch, once per episode
+    date = datetime.datetime.strptime(data['date'], "%Y%m%d").isoformat()
+    ep_id = episode_id(data['filename'])
+    for line_index, timecode, line in data['text']:
+        yield {
+            "_index": index_name,
+            "_id": f"{ep_id}_{line_index}",
+            "_source": {
+                "episode_id": ep_id,
+                "date": date,
+                "text": line,
+                "line_index": line_index,
+                "timecode": timecode,
+                "content_hash": data.get('content_hash')
+            }
+        }
+
+def episode_doc_action(data, index_name=ELASTICSEARCH_EPISODES_INDEX):
+    """Bulk action for an episode's metadata document."""
+    return {
+        "_index": index_name,
+        "_id": episode_id(data['filename']),
+        "_source": {
+            "title": data['title'],
+            "description": data['description'],
+            "date": datetime.datetime.strptime(data['date'], "%Y%m%d").isoformat(),
+            "url": data['url'],
+            "filename": data['filename'],
+            "content_hash": data.get('content_hash')
+        }
+    }
+
+def delete_episode_docs(ids, index_name=ELASTICSEARCH_EPISODES_INDEX):
+    """Delete the episode documents with the given ids."""
+    query = {"ids": {"values": list(ids)}}
+    return es.delete_by_query(index=index_name, query=query, conflicts='proceed', refresh=True)['deleted']
+
+@contextmanager
+def bulk_load_settings(index_name):
+    """
+    Turn off refreshes and replicas on an index for the duration of a bulk
+    load, then restore the previous settings and refresh once.
+    """
+    settings = es.indices.get_settings(index=index_name)[index_name]['settings']['index']
+    previous = {
+        'refresh_interval': settings.get('refresh_interval'),  # None restores the default
+        'number_of_replicas': settings.get('number_of_replicas', 1),
+    }
+    es.indices.put_settings(index=index_name, settings={'refresh_interval': '-1', 'number_of_replicas': 0})
+    try:
+        yield
+    finally:
+        es.indices.put_settings(index=index_name, settings=previous)
+        es.indices.refresh(index=index_name)
+
+def iter_bulk_batches(actions, chunk_size=ES_BULK_CHUNK_SIZE, chunk_bytes=ES_BULK_CHUNK_BYTES):
+    """Group actions into batches of at most chunk_size documents and roughly chunk_bytes."""
+    batch = []
+    batch_bytes = 0
+    for action in actions:
+        size = len(json.dumps(action['_source'])) + len(action['_index']) + len(action['_id']) + 40
+        if batch and (len(batch) >= chunk_size or batch_bytes + size > chunk_bytes):
+            yield batch
+            batch = []
+            batch_bytes = 0
+        batch.append(action)
+        batch_bytes += size
+    if batch:
+        yield batch
+
+def send_bulk_batch(batch_no, batch, max_retries=ES_BULK_MAX_RETRIES, initial_backoff=1):
+    """
+    Send one batch with the bulk API, retrying documents that were rejected
+    because the cluster's write queue was full (HTTP 429). Returns the
+    batch's statistics.
+    """
+    start_time = time.monotonic()
+    stats = {'batch': batch_no, 'docs': len(batch), 'indexed': 0, 'rejected': 0, 'retries': 0, 'failed': 0}
+    pending = batch
+    for attempt in range(max_retries + 1):
+        operations = []
+        for action in pending:
+            operations.append({'index': {'_index': action['_index'], '_id': action['_id']}})
+            operations.append(action['_source'])
+        response = es.bulk(operations=operations)
+
+        rejected = []
+        for action, item in zip(pending, response['items']):
+            status = item['index']['status']
+            if status == 429:
+                rejected.append(action)
+            elif status >= 300:
+                stats['failed'] += 1
+            else:
+                stats['indexed'] += 1
+        stats['rejected'] += len(rejected)
+        if not rejected:
+            break
+        if attempt == max_retries:
+            stats['failed'] += len(rejected)
+            break
+        stats['retries'] += 1
+        time.sleep(initial_backoff * 2 ** attempt)
+        pending = rejected
+    stats['seconds'] = time.monotonic() - start_time
+    return stats
+
+def parallel_index(actions, threads=ES_BULK_THREADS, chunk_size=ES_BULK_CHUNK_SIZE,
+                   chunk_bytes=ES_BULK_CHUNK_BYTES, max_retries=ES_BULK_MAX_RETRIES):
+    """
+    Stream actions to Elasticsearch as bulk requests on several threads,
+    with a bounded number in flight so memory stays flat. Prints each
+    batch's rejections and retries and returns the totals.
+    """
+    totals = {'docs': 0, 'indexed': 0, 'rejected': 0, 'retries': 0, 'failed': 0}
+    
+    def report(stats):
+        for key in totals:
+            totals[key] += stats[key]
+        print(f"Batch {stats['batch']}: {stats['indexed']}/{stats['docs']} indexed, "
+              f"{stats['rejected']} rejected, {stats['retries']} retries, "
+              f"{stats['failed']} failed in {stats['seconds']:.2f}s")
+    
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        in_flight = deque()
+        for batch_no, batch in enumerate(iter_bulk_batches(actions, chunk_size, chunk_bytes), 1):
+            in_flight.append(executor.submit(send_bulk_batch, batch_no, batch, max_retries))
+            if len(in_flight) >= 2 * threads:
+                report(in_flight.popleft().result())
+        while in_flight:
+            report(in_flight.popleft().result())
+    return totals
+
+def index_files(index_name, episodes, threads=ES_BULK_THREADS, chunk_size=ES_BULK_CHUNK_SIZE,
+                chunk_bytes=ES_BULK_CHUNK_BYTES, max_retries=ES_BULK_MAX_RETRIES):
+    """
+    Bulk index episodes, an iterable of (title, data) pairs such as
+    ep_metadata() yields. Actions are generated lazily, so episodes are
+    read only as fast as Elasticsearch accepts them. Each episode's
+    metadata document follows its lines in the same stream, to the
+    episodes index paired with index_name. The totals count both kinds of
+    document; totals['episodes'] is the number of metadata documents.
+    """
+    episodes_index = paired_episodes_index(index_name)
+    n_episodes = 0
+    
     def generate_actions():
+        nonlocal n_episodes
         # Generate the actions for the bulk indexing
-        for title, data in metadata.items():
-            for line_index, timecode, line in data['text']:
-                # Convert date string to ISO format for Elasticsearch
-                date_str = data['date']
-                date_obj = datetime.datetime.strptime(date_str, "%Y%m%d")
-                
-                yield {
-                    "_index": index_name,
-                    "_id": f"{title}_{line_index}",  # Using title instead of episode number
-                    "_source": {
-                        "title": title,
-                        "description": data['description'],
-                        "date": date_obj.isoformat(),
-                        "text": line,
-                        "line_index": line_index,
-                        "timecode": timecode,
-                        "url": data['url'],
-                        "filename": data['filename']
-                    }
-                }
+        for title, data in episodes:
+            yield from episode_actions(index_name, data)
+            n_episodes += 1
+            yield episode_doc_action(data, episodes_index)
 
     # Perform bulk indexing
-    success, failed = bulk(es, generate_actions())
-    print(f"Indexed {success} documents. Failed: {failed}")
+    start_time = time.monotonic()
+    totals = parallel_index(generate_actions(), threads, chunk_size, chunk_bytes, max_retries)
+    totals['episodes'] = n_episodes
+    elapsed = time.monotonic() - start_time
+    print(f"Indexed {totals['indexed']} documents in {elapsed:.1f}s "
+          f"({totals['indexed'] / elapsed if elapsed else 0:.0f} docs/sec). "
+          f"Rejected: {totals['rejected']}, retries: {totals['retries']}, failed: {totals['failed']}")
+    return totals
 
-def main():
-    # Fetch metadata (unchanged)
-    print("Fetching metadata...")
-    metadata = ep_metadata(tscript_dir)
-
-    # Create/verify index
-    print("Creating/verifying Elasticsearch index...")
-    index_name = create_es_index()
-    print(f"Index created: {index_name}")
-    # Index the files
-    print("Indexing files...")
-    index_files(index_name, metadata)
+def index_episode(index_name, filename, title, description, url, date):
+    """Index the lines of a single transcript into an existing index."""
+    lines, file_hash = read_srt_file(os.path.join(tscript_dir, filename))
+    data = {
+        'filename': filename,
+        'description': description,
+        'title': title,
+        'date': date,
+        'url': url,
+        'text': lines,
+    }
+    data['content_hash'] = episode_hash(data, file_hash)
+    bulk(es, [episode_doc_action(data, paired_episodes_index(index_name))])
+    success, failed = bulk(es, episode_actions(index_name, data))
+    # A re-transcribed episode may have fewer lines, so drop any lines left
+    # over from the previous version
+    delete_stale_lines(index_name, {episode_id(filename): data['content_hash']})
+    return success
 
-if __name__ == '__main__':
-    main()
+def get_indexed_hashes(index_name, page_size=1000):
+    """
+    Return {episode_id: content_hash} for the episodes in an index. An episode
+    whose lines carry more than one hash (or none) maps to None, so it is
+    always treated as changed.
+    """
+    indexed = {}
+    aggs = {
+        "episodes": {
+            "composite": {"size": page_size, "sources": [{"episode_id": {"terms": {"field": "episode_id"}}}]},
+            "aggs": {"hashes": {"terms": {"field": "content_hash", "size": 2}}}
+        }
+    }
+    while True:
+        response = es.search(index=index_name, size=0, aggs=aggs)
+        result = response['aggregations']['episodes']
+        for bucket in result['buckets']:
+            hashes = bucket['hashes']['buckets']
+            hashed_lines = sum(h['doc_count'] for h in hashes)
+            complete = len(hashes) == 1 and hashed_lines == bucket['doc_count']
+            indexed[bucket['key']['episode_id']] = hashes[0]['key'] if complete else None
+        if 'after_key' not in result or not result['buckets']:
+            return indexed
+        aggs['episodes']['composite']['after'] = result['after_key']
 
+def delete_stale_lines(index_name, current, removed=()):
+    """
+    Delete lines of the episodes in current ({episode_id: content_hash}) that
+    carry any other hash, and every line of the episode ids in removed.
+    Returns the number of documents deleted.
+    """
+    clauses = [{"bool": {"filter": [{"term": {"episode_id": ep_id}}],
+                         "must_not": [{"term": {"content_hash": content_hash}}]}}
+               for ep_id, content_hash in current.items()]
+    removed = list(removed)
+    if removed:
+        clauses.append({"terms": {"episode_id": removed}})
+    deleted = 0
+    # Keep each request's query well under the default clause limit
+    for i in range(0, len(clauses), 500):
+        response = es.delete_by_query(index=index_name, query={"bool": {"should": clauses[i:i + 500]}},
+                                      conflicts='proceed', refresh=True)
+        deleted += response['deleted']
+    return deleted
 
+def sync_files(index_name, episodes, threads=ES_BULK_THREADS, chunk_size=ES_BULK_CHUNK_SIZE,
+               chunk_bytes=ES_BULK_CHUNK_BYTES, max_retries=ES_BULK_MAX_RETRIES):
+    """
+    Bring an index in line with episodes without rebuilding it.
 
+    Only episodes that are new or whose transcript or metadata changed are
+    indexed. Lines left over from their previous versions, and the lines of
+    episodes no longer produced, are then deleted along with their episode
+    documents. episodes must be the complete set of (title, data) pairs, as
+    ep_metadata() yields. Returns a dict of unchanged/indexed/removed
+    episode counts, the changed episode ids and the number of lines deleted.
+    """
+    indexed = get_indexed_hashes(index_name)
+    seen = set()
+    changed = {}
+    stats = {'unchanged': 0, 'indexed': 0, 'removed': 0, 'deleted': 0, 'failed': 0}
+    
+    def changed_episodes():
+        for title, data in episodes:
+            ep_id = episode_id(data['filename'])
+            seen.add(ep_id)
+            if indexed.get(ep_id) == data['content_hash']:
+                stats['unchanged'] += 1
+                continue
+            changed[ep_id] = data['content_hash']
+            yield title, data
+    
+    totals = index_files(index_name, changed_episodes(), threads, chunk_size, chunk_bytes, max_retries)
+    es.indices.refresh(index=index_name)
+    removed = [ep_id for ep_id in indexed if ep_id not in seen]
+    # Old lines are only dropped once the new ones are in, so a changed
+    # episode never disappears from search. If any line failed, keep the old
+    # ones: the episode's hashes stay mixed and it is retried next run.
+    stale = {}
+    if not totals['failed']:
+        stale = {ep_id: content_hash for ep_id, content_hash in changed.items() if ep_id in indexed}
+    if stale or removed:
+        stats['deleted'] = delete_stale_lines(index_name, stale, removed)
+    if removed:
+        delete_episode_docs(removed, paired_episodes_index(index_name))
+    stats.update(indexed=len(changed), removed=len(removed), failed=totals['failed'], episodes=list(changed))
+    return stats
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Index podcast transcripts in Elasticsearch')
+    parser.add_argument('--threads', type=int, default=ES_BULK_THREADS,
+                      help=f'Concurrent bulk requests (default: {ES_BULK_THREADS})')
+    parser.add_argument('--chunk-size', type=int, default=ES_BULK_CHUNK_SIZE,
+                      help=f'Max documents per bulk request (default: {ES_BULK_CHUNK_SIZE})')
+    parser.add_argument('--chunk-bytes', type=int, default=ES_BULK_CHUNK_BYTES,
+                      help=f'Max bytes per bulk request (default: {ES_BULK_CHUNK_BYTES})')
+    parser.add_argument('--full', action='store_true',
+                      help='Build a new index generation and swap the alias instead of updating incrementally')
+    parser.add_argument('--force-merge', action='store_true', default=ES_FORCE_MERGE,
+                      help='Force-merge the index to a single segment after loading')
+    parser.add_argument('--keep', type=int, default=ES_KEEP_GENERATIONS,
+                      help=f'Previous index generations to keep for rollback (default: {ES_KEEP_GENERATIONS})')
+    parser.add_argument('--rollback', action='store_true',
+                      help='Point the alias back at the previous generation and exit')
+    return parser.parse_args()
 
+def sync_index(alias, args):
+    """Index only new or changed episodes into the live index behind the alias."""
+    index_name = ensure_es_index(alias)
+    if not has_episode_ids(index_name):
+        print(f"{index_name} stores episode metadata on every line; run with --full to rebuild it")
+        return
+    print(f"Updating {index_name} incrementally...")
+    start_time = time.monotonic()
+    stats = sync_files(index_name, ep_metadata(tscript_dir), args.threads, args.chunk_size, args.chunk_bytes)
+    print(f"\nIndexed {stats['indexed']} new or changed episodes, skipped {stats['unchanged']} unchanged, "
+          f"removed {stats['removed']}; deleted {stats['deleted']} stale lines "
+          f"in {time.monotonic() - start_time:.1f}s")
+    if stats['failed']:
+        print(f"{stats['failed']} documents failed to index; changed episodes will be retried next run.")
+        return
+    if args.force_merge:
+        print("Force-merging index...")
+        es.indices.forcemerge(index=index_name, max_num_segments=1)
+    mark_stages([(ep_id, None, None) for ep_id in stats['episodes']], 'es_indexed')
+    # Drop parsed columns of transcripts that were replaced or deleted
+    print(f"Removed {prune_cache(transcript_hashes(tscript_dir))} stale SRT cache files")
 
+def main():
+    args = parse_args()
+    alias = ELASTICSEARCH_INDEX
+    if args.rollback:
+        rollback(alias)
+        return
+    if not args.full:
+        sync_index(alias, args)
+        return
+    # Build a new generation alongside the live index; searches keep using
+    # the alias until the new one has been loaded and checked
+    print("Creating Elasticsearch index...")
+    index_name = versioned_index_name(alias)
+    episodes_index = paired_episodes_index(index_name)
+    indexed_files = []
+    
+    def stream_episodes():
+        for title, data in ep_metadata(tscript_dir):
+            indexed_files.append(data['filename'])
+            yield title, data
+    
+    try:
+        create_es_index(index_name)
+        create_episodes_index(episodes_index)
+        print(f"Index created: {index_name}")
+        # Read and index the files one episode at a time, with refreshes and
+        # replicas off until the load is done
+        print("Indexing files...")
+        with bulk_load_settings(index_name):
+            totals = index_files(index_name, stream_episodes(), args.threads, args.chunk_size, args.chunk_bytes)
+        problems = validate_index(index_name, totals['indexed'] - totals['episodes'], alias)
+        problems += validate_index(episodes_index, len(indexed_files), ELASTICSEARCH_EPISODES_INDEX)
+        if totals['failed']:
+            problems.append(f"{totals['failed']} documents failed to index")
+        if problems:
+            print("Not swapping the aliases:")
+            for problem in problems:
+                print(f"- {problem}")
+        elif args.force_merge:
+            print("Force-merging index...")
+            es.indices.forcemerge(index=index_name, max_num_segments=1)
+    except BaseException:
+        # prune_generations never reaches an index newer than the alias
+        # target, so a build that dies part-way has to clean up after itself
+        print(f"Indexing failed; deleting {index_name} and {episodes_index}")
+        es.indices.delete(index=index_name, ignore_unavailable=True)
+        es.indices.delete(index=episodes_index, ignore_unavailable=True)
+        raise
+    if problems:
+        print(f"Deleting {index_name} and {episodes_index}; {alias} is unchanged.")
+        es.indices.delete(index=index_name)
+        es.indices.delete(index=episodes_index)
+        return
+    swap_alias(index_name, alias)
+    prune_generations(alias, args.keep)
+    mark_stages([(episode_basename(filename), None, None) for filename in indexed_files], 'es_indexed')
+    # Every current transcript was just read, so cached columns for any
+    # other hash belong to transcripts that were replaced or removed
+    print(f"Removed {prune_cache(transcript_hashes(tscript_dir))} stale SRT cache files")
 
+if __name__ == '__main__':
+    main()
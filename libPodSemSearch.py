@@ -10,6 +10,10 @@ from tqdm import tqdm
 import sys
 import psycopg2
 from psycopg2 import Error
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
+import atexit
+from contextlib import contextmanager
 import os
 
 # Fetch to Transcript imports
@@ -19,6 +23,21 @@ from datetime import datetime
 import subprocess
 import glob
 import feedparser
+import json
+import re
+import shutil
+import tempfile
+import srt
+from datetime import timedelta
+import threading
+import time
+import hashlib
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+
+ITUNES_NS = 'http://www.itunes.com/dtds/podcast-1.0.dtd'
 
 # -----------------------------------------------------------------------------
 # Configure logging
@@ -29,112 +48,586 @@ logger.setLevel(logging.INFO)
 # -----------------------------------------------------------------------------
 # Database functions
 # -----------------------------------------------------------------------------
+_db_config = None
+_db_pool = None
+_db_pool_slots = None
+_db_pool_lock = threading.Lock()
+_db_pool_stats = {'checkouts': 0, 'wait_seconds': 0.0, 'max_wait_seconds': 0.0}
+
+def get_db_config():
+    """Load the PostgreSQL connection settings from the environment once per process."""
+    global _db_config
+    if _db_config is None:
+        load_dotenv('.env')
+        _db_config = {
+            'database': os.getenv('POSTGRES_DB', 'podcast-search'),
+            'user': os.getenv('POSTGRES_USER', 'podsearcher'),
+            'password': os.getenv('POSTGRES_PASSWORD'),
+            'host': os.getenv('POSTGRES_HOST', 'localhost'),
+            'port': os.getenv('POSTGRES_PORT', '5432'),
+        }
+    return _db_config
+
 def get_db_connection():
-    """Create a database connection using environment variables."""
-    load_dotenv('.env')
+    """Create a standalone database connection using environment variables."""
     try:
-        connection = psycopg2.connect(
-            database=os.getenv('POSTGRES_DB', 'podcast-search'),
-            user=os.getenv('POSTGRES_USER', 'podsearcher'),
-            password=os.getenv('POSTGRES_PASSWORD'),
-            host=os.getenv('POSTGRES_HOST', 'localhost'),
-            port=os.getenv('POSTGRES_PORT', '5432')
-        )
-        return connection
+        return psycopg2.connect(**get_db_config())
     except Error as e:
         logger.error(f"Error connecting to PostgreSQL: {e}")
         raise
 
+def get_db_pool():
+    """Return the process-wide connection pool, creating it on first use."""
+    global _db_pool, _db_pool_slots
+    with _db_pool_lock:
+        if _db_pool is None:
+            from config import DB_POOL_MIN, DB_POOL_MAX
+            try:
+                _db_pool = ThreadedConnectionPool(DB_POOL_MIN, DB_POOL_MAX, **get_db_config())
+            except Error as e:
+                logger.error(f"Error connecting to PostgreSQL: {e}")
+                raise
+            # psycopg2 raises instead of waiting when the pool is empty, so
+            # gate checkouts with a semaphore of the same size
+            _db_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+            atexit.register(close_db_pool)
+        return _db_pool
+
+@contextmanager
+def db_connection():
+    """
+    Check a connection out of the shared pool for the duration of a with block.
+
+    Uncommitted work is rolled back if the block raises, and the connection
+    is returned to the pool rather than closed.
+    """
+    pool = get_db_pool()
+    start_time = time.monotonic()
+    _db_pool_slots.acquire()
+    try:
+        connection = pool.getconn()
+    except Exception:
+        _db_pool_slots.release()
+        raise
+    wait_seconds = time.monotonic() - start_time
+
+    with _db_pool_lock:
+        _db_pool_stats['checkouts'] += 1
+        _db_pool_stats['wait_seconds'] += wait_seconds
+        _db_pool_stats['max_wait_seconds'] = max(_db_pool_stats['max_wait_seconds'], wait_seconds)
+
+    try:
+        yield connection
+    except Exception:
+        if not connection.closed:
+            connection.rollback()
+        raise
+    finally:
+        pool.putconn(connection, close=bool(connection.closed))
+        _db_pool_slots.release()
+
+def get_db_pool_stats():
+    """Return a snapshot of pool usage: checkouts and time spent waiting for a connection."""
+    with _db_pool_lock:
+        stats = dict(_db_pool_stats)
+    checkouts = stats['checkouts']
+    stats['avg_wait_seconds'] = stats['wait_seconds'] / checkouts if checkouts else 0.0
+    return stats
+
+def close_db_pool():
+    """Close every connection held by the pool."""
+    global _db_pool
+    with _db_pool_lock:
+        if _db_pool is not None:
+            _db_pool.closeall()
+            _db_pool = None
+
 def setup_database():
     """Create the necessary database schema if it doesn't exist."""
-    connection = None
-    cursor = None
-    try:
-        connection = get_db_connection()
+    with db_connection() as connection:
         cursor = connection.cursor()
-        
-        # First, try to alter the existing table to make number nullable
         try:
+            # First, try to alter the existing table to make number nullable
+            try:
+                cursor.execute("""
+                    ALTER TABLE episodes 
+                    ALTER COLUMN number DROP NOT NULL;
+                """)
+                print("Modified 'number' column to be nullable")
+                connection.commit()
+            except Exception as e:
+                connection.rollback()  # Rollback failed alter attempt
+                print(f"Note: Could not modify 'number' column: {e}")
+            
+            # Create episodes table if it doesn't exist
             cursor.execute("""
-                ALTER TABLE episodes 
-                ALTER COLUMN number DROP NOT NULL;
+                CREATE TABLE IF NOT EXISTS episodes (
+                    id SERIAL PRIMARY KEY,
+                    title TEXT UNIQUE NOT NULL,
+                    date DATE NOT NULL,
+                    number VARCHAR(4),
+                    description TEXT,
+                    filename TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
             """)
-            print("Modified 'number' column to be nullable")
+
+            # Feed GUIDs let the streaming feed reader recognise known episodes
+            cursor.execute("ALTER TABLE episodes ADD COLUMN IF NOT EXISTS guid TEXT;")
+            
             connection.commit()
+            logger.info("Database schema created/updated successfully")
         except Exception as e:
-            connection.rollback()  # Rollback failed alter attempt
-            print(f"Note: Could not modify 'number' column: {e}")
-        
-        # Create episodes table if it doesn't exist
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS episodes (
-                id SERIAL PRIMARY KEY,
-                title TEXT UNIQUE NOT NULL,
-                date DATE NOT NULL,
-                number VARCHAR(4),
-                description TEXT,
-                filename TEXT NOT NULL,
-                url TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
-        """)
-        
-        connection.commit()
-        logger.info("Database schema created/updated successfully")
-    except Exception as e:
-        if connection:
             connection.rollback()
-        logger.error(f"Error creating/updating database schema: {e}")
-        raise
-    finally:
-        if cursor:
+            logger.error(f"Error creating/updating database schema: {e}")
+            raise
+        finally:
             cursor.close()
-        if connection:
-            connection.close()
+    setup_pipeline_state()
 
 def add_episodes(episode_dict):
-    """Add new episodes to the database, skipping existing ones."""
-    new_episodes = []
-    connection = get_db_connection()
-    cursor = connection.cursor()
-    
-    try:
-        for episode in episode_dict:
-            title = episode_dict[episode]['title']
-            url = episode_dict[episode]['url']
-            description = episode_dict[episode]['description']
-            date = episode_dict[episode]['date']
-            filename = episode_dict[episode]['filename']
+    """
+    Add new episodes to the database, skipping existing ones.
+
+    All episodes are sent in a single multi-row INSERT ... ON CONFLICT DO
+    NOTHING, and only the rows that were actually inserted are returned.
+    """
+    rows = [
+        (
+            episode['title'],
+            episode['date'],
+            episode['description'],
+            episode['filename'],
+            episode['url'],
+            episode.get('guid'),
+        )
+        for episode in episode_dict.values()
+    ]
+    columns = ['title', 'date', 'description', 'filename', 'url']
+    if not rows:
+        print('Found 0 new episodes for download.')
+        return pd.DataFrame([], columns=columns)
+
+    with db_connection() as connection:
+        cursor = connection.cursor()
+        try:
+            new_episodes = execute_values(
+                cursor,
+                """
+                INSERT INTO episodes (title, date, description, filename, url, guid)
+                VALUES %s
+                ON CONFLICT (title) DO NOTHING
+                RETURNING title, date, description, filename, url
+                """,
+                rows,
+                page_size=1000,
+                fetch=True,
+            )
             
-            # Check if episode exists
-            cursor.execute("SELECT title FROM episodes WHERE title = %s", (title,))
-            if not cursor.fetchone():
-                cursor.execute("""
-                    INSERT INTO episodes (title, date, description, filename, url)
-                    VALUES (%s, %s, %s, %s, %s)
-                    """, (title, date, description, filename, url))
-                new_episodes.append([title, date, description, filename, url])
-        
-        connection.commit()
-        print(f'Found {len(new_episodes)} new episodes for download.')
-        
-        # Convert to DataFrame for compatibility with existing code
-        if new_episodes:
-            df_metadata = pd.DataFrame(new_episodes, columns=['title', 'date', 'description', 'filename', 'url'])
-        else:
-            # Get all episodes from database
-            cursor.execute("SELECT title, date, description, filename, url FROM episodes ORDER BY date DESC")
-            df_metadata = pd.DataFrame(cursor.fetchall(), columns=['title', 'date', 'description', 'filename', 'url'])
+            connection.commit()
+            print(f'Found {len(new_episodes)} new episodes for download.')
+            
+            # Convert to DataFrame for compatibility with existing code
+            return pd.DataFrame(new_episodes, columns=columns)
         
-        return df_metadata
-    
-    except Error as e:
-        connection.rollback()
-        logger.error(f"Error adding episodes to database: {e}")
-        raise
-    finally:
-        cursor.close()
-        connection.close()
+        except Error as e:
+            connection.rollback()
+            logger.error(f"Error adding episodes to database: {e}")
+            raise
+        finally:
+            cursor.close()
+
+def get_known_episode_keys():
+    """Return the set of titles and feed GUIDs already stored in the database."""
+    with db_connection() as connection:
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT title, guid FROM episodes")
+            known_keys = set()
+            for title, guid in cursor.fetchall():
+                known_keys.add(title)
+                if guid:
+                    known_keys.add(guid)
+            return known_keys
+        finally:
+            cursor.close()
+
+def get_episode_records(filenames=None):
+    """
+    Fetch episode metadata keyed by transcript filename in one query.
+
+    Returns {filename: (title, description, url, date)}; all episodes are
+    returned if filenames is None.
+    """
+    with db_connection() as connection:
+        cursor = connection.cursor()
+        try:
+            if filenames is None:
+                cursor.execute("SELECT filename, title, description, url, date FROM episodes")
+            else:
+                cursor.execute("""
+                    SELECT filename, title, description, url, date
+                    FROM episodes
+                    WHERE filename = ANY(%s)
+                """, (list(filenames),))
+            return {row[0]: row[1:] for row in cursor.fetchall()}
+        finally:
+            cursor.close()
+
+# -----------------------------------------------------------------------------
+# Pipeline state functions
+# -----------------------------------------------------------------------------
+# Every episode is keyed by its file basename (YYYYMMDD_TITLE), which the
+# audio file and the transcript share. Each stage records its status, a
+# content hash where one is meaningful and how long the stage took.
+PIPELINE_STAGES = ('discovered', 'downloaded', 'transcribed', 'chunked', 'es_indexed', 'chroma_indexed')
+_pipeline_state_ready = False
+
+def setup_pipeline_state():
+    """
+    Create the pipeline_state table if it doesn't exist, and seed it from
+    the files on disk while no episode is recorded as downloaded or
+    transcribed.
+
+    The indexers record their own stages, so they can create the table
+    before any fetch has run; without seeding, the download and transcribe
+    planners would treat the whole back catalogue as new.
+    """
+    global _pipeline_state_ready
+    if _pipeline_state_ready:
+        return
+    with db_connection() as connection:
+        cursor = connection.cursor()
+        try:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS pipeline_state (
+                    basename TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    content_hash TEXT,
+                    seconds REAL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (basename, stage)
+                );
+            """)
+            cursor.execute("""
+                SELECT 1 FROM pipeline_state
+                WHERE stage IN ('downloaded', 'transcribed') LIMIT 1
+            """)
+            seeded = cursor.fetchone() is not None
+            connection.commit()
+        finally:
+            cursor.close()
+    _pipeline_state_ready = True
+    if not seeded:
+        from config import audio_dir, tscript_dir
+        logger.info('Recording existing audio and transcripts in the pipeline state...')
+        sync_pipeline_state_from_disk(audio_dir, tscript_dir)
+
+def episode_basename(filename):
+    """Return the state key for an audio or transcript filename."""
+    return os.path.splitext(os.path.basename(filename))[0]
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def mark_stages(records, stage, status='done'):
+    """
+    Record a stage result for many episodes in one statement.
+
+    records is an iterable of (basename, content_hash, seconds) tuples.
+    """
+    if stage not in PIPELINE_STAGES:
+        raise ValueError(f"Unknown pipeline stage: {stage}")
+    rows = [(basename, stage, status, content_hash, seconds)
+            for basename, content_hash, seconds in records]
+    if not rows:
+        return
+    setup_pipeline_state()
+    with db_connection() as connection:
+        cursor = connection.cursor()
+        try:
+            execute_values(
+                cursor,
+                """
+                INSERT INTO pipeline_state (basename, stage, status, content_hash, seconds)
+                VALUES %s
+                ON CONFLICT (basename, stage) DO UPDATE SET
+                    status = EXCLUDED.status,
+                    content_hash = EXCLUDED.content_hash,
+                    seconds = EXCLUDED.seconds,
+                    updated_at = CURRENT_TIMESTAMP
+                """,
+                rows,
+                page_size=1000,
+            )
+            connection.commit()
+        finally:
+            cursor.close()
+
+def mark_stage(basename, stage, content_hash=None, seconds=None, status='done'):
+    """Record a stage result for a single episode."""
+    mark_stages([(basename, content_hash, seconds)], stage, status)
+
+def load_pipeline_state():
+    """Return {basename: {stage: status}} for every episode in one query."""
+    setup_pipeline_state()
+    with db_connection() as connection:
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT basename, stage, status FROM pipeline_state")
+            state = {}
+            for basename, stage, status in cursor.fetchall():
+                state.setdefault(basename, {})[stage] = status
+            return state
+        finally:
+            cursor.close()
+
+def stage_done(state, basename, stage):
+    """Return True if the episode has completed the given stage."""
+    return state.get(basename, {}).get(stage) == 'done'
+
+def episodes_pending(state, done_stage, pending_stage):
+    """Return sorted basenames that have finished done_stage but not pending_stage."""
+    return sorted(
+        basename for basename, stages in state.items()
+        if stages.get(done_stage) == 'done' and stages.get(pending_stage) != 'done'
+    )
+
+def sync_pipeline_state_from_disk(audio_dir, tscript_dir):
+    """
+    Seed the state table from the files already on disk.
+
+    Used when the table has no download or transcription records yet, or on
+    request, so existing audio and transcripts are not downloaded or
+    transcribed again.
+    """
+    audio_files = os.listdir(audio_dir) if os.path.isdir(audio_dir) else []
+    transcript_files = os.listdir(tscript_dir) if os.path.isdir(tscript_dir) else []
+    downloaded = [(episode_basename(f), None, None)
+                  for f in audio_files if f.endswith('.mp3')]
+    transcribed = []
+    for f in transcript_files:
+        path = os.path.join(tscript_dir, f)
+        if f.endswith('.srt') and verify_transcript(path):
+            transcribed.append((episode_basename(f), file_sha256(path), None))
+    mark_stages(downloaded, 'downloaded')
+    mark_stages(transcribed, 'transcribed')
+    logger.info(f"Recorded {len(downloaded)} downloaded and {len(transcribed)} transcribed episodes from disk")
+
+# -----------------------------------------------------------------------------
+# Transcription work queue functions
+# -----------------------------------------------------------------------------
+# Jobs live in Postgres so that any machine that can reach the database can
+# transcribe. Workers claim jobs with FOR UPDATE SKIP LOCKED and hold a lease
+# they must renew; a job whose lease expires (worker crashed or lost its
+# network) becomes claimable again. Finished SRTs are stored in the row and
+# written to tscript_dir by collect_transcriptions on the main node.
+def setup_work_queue():
+    """Create the transcription_jobs table if it doesn't exist."""
+    with db_connection() as connection:
+        cursor = connection.cursor()
+        try:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS transcription_jobs (
+                    basename TEXT PRIMARY KEY,
+                    audio_url TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    worker TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    lease_expires_at TIMESTAMP,
+                    transcript TEXT,
+                    error TEXT,
+                    collected BOOLEAN NOT NULL DEFAULT FALSE,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS transcription_jobs_claimable
+                ON transcription_jobs (created_at)
+                WHERE status IN ('queued', 'running');
+            """)
+            connection.commit()
+        finally:
+            cursor.close()
+
+def enqueue_transcriptions(jobs):
+    """
+    Queue (basename, audio_url) pairs for transcription.
+
+    Returns the number of newly queued jobs; episodes already in the queue
+    are left alone.
+    """
+    if not jobs:
+        return 0
+    with db_connection() as connection:
+        cursor = connection.cursor()
+        try:
+            queued = execute_values(
+                cursor,
+                """
+                INSERT INTO transcription_jobs (basename, audio_url)
+                VALUES %s
+                ON CONFLICT (basename) DO NOTHING
+                RETURNING basename
+                """,
+                list(jobs),
+                page_size=1000,
+                fetch=True,
+            )
+            connection.commit()
+            return len(queued)
+        finally:
+            cursor.close()
+
+def claim_transcription_job(worker_id, lease_seconds=300, max_attempts=3):
+    """
+    Claim the oldest available job for worker_id, or return None.
+
+    Queued jobs and running jobs whose lease has expired are both
+    claimable. Returns a dict with basename, audio_url and attempts.
+    """
+    with db_connection() as connection:
+        cursor = connection.cursor()
+        try:
+            cursor.execute("""
+                UPDATE transcription_jobs
+                SET status = 'running',
+                    worker = %s,
+                    attempts = attempts + 1,
+                    lease_expires_at = NOW() + %s * INTERVAL '1 second',
+                    updated_at = NOW()
+                WHERE basename = (
+                    SELECT basename FROM transcription_jobs
+                    WHERE attempts < %s
+                      AND (status = 'queued'
+                           OR (status = 'running' AND lease_expires_at < NOW()))
+                    ORDER BY created_at
+                    FOR UPDATE SKIP LOCKED
+                    LIMIT 1
+                )
+                RETURNING basename, audio_url, attempts
+            """, (worker_id, lease_seconds, max_attempts))
+            row = cursor.fetchone()
+            connection.commit()
+            if row is None:
+                return None
+            return {'basename': row[0], 'audio_url': row[1], 'attempts': row[2]}
+        finally:
+            cursor.close()
+
+def renew_transcription_lease(basename, worker_id, lease_seconds=300):
+    """Extend a job's lease. Returns False if the worker no longer holds it."""
+    with db_connection() as connection:
+        cursor = connection.cursor()
+        try:
+            cursor.execute("""
+                UPDATE transcription_jobs
+                SET lease_expires_at = NOW() + %s * INTERVAL '1 second', updated_at = NOW()
+                WHERE basename = %s AND worker = %s AND status = 'running'
+            """, (lease_seconds, basename, worker_id))
+            renewed = cursor.rowcount == 1
+            connection.commit()
+            return renewed
+        finally:
+            cursor.close()
+
+def complete_transcription_job(basename, worker_id, transcript):
+    """Store a finished transcript. Returns False if the lease was lost meanwhile."""
+    with db_connection() as connection:
+        cursor = connection.cursor()
+        try:
+            cursor.execute("""
+                UPDATE transcription_jobs
+                SET status = 'done', transcript = %s, error = NULL,
+                    lease_expires_at = NULL, updated_at = NOW()
+                WHERE basename = %s AND worker = %s AND status = 'running'
+            """, (transcript, basename, worker_id))
+            completed = cursor.rowcount == 1
+            connection.commit()
+            return completed
+        finally:
+            cursor.close()
+
+def fail_transcription_job(basename, worker_id, error, max_attempts=3):
+    """Release a failed job back to the queue, or mark it failed after max_attempts."""
+    with db_connection() as connection:
+        cursor = connection.cursor()
+        try:
+            cursor.execute("""
+                UPDATE transcription_jobs
+                SET status = CASE WHEN attempts >= %s THEN 'failed' ELSE 'queued' END,
+                    error = %s, lease_expires_at = NULL, updated_at = NOW()
+                WHERE basename = %s AND worker = %s AND status = 'running'
+            """, (max_attempts, error, basename, worker_id))
+            connection.commit()
+        finally:
+            cursor.close()
+
+def requeue_expired_transcriptions(max_attempts=3):
+    """
+    Return jobs with expired leases to the queue, failing those out of attempts.
+
+    Claiming already treats expired leases as available; this just keeps
+    the status column honest for reporting.
+    """
+    with db_connection() as connection:
+        cursor = connection.cursor()
+        try:
+            cursor.execute("""
+                UPDATE transcription_jobs
+                SET status = CASE WHEN attempts >= %s THEN 'failed' ELSE 'queued' END,
+                    error = 'Lease expired', lease_expires_at = NULL, updated_at = NOW()
+                WHERE status = 'running' AND lease_expires_at < NOW()
+            """, (max_attempts,))
+            requeued = cursor.rowcount
+            connection.commit()
+            return requeued
+        finally:
+            cursor.close()
+
+def collect_transcriptions(tscript_dir):
+    """Write finished transcripts from the queue into tscript_dir and record them."""
+    with db_connection() as connection:
+        cursor = connection.cursor()
+        try:
+            cursor.execute("""
+                SELECT basename, transcript FROM transcription_jobs
+                WHERE status = 'done' AND NOT collected
+            """)
+            collected = []
+            for basename, transcript in cursor.fetchall():
+                transcript_path = os.path.join(tscript_dir, f"{basename}.srt")
+                with open(transcript_path, 'w', encoding='utf-8') as f:
+                    f.write(transcript)
+                collected.append((basename, file_sha256(transcript_path), None))
+            if collected:
+                cursor.execute("""
+                    UPDATE transcription_jobs SET collected = TRUE
+                    WHERE basename = ANY(%s)
+                """, ([basename for basename, _, _ in collected],))
+            connection.commit()
+        finally:
+            cursor.close()
+    mark_stages(collected, 'transcribed')
+    return len(collected)
+
+def get_transcription_queue_stats():
+    """Return {status: count} for the transcription queue."""
+    with db_connection() as connection:
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT status, COUNT(*) FROM transcription_jobs GROUP BY status")
+            return dict(cursor.fetchall())
+        finally:
+            cursor.close()
 
 # -----------------------------------------------------------------------------
 # Utility functions
@@ -162,44 +655,118 @@ def check_dir(directory, count_files=0, create=0):
 # -----------------------------------------------------------------------------
 # Fetch to Transcript functions
 # -----------------------------------------------------------------------------
-def gen_filenames(feed):
-    # Check whether the title has illegal file system name characters
-    # and replace them with underscores. 
+def illegal_char_table():
+    """Translation table replacing illegal file system name characters with dashes."""
     if platform.system == 'Windows':
         illegal_chars = ['/', '\\', ':', '*', '?', '"', '<', '>', '|']
     else:
         illegal_chars = ['/', '\\', '*', '"', '<', '>', '|']
+    return str.maketrans({char: '-' for char in illegal_chars})
+
+def build_episode(episode_title, episode_description, episode_url, published, guid=None):
+    """Build the metadata dict for one episode from raw feed values."""
+    # The date needs to be converted to YYYYMMDD
+    date_object = datetime.strptime(published, "%a, %d %b %Y %H:%M:%S %z")
+    episode_date = date_object.strftime("%Y%m%d")
+
+    return {
+        'title': episode_title,
+        'date': episode_date,
+        'description': episode_description,
+        'url': episode_url,
+        # Generate filename without episode number
+        'filename': f"{episode_date}_{episode_title}.srt",
+        'guid': guid,
+    }
+
+def gen_filenames(feed):
+    # Check whether the title has illegal file system name characters
+    # and replace them with dashes.
+    illegal_chars = illegal_char_table()
 
     # Create a dictionary of episode metadata
     episode_dict = {}
     
     for episodes in feed.entries:
         # Get the title, description and URL of the podcast episode
-        episode_title = episodes.title
-        # Replace illegal characters in titles with underscores
-        for char in illegal_chars:
-            episode_title = episode_title.replace(char, '-')
-        episode_description = episodes.description
-        episode_url = episodes.enclosures[0].href
-
-        # The date needs to be converted to YYYYMMDD
-        episode_date = episodes.published
-        date_object = datetime.strptime(episode_date, "%a, %d %b %Y %H:%M:%S %z")
-        # Format the date object as YYYYMMDD
-        episode_date = date_object.strftime("%Y%m%d")
-        
-        # Generate filename without episode number
-        filename = f"{episode_date}_{episode_title}.srt"
-        
-        # Add the episode metadata to the episode_dict
-        episode_dict[episode_title] = {
-            'title': episode_title, 
-            'date': episode_date, 
-            'description': episode_description, 
-            'url': episode_url,
-            'filename': filename,
+        episode_title = episodes.title.translate(illegal_chars)
+        episode_dict[episode_title] = build_episode(
+            episode_title,
+            episodes.description,
+            episodes.enclosures[0].href,
+            episodes.published,
+            episodes.get('id'),
+        )
+
+    return episode_dict
+
+def iter_feed_items(source):
+    """
+    Incrementally parse an RSS document, yielding one dict per <item>.
+
+    Each item element is discarded once it has been read, so memory use
+    does not grow with the size of the feed.
+    """
+    channel = None
+    for event, elem in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            if elem.tag == 'channel':
+                channel = elem
+            continue
+        if elem.tag != 'item':
+            continue
+
+        enclosure = elem.find('enclosure')
+        description = elem.findtext('description')
+        if description is None:
+            description = elem.findtext(f'{{{ITUNES_NS}}}summary', '')
+        yield {
+            'title': elem.findtext('title', ''),
+            'description': description,
+            'url': enclosure.get('url') if enclosure is not None else None,
+            'published': elem.findtext('pubDate'),
+            'guid': elem.findtext('guid'),
         }
 
+        # Release the parsed item so the tree never holds more than one
+        elem.clear()
+        if channel is not None:
+            channel.remove(elem)
+
+def stream_episodes(source, known_keys=None, stop_after_known=5):
+    """
+    Build an episode dict from a streamed RSS document, newest first.
+
+    Items whose GUID or title is in known_keys are skipped before any date
+    parsing happens. Once stop_after_known consecutive known items have been
+    seen the rest of the feed is assumed to be known as well and reading stops.
+    """
+    known_keys = known_keys or set()
+    illegal_chars = illegal_char_table()
+    episode_dict = {}
+    consecutive_known = 0
+
+    for item in iter_feed_items(source):
+        episode_title = item['title'].translate(illegal_chars)
+        if item['guid'] in known_keys or episode_title in known_keys:
+            consecutive_known += 1
+            if consecutive_known >= stop_after_known:
+                logger.info(f"Reached {consecutive_known} known episodes; stopping feed read early")
+                break
+            continue
+        consecutive_known = 0
+
+        if not item['url'] or not item['published']:
+            logger.error(f"Skipping feed item without enclosure or date: {episode_title}")
+            continue
+        episode_dict[episode_title] = build_episode(
+            episode_title,
+            item['description'],
+            item['url'],
+            item['published'],
+            item['guid'],
+        )
+
     return episode_dict
 
 def parse_feed_urls(feed_urls_str):
@@ -209,15 +776,125 @@ def parse_feed_urls(feed_urls_str):
         return []
     return [url.strip() for url in feed_urls_str.split(',') if url.strip()]
 
-def consolidate_feeds(feed_urls):
-    """Fetch and consolidate episodes from multiple RSS feeds."""
+def load_feed_state(state_file):
+    """Load the persisted ETag/Last-Modified validators for each feed."""
+    if not state_file or not os.path.exists(state_file):
+        return {}
+    try:
+        with open(state_file, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error(f"Error reading feed state {state_file}: {e}")
+        return {}
+
+def save_feed_state(state_file, feed_state):
+    """Persist feed validators atomically so an interrupted run can't corrupt them."""
+    tmp_path = f"{state_file}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(feed_state, f, indent=2)
+    os.replace(tmp_path, state_file)
+
+def fetch_feed(feed_url, validators=None):
+    """
+    Fetch and parse a single feed with feedparser, sending a conditional
+    request if validators are known.
+
+    Returns (status, validators, episode_dict); episode_dict is None when
+    the feed has not been modified.
+    """
+    validators = validators or {}
+    feed = feedparser.parse(
+        feed_url,
+        etag=validators.get('etag'),
+        modified=validators.get('modified'),
+    )
+    if feed.get('status') == 304:
+        return 304, validators, None
+    if feed.get('bozo') and not feed.entries:
+        raise feed.get('bozo_exception', ValueError("Feed could not be parsed"))
+
+    new_validators = {'etag': feed.get('etag'), 'modified': feed.get('modified')}
+    return feed.get('status', 200), new_validators, gen_filenames(feed)
+
+def fetch_feed_streaming(feed_url, validators=None, known_keys=None, stop_after_known=5, timeout=60):
+    """
+    Stream a single feed with iterparse instead of feedparser.
+
+    Reading stops as soon as the feed reaches episodes that are already
+    known, and the rest of the response body is never downloaded. Returns
+    the same (status, validators, episode_dict) tuple as fetch_feed.
+    """
+    validators = validators or {}
+    headers = {}
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('modified'):
+        headers['If-Modified-Since'] = validators['modified']
+
+    with requests.get(feed_url, headers=headers, stream=True, timeout=timeout) as response:
+        if response.status_code == 304:
+            return 304, validators, None
+        response.raise_for_status()
+        response.raw.decode_content = True
+        episode_dict = stream_episodes(response.raw, known_keys, stop_after_known)
+        new_validators = {
+            'etag': response.headers.get('ETag'),
+            'modified': response.headers.get('Last-Modified'),
+        }
+    return response.status_code, new_validators, episode_dict
+
+def consolidate_feeds(feed_urls, state_file=None, max_workers=4, known_keys=None, stop_after_known=5):
+    """
+    Fetch and consolidate episodes from multiple RSS feeds.
+
+    Feeds are fetched in parallel. If state_file is given, each feed's
+    stored ETag/Last-Modified is sent with its request; feeds that come back
+    304 Not Modified are skipped without parsing entries.
+
+    If known_keys (a set of GUIDs and titles) is given, feeds are read with
+    the streaming parser and stop once they reach known episodes, so only
+    new episodes are returned.
+
+    Returns (episodes, feed_state). The updated validators are not saved
+    here: the caller passes feed_state to save_feed_state once the episodes
+    are stored, so a run that fails before then fetches the feeds again.
+
+    Each feed's last full fetch time is kept with its validators, so the
+    time saved by 304 responses can be reported: a feed's last full fetch
+    time (or this run's average if it has none) less the 304 round trip.
+    """
     all_episodes = {}
-    
+    feed_state = load_feed_state(state_file)
+
+    def timed_fetch(fetch, *args):
+        start_time = time.monotonic()
+        result = fetch(*args)
+        return result, time.monotonic() - start_time
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for feed_url in feed_urls:
+            if known_keys is None:
+                futures[feed_url] = executor.submit(timed_fetch, fetch_feed, feed_url, feed_state.get(feed_url))
+            else:
+                futures[feed_url] = executor.submit(
+                    timed_fetch, fetch_feed_streaming, feed_url, feed_state.get(feed_url),
+                    known_keys, stop_after_known
+                )
+
+    # Merge in the configured order so duplicate resolution is deterministic
+    not_modified = []
+    full_fetch_seconds = []
     for feed_url in feed_urls:
         try:
             logger.info(f"Parsing feed: {feed_url}")
-            feed = feedparser.parse(feed_url)
-            episode_dict = gen_filenames(feed)
+            (status, validators, episode_dict), seconds = futures[feed_url].result()
+            if status == 304:
+                logger.info(f"Feed not modified since last run: {feed_url}")
+                not_modified.append((validators.get('fetch_seconds'), seconds))
+                continue
+            validators['fetch_seconds'] = round(seconds, 3)
+            full_fetch_seconds.append(seconds)
             
             # Merge episodes, avoiding duplicates based on title
             for title, episode in episode_dict.items():
@@ -230,49 +907,187 @@ def consolidate_feeds(feed_urls):
                     if new_date < existing_date:
                         all_episodes[title] = episode
             
+            feed_state[feed_url] = validators
             logger.info(f"Found {len(episode_dict)} episodes in feed: {feed_url}")
         except Exception as e:
             logger.error(f"Error parsing feed {feed_url}: {str(e)}")
             continue
-    
+
+    if not_modified:
+        average = sum(full_fetch_seconds) / len(full_fetch_seconds) if full_fetch_seconds else None
+        estimates = [(full if full is not None else average, seconds) for full, seconds in not_modified]
+        saved = sum(full - seconds for full, seconds in estimates if full is not None)
+        logger.info(f"{len(not_modified)} feeds not modified; conditional requests saved about "
+                    f"{max(saved, 0.0):.1f}s (estimated from earlier full fetches)")
     logger.info(f"Total unique episodes found across all feeds: {len(all_episodes)}")
-    return all_episodes
+    return all_episodes, feed_state
 
 def verify_audio_file(audio_path, expected_url):
     """Verify that an audio file exists."""
     return os.path.exists(audio_path)
 
-def fetch_episodes(episode_dict, audio_dir, tscript_dir):
-    """Fetch episodes that don't have transcripts yet."""
-    episodes_to_download = []
+def create_host_session(pool_size):
+    """Create a keep-alive session sized for one host's concurrency cap."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def remove_partial_download(part_path):
+    """Delete a .part file and the validator stored next to it."""
+    for path in (part_path, f"{part_path}.validator"):
+        if os.path.exists(path):
+            os.remove(path)
+
+def download_file(session, url, audio_path, chunk_size=1024 * 1024, timeout=60):
+    """
+    Download url to audio_path via a .part file, resuming with an HTTP Range
+    request if a previous attempt left a partial file behind.
+
+    The response's ETag (or Last-Modified) is stored next to the .part file
+    and sent back as If-Range, so a file that changed on the server between
+    attempts is fetched whole instead of being stitched onto stale bytes.
+
+    Returns the number of bytes written during this call.
+    """
+    part_path = f"{audio_path}.part"
+    validator_path = f"{part_path}.validator"
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    headers = {}
+    if offset:
+        headers['Range'] = f'bytes={offset}-'
+        if os.path.exists(validator_path):
+            with open(validator_path, 'r') as f:
+                headers['If-Range'] = f.read().strip()
+    written = 0
+
+    with session.get(url, stream=True, headers=headers, timeout=timeout) as response:
+        if offset and response.status_code == 416:
+            # Nothing left to fetch if the server reports the same total size
+            content_range = response.headers.get('Content-Range', '')
+            if content_range.endswith(f"/{offset}"):
+                os.replace(part_path, audio_path)
+                remove_partial_download(part_path)
+                return 0
+            # Otherwise the partial file is stale; start again
+            remove_partial_download(part_path)
+            return download_file(session, url, audio_path, chunk_size, timeout)
+        response.raise_for_status()
+
+        resume = bool(offset) and response.status_code == 206
+        if resume:
+            match = re.match(r'bytes (\d+)-', response.headers.get('Content-Range', ''))
+            if not match or int(match.group(1)) != offset:
+                # The server sent a different part of the file; start again
+                remove_partial_download(part_path)
+                return download_file(session, url, audio_path, chunk_size, timeout)
+        else:
+            # A full response (the file changed, or Range is unsupported)
+            # replaces the .part file; remember what it is a copy of.
+            # Weak ETags are not allowed in If-Range.
+            etag = response.headers.get('ETag')
+            validator = etag if etag and not etag.startswith('W/') else response.headers.get('Last-Modified')
+            if validator:
+                with open(validator_path, 'w') as f:
+                    f.write(validator)
+            elif os.path.exists(validator_path):
+                os.remove(validator_path)
+
+        with open(part_path, 'ab' if resume else 'wb', buffering=chunk_size) as f:
+            for data in response.iter_content(chunk_size=chunk_size):
+                written += f.write(data)
+
+    os.replace(part_path, audio_path)
+    remove_partial_download(part_path)
+    return written
+
+def download_episodes(episodes, max_workers=8, per_host=4, chunk_size=1024 * 1024, timeout=60,
+                      on_complete=None):
+    """
+    Download a list of episodes concurrently.
+
+    Each host gets one shared keep-alive session and a semaphore capping the
+    number of simultaneous downloads from it. If given, on_complete is called
+    as on_complete(episode, success, seconds) as each download finishes.
+    Returns (successful, failed) lists of episode titles.
+    """
+    sessions = {}
+    semaphores = {}
+    for episode in episodes:
+        host = urlparse(episode['url']).netloc
+        if host not in sessions:
+            sessions[host] = create_host_session(per_host)
+            semaphores[host] = threading.BoundedSemaphore(per_host)
+
+    def fetch_one(episode):
+        host = urlparse(episode['url']).netloc
+        with semaphores[host]:
+            start_time = time.monotonic()
+            written = download_file(sessions[host], episode['url'], episode['audio_path'],
+                                    chunk_size=chunk_size, timeout=timeout)
+            return written, time.monotonic() - start_time
+
+    successful_downloads = []
+    failed_downloads = []
+    total_bytes = 0
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(fetch_one, episode): episode for episode in episodes}
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Downloading episodes"):
+                episode = futures[future]
+                title = episode['title']
+                try:
+                    written, seconds = future.result()
+                    total_bytes += written
+                    logger.info(f"Successfully downloaded {title}")
+                    successful_downloads.append(title)
+                    if on_complete:
+                        on_complete(episode, True, seconds)
+                except Exception as e:
+                    # Leave the .part file in place so the next run can resume it
+                    logger.error(f"Error downloading {title}: {str(e)}")
+                    failed_downloads.append(title)
+                    if on_complete:
+                        on_complete(episode, False, None)
+    finally:
+        for session in sessions.values():
+            session.close()
+
+    logger.info(f"Downloaded {total_bytes / (1024 * 1024):.1f} MiB from {len(sessions)} host(s)")
+    return successful_downloads, failed_downloads
 
-    for episode in episode_dict:
-        title = episode_dict[episode]['title']
-        url = episode_dict[episode]['url']
-        date = episode_dict[episode]['date']
-        filename = episode_dict[episode]['filename']
+def get_pending_downloads(audio_dir, tscript_dir, state=None):
+    """
+    Return the episodes in the database that are neither downloaded nor
+    transcribed, as dicts ready for download_episodes.
 
-        # Check if transcript already exists
-        transcript_path = os.path.join(tscript_dir, filename)
-        if verify_transcript(transcript_path):
-            # If transcript exists, we can skip this episode
+    The list comes from Postgres rather than from this run's feeds, so an
+    episode whose download failed is retried on every run until it
+    succeeds, even when its feed is unchanged or already known.
+    """
+    if state is None:
+        state = load_pipeline_state()
+    episodes = []
+    for filename, (title, description, url, date) in sorted(get_episode_records().items()):
+        basename = episode_basename(filename)
+        if stage_done(state, basename, 'transcribed') or stage_done(state, basename, 'downloaded'):
             continue
+        episodes.append({
+            'title': title,
+            'url': url,
+            'date': date,
+            'audio_filename': f"{basename}.mp3",
+            'audio_path': os.path.join(audio_dir, f"{basename}.mp3"),
+            'filename': filename,
+            'path': os.path.join(tscript_dir, filename),
+        })
+    return episodes
 
-        # If we get here, we need this episode
-        audio_filename = f"{date}_{title}.mp3"
-        audio_path = os.path.join(audio_dir, audio_filename)
-        
-        # Only download if audio doesn't exist
-        if not verify_audio_file(audio_path, url):
-            episodes_to_download.append({
-                'title': title,
-                'url': url,
-                'date': date,
-                'audio_filename': audio_filename,
-                'audio_path': audio_path,
-                'filename': filename,
-                'path': transcript_path,
-            })
+def fetch_episodes(audio_dir, tscript_dir, assume_yes=False):
+    """Fetch episodes that don't have audio or transcripts yet."""
+    episodes_to_download = get_pending_downloads(audio_dir, tscript_dir)
 
     if not episodes_to_download:
         logger.info("No episodes need to be downloaded.")
@@ -282,54 +1097,36 @@ def fetch_episodes(episode_dict, audio_dir, tscript_dir):
     for episode in episodes_to_download:
         logger.info(f" - {episode['title']}")
 
-    confirmation = input("Do you want to proceed with the download? (yes/no): ")
-    if confirmation.lower() != 'yes':
-        logger.info("Download aborted.")
-        return
+    if not assume_yes:
+        confirmation = input("Do you want to proceed with the download? (yes/no): ")
+        if confirmation.lower() != 'yes':
+            logger.info("Download aborted.")
+            return
 
-    # Download episodes with progress bar
-    successful_downloads = []
-    failed_downloads = []
-    
-    for episode in tqdm(episodes_to_download, desc="Downloading episodes"):
-        title = episode['title']
-        url = episode['url']
-        audio_path = episode['audio_path']
+    from config import (
+        DOWNLOAD_WORKERS,
+        DOWNLOAD_PER_HOST,
+        DOWNLOAD_CHUNK_SIZE,
+        DOWNLOAD_TIMEOUT,
+    )
 
-        try:
-            # Stream download with progress
-            response = requests.get(url, stream=True)
-            response.raise_for_status()
-            
-            # Get total file size
-            total_size = int(response.headers.get('content-length', 0))
-            
-            # Open file and write in chunks with progress
-            with open(audio_path, 'wb') as f, tqdm(
-                desc=f"Downloading {title}",
-                total=total_size,
-                unit='iB',
-                unit_scale=True,
-                unit_divisor=1024,
-                leave=False
-            ) as pbar:
-                for data in response.iter_content(chunk_size=1024):
-                    size = f.write(data)
-                    pbar.update(size)
-            
-            logger.info(f"Successfully downloaded {title}")
-            successful_downloads.append(title)
-                
-        except Exception as e:
-            logger.error(f"Error downloading {title}: {str(e)}")
-            failed_downloads.append(title)
-            # Clean up failed download
-            if os.path.exists(audio_path):
-                try:
-                    os.remove(audio_path)
-                except Exception as e:
-                    logger.error(f"Error removing failed download {audio_path}: {str(e)}")
-            continue
+    def record_download(episode, success, seconds):
+        basename = episode_basename(episode['audio_filename'])
+        if success:
+            mark_stage(basename, 'downloaded', file_sha256(episode['audio_path']), seconds)
+        else:
+            mark_stage(basename, 'downloaded', status='failed')
+
+    # Download episodes concurrently; interrupted downloads are kept as
+    # .part files and resumed on the next run.
+    successful_downloads, failed_downloads = download_episodes(
+        episodes_to_download,
+        max_workers=DOWNLOAD_WORKERS,
+        per_host=DOWNLOAD_PER_HOST,
+        chunk_size=DOWNLOAD_CHUNK_SIZE,
+        timeout=DOWNLOAD_TIMEOUT,
+        on_complete=record_download,
+    )
 
     # Summary of download results
     logger.info("\nDownload Summary:")
@@ -399,36 +1196,461 @@ def transcribe_with_server(audio_file, output_path, server_url, model="medium",
         logger.error(f"Error during server transcription: {e}")
         return False
 
+def convert_to_wav(audio_file, wav_path):
+    """Decode an audio file to the 16 kHz mono PCM WAV that whisper.cpp expects."""
+    subprocess.run(
+        ['ffmpeg', '-y', '-loglevel', 'error', '-i', audio_file,
+         '-ar', '16000', '-ac', '1', '-c:a', 'pcm_s16le', wav_path],
+        check=True,
+        capture_output=True,
+    )
+
+def transcribe_with_whisper_cpp(audio_file, output_path, wav_path, binary, model_path,
+                                language="en", output_format="srt", translate=False, threads=4):
+    """Transcribe audio with a local whisper.cpp binary pinned to a fixed thread count."""
+    try:
+        convert_to_wav(audio_file, wav_path)
+        command = [
+            binary,
+            '-m', model_path,
+            '-f', wav_path,
+            '-t', str(threads),
+            '-l', language,
+            f'-o{output_format}',
+            # whisper.cpp appends the format extension itself
+            '-of', os.path.splitext(output_path)[0],
+        ]
+        if translate:
+            command.append('-tr')
+
+        # Stop the BLAS/OpenMP backends from spawning more threads than -t
+        env = dict(os.environ, OMP_NUM_THREADS=str(threads), OPENBLAS_NUM_THREADS=str(threads))
+        result = subprocess.run(command, capture_output=True, text=True, env=env)
+        if result.returncode != 0:
+            logger.error(f"whisper.cpp failed for {audio_file}: {result.stderr.strip()}")
+            return False
+        return True
+    except Exception as e:
+        logger.error(f"Error during local transcription: {e}")
+        return False
+
+def open_fifo_writer(fifo_path, reader, poll_interval=0.1):
+    """
+    Open a named pipe for writing once the reader process has opened it.
+
+    A plain open() would block forever if the reader exits before opening
+    the pipe, so poll with O_NONBLOCK while the reader is still alive.
+    """
+    while True:
+        try:
+            fd = os.open(fifo_path, os.O_WRONLY | os.O_NONBLOCK)
+            os.set_blocking(fd, True)
+            return os.fdopen(fd, 'wb')
+        except OSError:
+            if reader.poll() is not None:
+                raise RuntimeError("Reader exited before opening the pipe")
+            time.sleep(poll_interval)
+
+def transcribe_with_whisper_cpp_streaming(audio_file, output_path, binary, model_path,
+                                          language="en", output_format="srt", translate=False,
+                                          threads=4, use_fifo=False, chunk_size=1024 * 1024):
+    """
+    Transcribe audio with whisper.cpp, streaming ffmpeg's decoded PCM straight
+    into it so that no WAV file is ever written to disk.
+
+    The audio is piped to whisper.cpp's stdin, or through a named pipe if
+    use_fifo is set (for builds that cannot read stdin). Logs the number of
+    bytes streamed, how long ffmpeg took to decode them and the total run time.
+    """
+    fifo_dir = None
+    ffmpeg = None
+    whisper = None
+    try:
+        if use_fifo:
+            fifo_dir = tempfile.mkdtemp(prefix='whisper_fifo_')
+            input_path = os.path.join(fifo_dir, 'audio.wav')
+            os.mkfifo(input_path)
+        else:
+            input_path = '-'
+
+        command = [
+            binary,
+            '-m', model_path,
+            '-f', input_path,
+            '-t', str(threads),
+            '-l', language,
+            f'-o{output_format}',
+            '-of', os.path.splitext(output_path)[0],
+            '-np',
+        ]
+        if translate:
+            command.append('-tr')
+
+        env = dict(os.environ, OMP_NUM_THREADS=str(threads), OPENBLAS_NUM_THREADS=str(threads))
+        stderr_log = tempfile.TemporaryFile(mode='w+')
+        start_time = time.monotonic()
+        whisper = subprocess.Popen(
+            command,
+            stdin=None if use_fifo else subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=stderr_log,
+            env=env,
+        )
+        ffmpeg = subprocess.Popen(
+            ['ffmpeg', '-loglevel', 'error', '-i', audio_file,
+             '-ar', '16000', '-ac', '1', '-c:a', 'pcm_s16le', '-f', 'wav', 'pipe:1'],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+
+        # Pump PCM from ffmpeg to whisper.cpp, counting what would have hit the disk
+        bytes_streamed = 0
+        sink = open_fifo_writer(input_path, whisper) if use_fifo else whisper.stdin
+        try:
+            while True:
+                data = ffmpeg.stdout.read(chunk_size)
+                if not data:
+                    break
+                sink.write(data)
+                bytes_streamed += len(data)
+        finally:
+            sink.close()
+        decode_seconds = time.monotonic() - start_time
+
+        if ffmpeg.wait() != 0:
+            logger.error(f"ffmpeg failed to decode {audio_file}")
+            whisper.kill()
+            return False
+        if whisper.wait() != 0:
+            stderr_log.seek(0)
+            logger.error(f"whisper.cpp failed for {audio_file}: {stderr_log.read().strip()[-500:]}")
+            return False
+
+        # Decode time is when the last PCM byte was handed over, not time saved;
+        # whisper.cpp was loading and transcribing alongside it
+        total_seconds = time.monotonic() - start_time
+        logger.info(f"Streamed {bytes_streamed / (1024 * 1024):.1f} MiB of PCM for "
+                    f"{os.path.basename(audio_file)} without a WAV file; "
+                    f"decoding took {decode_seconds:.1f}s of {total_seconds:.1f}s in total")
+        return True
+    except Exception as e:
+        logger.error(f"Error during streaming local transcription: {e}")
+        for process in (ffmpeg, whisper):
+            if process and process.poll() is None:
+                process.kill()
+        return False
+    finally:
+        if fifo_dir:
+            shutil.rmtree(fifo_dir, ignore_errors=True)
+
+def get_audio_duration(audio_file):
+    """Return the duration of an audio file in seconds using ffprobe, or 0 if unknown."""
+    try:
+        result = subprocess.run(
+            ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+             '-of', 'default=noprint_wrappers=1:nokey=1', audio_file],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return float(result.stdout.strip())
+    except (OSError, ValueError, subprocess.CalledProcessError):
+        return 0.0
+
+def detect_silences(audio_file, noise_db=-30, min_silence=0.5):
+    """Return a list of (start, end) silence intervals in seconds using ffmpeg silencedetect."""
+    result = subprocess.run(
+        ['ffmpeg', '-hide_banner', '-nostats', '-i', audio_file,
+         '-af', f'silencedetect=noise={noise_db}dB:d={min_silence}', '-f', 'null', '-'],
+        capture_output=True,
+        text=True,
+    )
+    silences = []
+    silence_start = None
+    for line in result.stderr.splitlines():
+        match = re.search(r'silence_start: (-?[\d.]+)', line)
+        if match:
+            silence_start = max(float(match.group(1)), 0.0)
+            continue
+        match = re.search(r'silence_end: ([\d.]+)', line)
+        if match and silence_start is not None:
+            silences.append((silence_start, float(match.group(1))))
+            silence_start = None
+    return silences
+
+def plan_segments(duration, silences, segment_length=600, search_window=60):
+    """
+    Choose segment boundaries close to every segment_length seconds.
+
+    Each cut is placed in the middle of the silence nearest to the ideal cut
+    point, provided one lies within search_window seconds; otherwise the cut
+    falls on the ideal point. Returns a list of (start, end) tuples.
+    """
+    # With a window of more than half a segment the search could reach back
+    # to the previous cut's silence and never advance; capping it keeps every
+    # segment at least half of segment_length long
+    search_window = min(search_window, segment_length / 2)
+    cuts = []
+    target = segment_length
+    while target < duration - segment_length / 2:
+        nearby = [(start + end) / 2 for start, end in silences
+                  if abs((start + end) / 2 - target) <= search_window]
+        cut = min(nearby, key=lambda point: abs(point - target)) if nearby else target
+        cuts.append(cut)
+        target = cut + segment_length
+
+    bounds = [0.0] + cuts + [duration]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def split_audio(audio_file, segments, out_dir):
+    """Cut audio_file into the given (start, end) segments without re-encoding."""
+    extension = os.path.splitext(audio_file)[1]
+    segment_files = []
+    for i, (start, end) in enumerate(segments):
+        segment_file = os.path.join(out_dir, f"segment_{i:03d}{extension}")
+        subprocess.run(
+            ['ffmpeg', '-y', '-loglevel', 'error', '-ss', f'{start:.3f}', '-to', f'{end:.3f}',
+             '-i', audio_file, '-c', 'copy', segment_file],
+            check=True,
+            capture_output=True,
+        )
+        segment_files.append(segment_file)
+    return segment_files
+
+def stitch_srt(segment_transcripts, segments, output_path):
+    """
+    Join per-segment SRT files into one transcript.
+
+    Timecodes in each segment are shifted by the segment's start offset and
+    clamped to its end, so placeholder subtitles that claim to span an hour
+    cannot overlap the next segment.
+    """
+    subtitles = []
+    for transcript_path, (start, end) in zip(segment_transcripts, segments):
+        offset = timedelta(seconds=start)
+        limit = timedelta(seconds=end)
+        with open(transcript_path, 'r', encoding='utf-8') as f:
+            for subtitle in srt.parse(f):
+                subtitle.start = min(subtitle.start + offset, limit)
+                subtitle.end = min(subtitle.end + offset, limit)
+                subtitles.append(subtitle)
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(srt.compose(subtitles, reindex=True, start_index=1))
+
+def transcribe_segmented(audio_file, output_path, wav_path, transcribe_fn,
+                         segment_length=600, workers=4):
+    """
+    Transcribe a long episode by splitting it at silences and transcribing
+    the segments concurrently, then stitching the results into one SRT.
+
+    transcribe_fn has the same signature used by run_transcription_jobs.
+    """
+    duration = get_audio_duration(audio_file)
+    if duration <= segment_length * 1.5:
+        return transcribe_fn(audio_file, output_path, wav_path)
+
+    work_dir = tempfile.mkdtemp(prefix='segments_', dir=os.path.dirname(wav_path) or None)
+    try:
+        segments = plan_segments(duration, detect_silences(audio_file), segment_length)
+        segment_files = split_audio(audio_file, segments, work_dir)
+        segment_transcripts = [f"{os.path.splitext(path)[0]}.srt" for path in segment_files]
+        segment_wavs = [f"{os.path.splitext(path)[0]}.wav" for path in segment_files]
+        logger.info(f"Split {os.path.basename(audio_file)} into {len(segments)} segments")
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(transcribe_fn, segment_files, segment_transcripts, segment_wavs))
+
+        if not all(results) or not all(verify_transcript(path) for path in segment_transcripts):
+            logger.error(f"One or more segments of {os.path.basename(audio_file)} failed to transcribe")
+            return False
+
+        stitch_srt(segment_transcripts, segments, output_path)
+        return True
+    except Exception as e:
+        logger.error(f"Error during segmented transcription: {e}")
+        return False
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def transcribe_job(job, transcribe_fn, retries=2, retry_delay=5):
+    """
+    Transcribe one job dict (audio_file, output_path, wav_path), retrying on
+    failure. Returns (success, audio_seconds).
+    """
+    audio_seconds = get_audio_duration(job['audio_file'])
+    for attempt in range(retries + 1):
+        if attempt:
+            logger.info(f"Retrying {os.path.basename(job['audio_file'])} (attempt {attempt + 1}/{retries + 1})")
+            time.sleep(retry_delay * attempt)
+        if transcribe_fn(job['audio_file'], job['output_path'], job['wav_path']) \
+                and verify_transcript(job['output_path']):
+            return True, audio_seconds
+        # Remove failed transcript if it exists
+        if os.path.exists(job['output_path']):
+            try:
+                os.remove(job['output_path'])
+            except Exception as e:
+                logger.error(f"Error removing failed transcript {job['output_path']}: {str(e)}")
+    return False, audio_seconds
+
+def run_transcription_jobs(jobs, transcribe_fn, workers=1, retries=2, retry_delay=5, on_complete=None):
+    """
+    Run transcription jobs on a pool of workers.
+
+    Each job is a dict with audio_file, output_path and wav_path. transcribe_fn
+    is called as transcribe_fn(audio_file, output_path, wav_path) and must
+    return True on success. Failed jobs are retried up to `retries` more times.
+    If given, on_complete is called as on_complete(job, success, seconds).
+    Returns (successful, failed, stats) where stats holds audio and wall seconds.
+    """
+    def run_job(job):
+        job['start_time'] = time.monotonic()
+        return transcribe_job(job, transcribe_fn, retries, retry_delay)
+
+    successful_transcripts = []
+    failed_transcripts = []
+    audio_seconds_done = 0.0
+    start_time = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_job, job): job for job in jobs}
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Transcribing"):
+            job = futures[future]
+            basename = os.path.basename(job['audio_file'])
+            try:
+                success, audio_seconds = future.result()
+            except Exception as e:
+                logger.error(f"Error transcribing {basename}: {str(e)}")
+                success, audio_seconds = False, 0.0
+
+            if on_complete:
+                on_complete(job, success, time.monotonic() - job.get('start_time', start_time))
+
+            if success:
+                logger.info(f"Successfully transcribed {basename}")
+                successful_transcripts.append(basename)
+                audio_seconds_done += audio_seconds
+                # Clean up audio files after successful transcription
+                cleanup_audio_files(job['audio_file'], job['wav_path'])
+            else:
+                logger.error(f"Failed to transcribe {basename}")
+                failed_transcripts.append(basename)
+
+    stats = {
+        'audio_seconds': audio_seconds_done,
+        'wall_seconds': time.monotonic() - start_time,
+    }
+    return successful_transcripts, failed_transcripts, stats
+
 def verify_transcript(transcript_path):
     """Verify that a transcript file exists and is not empty."""
     if not os.path.exists(transcript_path):
         return False
     return os.path.getsize(transcript_path) > 0
 
-def transcribe_episodes(wav_dir, tscript_dir, out_format, file_list, audio_dir):
-    """Transcribe episodes using either local or server-based transcription."""
+def get_transcribe_fn(server_enabled=None, server_url=None):
+    """
+    Build the transcribe_fn(audio_file, output_path, wav_path) callable for
+    the configured backend: the remote server or local whisper.cpp, with
+    optional segmenting of long episodes. server_enabled and server_url
+    override TRANSCRIPT_SERVER_ENABLED and TRANSCRIPT_SERVER_URL.
+    """
     from config import (
         TRANSCRIPT_SERVER_ENABLED,
         TRANSCRIPT_SERVER_URL,
         TRANSCRIPT_MODEL,
         TRANSCRIPT_LANGUAGE,
         TRANSCRIPT_OUTPUT_FORMAT,
-        TRANSCRIPT_TRANSLATE
+        TRANSCRIPT_TRANSLATE,
+        TRANSCRIBE_WORKERS,
+        WHISPER_CPP_BINARY,
+        WHISPER_CPP_MODEL,
+        WHISPER_CPP_THREADS,
+        TRANSCRIBE_SEGMENT_SECONDS,
+        TRANSCRIBE_SEGMENT_WORKERS,
+        WHISPER_CPP_INPUT,
+    )
+    if server_enabled is None:
+        server_enabled = TRANSCRIPT_SERVER_ENABLED
+    server_url = server_url or TRANSCRIPT_SERVER_URL
+
+    if server_enabled:
+        logger.info(f"Using remote transcription server with {TRANSCRIBE_WORKERS} worker(s)")
+
+        def transcribe_fn(audio_file, output_path, wav_path):
+            return transcribe_with_server(
+                audio_file,
+                output_path,
+                server_url,
+                TRANSCRIPT_MODEL,
+                TRANSCRIPT_LANGUAGE,
+                TRANSCRIPT_OUTPUT_FORMAT,
+                TRANSCRIPT_TRANSLATE
+            )
+    else:
+        logger.info(f"Using local transcription with {TRANSCRIBE_WORKERS} worker(s) "
+                    f"x {WHISPER_CPP_THREADS} thread(s), {WHISPER_CPP_INPUT} input")
+
+        if WHISPER_CPP_INPUT in ('pipe', 'fifo'):
+            def transcribe_fn(audio_file, output_path, wav_path):
+                return transcribe_with_whisper_cpp_streaming(
+                    audio_file,
+                    output_path,
+                    WHISPER_CPP_BINARY,
+                    WHISPER_CPP_MODEL,
+                    TRANSCRIPT_LANGUAGE,
+                    TRANSCRIPT_OUTPUT_FORMAT,
+                    TRANSCRIPT_TRANSLATE,
+                    WHISPER_CPP_THREADS,
+                    use_fifo=WHISPER_CPP_INPUT == 'fifo'
+                )
+        else:
+            def transcribe_fn(audio_file, output_path, wav_path):
+                return transcribe_with_whisper_cpp(
+                    audio_file,
+                    output_path,
+                    wav_path,
+                    WHISPER_CPP_BINARY,
+                    WHISPER_CPP_MODEL,
+                    TRANSCRIPT_LANGUAGE,
+                    TRANSCRIPT_OUTPUT_FORMAT,
+                    TRANSCRIPT_TRANSLATE,
+                    WHISPER_CPP_THREADS
+                )
+
+    if TRANSCRIBE_SEGMENT_SECONDS and TRANSCRIPT_OUTPUT_FORMAT == 'srt':
+        logger.info(f"Splitting long episodes into ~{TRANSCRIBE_SEGMENT_SECONDS}s segments")
+        episode_fn = transcribe_fn
+
+        def transcribe_fn(audio_file, output_path, wav_path):
+            return transcribe_segmented(
+                audio_file,
+                output_path,
+                wav_path,
+                episode_fn,
+                TRANSCRIBE_SEGMENT_SECONDS,
+                TRANSCRIBE_SEGMENT_WORKERS
+            )
+
+    return transcribe_fn
+
+def transcribe_episodes(wav_dir, tscript_dir, out_format, audio_dir, assume_yes=False):
+    """
+    Transcribe every downloaded episode that has no transcript yet, using
+    either local or server-based transcription.
+    """
+    from config import (
+        TRANSCRIBE_WORKERS,
+        TRANSCRIBE_RETRIES,
     )
     
-    # Build list of files needing transcription
-    files_to_transcribe = []
-    for audio_file in os.listdir(audio_dir):
-        if not audio_file.endswith('.mp3'):
-            continue
-            
-        basename = os.path.splitext(audio_file)[0]
-        transcript_path = os.path.join(tscript_dir, f"{basename}.{out_format}")
-        
-        # Only transcribe if transcript doesn't exist or is empty
-        if not verify_transcript(transcript_path):
-            audio_path = os.path.join(audio_dir, audio_file)
-            files_to_transcribe.append(audio_path)
+    # Build list of files needing transcription from the pipeline state
+    state = load_pipeline_state()
+    files_to_transcribe = [
+        os.path.join(audio_dir, f"{basename}.mp3")
+        for basename in episodes_pending(state, 'downloaded', 'transcribed')
+    ]
     
     if not files_to_transcribe:
         logger.info("No episodes need to be transcribed.")
@@ -438,50 +1660,43 @@ def transcribe_episodes(wav_dir, tscript_dir, out_format, file_list, audio_dir):
     for audio_file in files_to_transcribe:
         logger.info(f" - {os.path.basename(audio_file)}")
     
-    confirmation = input("Press Enter to continue with transcription...")
+    if not assume_yes:
+        input("Press Enter to continue with transcription...")
     
-    successful_transcripts = []
-    failed_transcripts = []
+    jobs = []
+    for audio_file in files_to_transcribe:
+        name_without_ext = os.path.splitext(os.path.basename(audio_file))[0]
+        jobs.append({
+            'audio_file': audio_file,
+            'output_path': os.path.join(tscript_dir, f"{name_without_ext}.{out_format}"),
+            'wav_path': os.path.join(wav_dir, f"{name_without_ext}.wav"),
+        })
     
-    if TRANSCRIPT_SERVER_ENABLED:
-        logger.info("Using remote transcription server")
-        for audio_file in tqdm(files_to_transcribe, desc="Transcribing"):
-            basename = os.path.basename(audio_file)
-            name_without_ext = os.path.splitext(basename)[0]
-            output_path = os.path.join(tscript_dir, f"{name_without_ext}.{out_format}")
-            wav_path = os.path.join(wav_dir, f"{name_without_ext}.wav")
-            
-            success = transcribe_with_server(
-                audio_file,
-                output_path,
-                TRANSCRIPT_SERVER_URL,
-                TRANSCRIPT_MODEL,
-                TRANSCRIPT_LANGUAGE,
-                TRANSCRIPT_OUTPUT_FORMAT,
-                TRANSCRIPT_TRANSLATE
-            )
-            
-            if success and verify_transcript(output_path):
-                logger.info(f"Successfully transcribed {basename}")
-                successful_transcripts.append(basename)
-                # Clean up audio files after successful transcription
-                cleanup_audio_files(audio_file, wav_path)
-            else:
-                logger.error(f"Failed to transcribe {basename}")
-                failed_transcripts.append(basename)
-                # Remove failed transcript if it exists
-                if os.path.exists(output_path):
-                    try:
-                        os.remove(output_path)
-                    except Exception as e:
-                        logger.error(f"Error removing failed transcript {output_path}: {str(e)}")
-    else:
-        logger.info("Using local transcription")
-        # ... existing local transcription code ...
+    transcribe_fn = get_transcribe_fn()
+
+    def record_transcript(job, success, seconds):
+        basename = episode_basename(job['audio_file'])
+        if success:
+            mark_stage(basename, 'transcribed', file_sha256(job['output_path']), seconds)
+        else:
+            mark_stage(basename, 'transcribed', seconds=seconds, status='failed')
+
+    successful_transcripts, failed_transcripts, stats = run_transcription_jobs(
+        jobs,
+        transcribe_fn,
+        workers=TRANSCRIBE_WORKERS,
+        retries=TRANSCRIBE_RETRIES,
+        on_complete=record_transcript,
+    )
     
     # Summary of transcription results
     logger.info("\nTranscription Summary:")
     logger.info(f"Successfully transcribed: {len(successful_transcripts)} episodes")
+    if stats['wall_seconds'] > 0:
+        audio_hours = stats['audio_seconds'] / 3600
+        wall_hours = stats['wall_seconds'] / 3600
+        logger.info(f"Throughput: {audio_hours:.2f} audio-hours in {wall_hours:.2f} wall-hours "
+                    f"({audio_hours / wall_hours:.1f} audio-hours per wall-hour)")
     if failed_transcripts:
         logger.info(f"Failed transcriptions ({len(failed_transcripts)} episodes):")
         for basename in failed_transcripts:
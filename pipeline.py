@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+
+# Streaming pipeline that overlaps downloading, transcription and indexing.
+# Episode N+1 downloads while episode N is transcribed and episode N-1 is
+# chunked and indexed, so a newly published episode becomes searchable as
+# soon as its own stages finish rather than after a full batch cycle.
+# Stages are connected by bounded queues: when a downstream stage falls
+# behind, upstream workers block instead of piling up audio on disk.
+
+import os
+import queue
+import threading
+import time
+from urllib.parse import urlparse
+
+from libPodSemSearch import (
+    logger,
+    create_host_session,
+    download_file,
+    get_transcribe_fn,
+    transcribe_job,
+    cleanup_audio_files,
+    mark_stage,
+    mark_stages,
+    file_sha256,
+    episode_basename,
+    get_episode_records,
+)
+from fast_srt import load_srt
+from config import (
+    audio_dir,
+    wav_dir,
+    tscript_dir,
+    DOWNLOAD_WORKERS,
+    DOWNLOAD_PER_HOST,
+    DOWNLOAD_CHUNK_SIZE,
+    DOWNLOAD_TIMEOUT,
+    TRANSCRIBE_WORKERS,
+    TRANSCRIBE_RETRIES,
+    PIPELINE_QUEUE_SIZE,
+)
+
+# Sentinel telling a stage's workers that no more items will arrive
+_DONE = object()
+
+def build_work_items(episode_dict, state, records):
+    """
+    Turn feed episodes, database records and pipeline state into work items
+    for the pipeline.
+
+    Every episode that has not finished indexing gets an item; the
+    download/transcribe flags say which stages it still needs, so episodes
+    left half-done by an earlier run pick up where they stopped. records
+    ({filename: (title, description, url, date)}) supplies every episode in
+    the database, so a failed download is retried even when the feed is
+    unchanged or its episodes are already known to --stream-feeds.
+    """
+    items = {}
+    for filename, (title, _, url, _) in records.items():
+        basename = episode_basename(filename)
+        items[basename] = {'basename': basename, 'url': url, 'title': title, 'new': False}
+    for episode in episode_dict.values():
+        basename = episode_basename(episode['filename'])
+        items[basename] = {'basename': basename, 'url': episode['url'], 'title': episode['title'], 'new': True}
+
+    # Include episodes from earlier runs that are not yet searchable
+    for basename, stages in state.items():
+        if basename not in items and 'done' in (stages.get('downloaded'), stages.get('transcribed')):
+            items[basename] = {'basename': basename, 'url': None, 'title': basename, 'new': False}
+
+    work_items = []
+    for basename, item in items.items():
+        stages = state.get(basename, {})
+        if stages.get('es_indexed') == 'done' and stages.get('chroma_indexed') == 'done':
+            continue
+        item.update({
+            'filename': f"{basename}.srt",
+            'audio_path': os.path.join(audio_dir, f"{basename}.mp3"),
+            'output_path': os.path.join(tscript_dir, f"{basename}.srt"),
+            'wav_path': os.path.join(wav_dir, f"{basename}.wav"),
+            'needs_transcribe': stages.get('transcribed') != 'done',
+        })
+        item['audio_file'] = item['audio_path']
+        item['needs_download'] = item['needs_transcribe'] and stages.get('downloaded') != 'done'
+        if item['needs_download'] and not item['url']:
+            continue
+        work_items.append(item)
+
+    # Episodes just found in the feeds go ahead of the backlog, newest first
+    # (basenames start with the publication date), so a fresh episode is not
+    # stuck behind years of back catalogue
+    work_items.sort(key=lambda item: item['basename'], reverse=True)
+    return sorted(work_items, key=lambda item: not item['new'])
+
+def seed_indexed_stages(state, index_name, collection, batch_size=500):
+    """
+    Mark transcribed episodes that are already in Elasticsearch or Chroma as
+    indexed there.
+
+    The state table is seeded from the audio and transcript directories
+    only, so without this the first pipeline run would re-index the whole
+    corpus one episode at a time. Updates state in place.
+    """
+    from index_es import get_indexed_hashes
+
+    candidates = {
+        stage: [basename for basename, stages in state.items()
+                if stages.get('transcribed') == 'done' and stages.get(stage) != 'done']
+        for stage in ('es_indexed', 'chroma_indexed')
+    }
+    found = {'es_indexed': set(), 'chroma_indexed': set()}
+    if candidates['es_indexed']:
+        # Episodes whose lines carry mixed hashes map to None and are re-indexed
+        indexed = get_indexed_hashes(index_name)
+        found['es_indexed'] = {basename for basename in candidates['es_indexed'] if indexed.get(basename)}
+    pending = candidates['chroma_indexed']
+    for i in range(0, len(pending), batch_size):
+        filenames = [f"{basename}.srt" for basename in pending[i:i + batch_size]]
+        page = collection.get(where={'filename': {'$in': filenames}}, include=['metadatas'])
+        found['chroma_indexed'].update(
+            episode_basename(metadata['filename']) for metadata in page['metadatas'] if metadata)
+
+    for stage, basenames in found.items():
+        if basenames:
+            mark_stages([(basename, None, None) for basename in basenames], stage)
+            for basename in basenames:
+                state.setdefault(basename, {})[stage] = 'done'
+            logger.info(f"Found {len(basenames)} episodes already {stage.replace('_', ' ')}")
+
+def start_stage(name, work_fn, in_queue, out_queue, workers, on_error=None):
+    """
+    Start worker threads that apply work_fn to items from in_queue.
+
+    Items for which work_fn returns a value are forwarded to out_queue,
+    blocking while it is full. If work_fn raises, the item is dropped and
+    on_error, if given, is called as on_error(item). Returns the list of
+    started threads.
+    """
+    def worker():
+        while True:
+            item = in_queue.get()
+            if item is _DONE:
+                # Pass the sentinel on so sibling workers also stop
+                in_queue.put(_DONE)
+                break
+            try:
+                result = work_fn(item)
+            except Exception as e:
+                logger.error(f"{name} failed for {item['basename']}: {str(e)}")
+                result = None
+                if on_error:
+                    try:
+                        on_error(item)
+                    except Exception as e:
+                        # Keep the worker alive so upstream stages never block
+                        logger.error(f"Could not record the {name} failure for {item['basename']}: {str(e)}")
+            if result is not None and out_queue is not None:
+                out_queue.put(result)
+
+    threads = [threading.Thread(target=worker, name=f"{name}-{i}", daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+def finish_stage(threads, out_queue):
+    """Wait for a stage to drain and tell the next stage nothing more is coming."""
+    for thread in threads:
+        thread.join()
+    if out_queue is not None:
+        out_queue.put(_DONE)
+
+def run_pipeline(episode_dict, state, index_name=None, collection_name=None):
+    """
+    Download, transcribe and index episodes with all three stages running at once.
+
+    Returns {'searchable': [basename, ...], 'failed': [(basename, stage), ...]},
+    or None if the Elasticsearch index has to be rebuilt first.
+    """
+    # Imported here so fetchtoTscript can be used without the search backends
+    from chunk_transcripts import chunk_transcript
+    from index_es import ensure_es_index, has_episode_ids, index_episode
+    from index_chroma import create_chroma_client, open_collection, create_embedding_cache, sync_chunks
+    from frontend.app.config.app_settings import ELASTICSEARCH_INDEX, SEMANTIC_COLLECTION
+
+    index_name = ensure_es_index(index_name or ELASTICSEARCH_INDEX)
+    if not has_episode_ids(index_name):
+        logger.error(f"{index_name} stores episode metadata on every line; run index_es.py --full first")
+        return None
+    collection = open_collection(create_chroma_client(), collection_name or SEMANTIC_COLLECTION)
+    seed_indexed_stages(state, index_name, collection)
+
+    work_items = build_work_items(episode_dict, state, get_episode_records())
+    if not work_items:
+        logger.info("Every episode is already searchable.")
+        return {'searchable': [], 'failed': []}
+
+    logger.info(f"Pipelining {len(work_items)} episodes")
+    embedder = create_embedding_cache()
+    transcribe_fn = get_transcribe_fn()
+
+    sessions = {}
+    host_slots = {}
+    for item in work_items:
+        if item['needs_download']:
+            host = urlparse(item['url']).netloc
+            if host not in sessions:
+                sessions[host] = create_host_session(DOWNLOAD_PER_HOST)
+                host_slots[host] = threading.BoundedSemaphore(DOWNLOAD_PER_HOST)
+
+    results = {'searchable': [], 'failed': []}
+    results_lock = threading.Lock()
+
+    def record_failure(item, stage):
+        with results_lock:
+            results['failed'].append((item['basename'], stage))
+        mark_stage(item['basename'], stage, status='failed')
+
+    def download(item):
+        item['start_time'] = time.monotonic()
+        if not item['needs_download']:
+            return item
+        host = urlparse(item['url']).netloc
+        try:
+            with host_slots[host]:
+                download_file(sessions[host], item['url'], item['audio_path'],
+                              chunk_size=DOWNLOAD_CHUNK_SIZE, timeout=DOWNLOAD_TIMEOUT)
+        except Exception as e:
+            logger.error(f"Error downloading {item['title']}: {str(e)}")
+            record_failure(item, 'downloaded')
+            return None
+        mark_stage(item['basename'], 'downloaded', file_sha256(item['audio_path']),
+                   time.monotonic() - item['start_time'])
+        return item
+
+    def transcribe(item):
+        if not item['needs_transcribe']:
+            return item
+        start_time = time.monotonic()
+        success, _ = transcribe_job(item, transcribe_fn, TRANSCRIBE_RETRIES)
+        if not success:
+            logger.error(f"Failed to transcribe {item['basename']}")
+            record_failure(item, 'transcribed')
+            return None
+        mark_stage(item['basename'], 'transcribed', file_sha256(item['output_path']),
+                   time.monotonic() - start_time)
+        cleanup_audio_files(item['audio_path'], item['wav_path'])
+        return item
+
+    def index(item):
+        record = get_episode_records([item['filename']]).get(item['filename'])
+        if record is None:
+            logger.error(f"No database record found for {item['filename']}")
+            record_failure(item, 'chunked')
+            return None
+        title, description, url, date = record
+
+        start_time = time.monotonic()
+        # Which stage an exception is recorded against
+        item['stage'] = 'chunked'
+        episode = {
+            'filename': item['filename'],
+            'title': title,
+            'description': description,
+            'url': url,
+            'date': date,
+        }
+        transcript, content_hash = load_srt(item['output_path'])
+        chunks = chunk_transcript(transcript, episode)
+        mark_stage(item['basename'], 'chunked', content_hash, seconds=time.monotonic() - start_time)
+
+        item['stage'] = 'es_indexed'
+        index_episode(index_name, item['filename'], title, description, url, item['basename'][:8])
+        mark_stage(item['basename'], 'es_indexed')
+        item['stage'] = 'chroma_indexed'
+        # Re-transcribed episodes may have moved chunk boundaries, so drop stale ones
+        sync_chunks(collection, chunks, where={'filename': item['filename']}, embedder=embedder)
+        mark_stage(item['basename'], 'chroma_indexed')
+
+        elapsed = time.monotonic() - item['start_time']
+        logger.info(f"{title} is searchable {elapsed:.0f}s after entering the pipeline")
+        with results_lock:
+            results['searchable'].append(item['basename'])
+        return None
+
+    download_queue = queue.Queue()
+    transcribe_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    index_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+
+    for item in work_items:
+        download_queue.put(item)
+    download_queue.put(_DONE)
+
+    start_time = time.monotonic()
+    try:
+        download_threads = start_stage('download', download, download_queue, transcribe_queue, DOWNLOAD_WORKERS,
+                                       on_error=lambda item: record_failure(item, 'downloaded'))
+        transcribe_threads = start_stage('transcribe', transcribe, transcribe_queue, index_queue, TRANSCRIBE_WORKERS,
+                                         on_error=lambda item: record_failure(item, 'transcribed'))
+        # A single indexer keeps bulk requests to each backend in order
+        index_threads = start_stage('index', index, index_queue, None, 1,
+                                    on_error=lambda item: record_failure(item, item.get('stage', 'chunked')))
+
+        finish_stage(download_threads, transcribe_queue)
+        finish_stage(transcribe_threads, index_queue)
+        finish_stage(index_threads, None)
+    finally:
+        for session in sessions.values():
+            session.close()
+        embedder.close()
+
+    logger.info("\nPipeline Summary:")
+    logger.info(f"Made searchable: {len(results['searchable'])} episodes "
+                f"in {time.monotonic() - start_time:.0f}s")
+    if results['failed']:
+        logger.info(f"Failed ({len(results['failed'])} episodes):")
+        for basename, stage in results['failed']:
+            logger.info(f" - {basename} ({stage})")
+        logger.info("You can run the script again to retry failed episodes.")
+    logger.info(embedder.report())
+    return results
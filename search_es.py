@@ -2,13 +2,15 @@
 # Note: This file doesn't need PostgreSQL modifications as it gets all its data
 # from the Elasticsearch index, which is populated by index_es.py
 # Updated to use title as primary identifier instead of episode number
+# Updated to read episode metadata from the episodes index; line documents
+# only carry an episode_id
 
 from elasticsearch import Elasticsearch
 import re
 import sys
 import os
 from dotenv import load_dotenv
-from frontend.app.config.app_settings import ELASTICSEARCH_INDEX
+from frontend.app.config.app_settings import ELASTICSEARCH_INDEX, ELASTICSEARCH_EPISODES_INDEX
 
 # Load environment variables
 load_dotenv('.env')
@@ -40,29 +42,19 @@ def search(query, field="text", index_name=ELASTICSEARCH_INDEX):
     print(f"Searching in field(s): {field}")
     print(f"Query: {query}\n")
 
-    # Define the query based on the specified field
-    if field == "title":
-        es_query = {
-            "query": {
-                "match": {
-                    "title": {
-                        "query": query,
-                        "operator": "and"
-                    }
-                }
-            }
-        }
-    elif field == "description":
-        es_query = {
-            "query": {
-                "match": {
-                    "description": {
-                        "query": query,
-                        "operator": "and"
-                    }
-                }
-            }
-        }
+    # Define the query based on the specified field. Title and description
+    # are stored once per episode, so they are matched in the episodes index
+    # and select every line of the matching episodes
+    def matching_episodes(fields):
+        response = es.search(index=ELASTICSEARCH_EPISODES_INDEX, body={
+            "query": {"multi_match": {"query": query, "fields": fields, "operator": "and"}},
+            "_source": False,
+            "size": 10000
+        })
+        return {"terms": {"episode_id": [hit['_id'] for hit in response['hits']['hits']]}}
+
+    if field in ("title", "description"):
+        es_query = {"query": matching_episodes([field])}
     elif field == "text":
         es_query = {
             "query": {
@@ -78,11 +70,11 @@ def search(query, field="text", index_name=ELASTICSEARCH_INDEX):
         # Multi-field search with boosts
         es_query = {
             "query": {
-                "multi_match": {
-                    "query": query,
-                    "fields": ["title^3", "description^2", "text"],
-                    "type": "best_fields",
-                    "operator": "and"
+                "bool": {
+                    "should": [
+                        {"match": {"text": {"query": query, "operator": "and"}}},
+                        {"constant_score": {"filter": matching_episodes(["title^3", "description^2"]), "boost": 3}}
+                    ]
                 }
             }
         }
@@ -102,24 +94,33 @@ def search(query, field="text", index_name=ELASTICSEARCH_INDEX):
         print("No results found")
         return {}
 
+    # Fetch the metadata of every episode in the results at once. Lines of
+    # generations built before the episodes index carry it themselves.
+    episode_ids = list({hit['_source']['episode_id'] for hit in hits if 'episode_id' in hit['_source']})
+    episodes = {}
+    if episode_ids:
+        response = es.mget(index=ELASTICSEARCH_EPISODES_INDEX, ids=episode_ids)
+        episodes = {doc['_id']: doc['_source'] for doc in response['docs'] if doc.get('found')}
+
     # Format results
     results_dict = {}
     
     for hit in hits:
         source = hit['_source']
-        title = source['title']  # Using title as identifier
+        episode = episodes.get(source.get('episode_id'), source)
+        title = episode.get('title', source.get('episode_id', ''))  # Using title as identifier
         
         if title in results_dict:
             results_dict[title]['lines'].append(
-                (source.get('line_index', ''), source.get('timecode', ''), source.get(field, ''))
+                (source.get('line_index', ''), source.get('timecode', ''), source.get('text', ''))
             )
         else:
             results_dict[title] = {
-                'filename': source.get('filename', ''),
+                'filename': episode.get('filename', ''),
                 'title': title,
                 'date': source.get('date', ''),
-                'url': source.get('url', ''),
-                'lines': [(source.get('line_index', ''), source.get('timecode', ''), source.get(field, ''))]
+                'url': episode.get('url', ''),
+                'lines': [(source.get('line_index', ''), source.get('timecode', ''), source.get('text', ''))]
             }
     
     return results_dict
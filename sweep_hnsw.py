@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+# Sweep Chroma HNSW parameters on a sample of the semantic collection.
+# For every combination of M, construction_ef and search_ef a scratch
+# collection is built from the sampled embeddings (nothing is re-embedded)
+# and queried with held-out vectors. Each row reports recall@k against
+# exact brute-force search, p50/p95 query latency and build time, to
+# choose the HNSW_* values in config.py.
+#
+#   python sweep_hnsw.py --sample 5000 --m 8,16,32 --search-ef 10,50,100
+
+import time
+import argparse
+import itertools
+import numpy as np
+from index_chroma import create_chroma_client
+from config import HNSW_SPACE, HNSW_M, HNSW_CONSTRUCTION_EF, HNSW_SEARCH_EF
+from frontend.app.config.app_settings import SEMANTIC_COLLECTION
+
+def int_list(value):
+    return [int(v) for v in value.split(',')]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Measure recall and latency of Chroma HNSW settings')
+    parser.add_argument('--collection', default=SEMANTIC_COLLECTION,
+                      help=f'Collection to sample embeddings from (default: {SEMANTIC_COLLECTION})')
+    parser.add_argument('--sample', type=int, default=5000,
+                      help='Number of embeddings to index in each scratch collection (default: 5000)')
+    parser.add_argument('--queries', type=int, default=200,
+                      help='Number of held-out embeddings used as queries (default: 200)')
+    parser.add_argument('-k', type=int, default=10,
+                      help='Results per query for recall@k (default: 10)')
+    parser.add_argument('--m', type=int_list, default=[8, HNSW_M, 32],
+                      help=f'Comma-separated HNSW M values (default: 8,{HNSW_M},32)')
+    parser.add_argument('--construction-ef', type=int_list, default=[HNSW_CONSTRUCTION_EF, 200],
+                      help=f'Comma-separated construction_ef values (default: {HNSW_CONSTRUCTION_EF},200)')
+    parser.add_argument('--search-ef', type=int_list, default=[10, 50, HNSW_SEARCH_EF],
+                      help=f'Comma-separated search_ef values (default: 10,50,{HNSW_SEARCH_EF})')
+    parser.add_argument('--space', default=HNSW_SPACE, choices=['cosine', 'l2', 'ip'],
+                      help=f'Distance metric (default: {HNSW_SPACE})')
+    return parser.parse_args()
+
+def load_sample(collection, n, seed=0):
+    """Fetch up to n (id, embedding) pairs from a collection, chosen at random."""
+    total = collection.count()
+    rng = np.random.default_rng(seed)
+    offsets = np.sort(rng.choice(total, size=min(n, total), replace=False))
+    ids = []
+    embeddings = []
+    # Fetch in pages and keep the sampled offsets in each one
+    page_size = 5000
+    for start in range(0, total, page_size):
+        wanted = offsets[(offsets >= start) & (offsets < start + page_size)] - start
+        if not len(wanted):
+            continue
+        page = collection.get(include=['embeddings'], limit=page_size, offset=start)
+        for i in wanted.tolist():
+            ids.append(page['ids'][i])
+            embeddings.append(page['embeddings'][i])
+    return ids, np.asarray(embeddings, dtype=np.float32)
+
+def exact_neighbours(data, queries, k, space):
+    """Brute-force top-k indices into data for each query."""
+    if space == 'cosine':
+        data = data / np.linalg.norm(data, axis=1, keepdims=True)
+        queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+        scores = queries @ data.T
+    elif space == 'ip':
+        scores = queries @ data.T
+    else:
+        scores = -((queries ** 2).sum(1)[:, None] - 2 * queries @ data.T + (data ** 2).sum(1)[None, :])
+    return np.argsort(-scores, axis=1)[:, :k]
+
+def run_setting(client, ids, data, queries, truth, k, space, m, construction_ef, search_ef):
+    name = f"hnsw_sweep_{m}_{construction_ef}_{search_ef}"
+    try:
+        client.delete_collection(name=name)
+    except Exception:
+        pass
+    collection = client.create_collection(name=name, metadata={
+        "hnsw:space": space,
+        "hnsw:M": m,
+        "hnsw:construction_ef": construction_ef,
+        "hnsw:search_ef": search_ef,
+    })
+    try:
+        start_time = time.perf_counter()
+        for i in range(0, len(ids), 1000):
+            collection.add(ids=ids[i:i + 1000], embeddings=data[i:i + 1000].tolist())
+        build_seconds = time.perf_counter() - start_time
+
+        positions = {chunk_id: i for i, chunk_id in enumerate(ids)}
+        latencies = []
+        hits = 0
+        for query, expected in zip(queries, truth):
+            start_time = time.perf_counter()
+            result = collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])
+            latencies.append(time.perf_counter() - start_time)
+            found = {positions[chunk_id] for chunk_id in result['ids'][0]}
+            hits += len(found & set(expected.tolist()))
+    finally:
+        client.delete_collection(name=name)
+
+    latencies = np.array(latencies) * 1000
+    return hits / (len(queries) * k), np.percentile(latencies, 50), np.percentile(latencies, 95), build_seconds
+
+def main():
+    args = parse_args()
+    client = create_chroma_client()
+    source = client.get_collection(name=args.collection)
+
+    print(f"Sampling {args.sample + args.queries} embeddings from {args.collection}...")
+    ids, embeddings = load_sample(source, args.sample + args.queries)
+    if len(ids) <= args.queries:
+        print("Not enough embeddings in the collection for this sample size.")
+        return
+    # Hold the queries out of the indexed data so no query finds itself
+    queries = embeddings[:args.queries]
+    ids, data = ids[args.queries:], embeddings[args.queries:]
+    truth = exact_neighbours(data, queries, args.k, args.space)
+
+    print(f"Indexing {len(ids)} vectors, {len(queries)} queries, recall@{args.k}, space={args.space}\n")
+    print(f"{'M':>4} {'constr_ef':>10} {'search_ef':>10} {'recall':>8} {'p50 ms':>8} {'p95 ms':>8} {'build s':>8}")
+    for m, construction_ef, search_ef in itertools.product(args.m, args.construction_ef, args.search_ef):
+        recall, p50, p95, build_seconds = run_setting(client, ids, data, queries, truth, args.k, args.space,
+                                                      m, construction_ef, search_ef)
+        print(f"{m:>4} {construction_ef:>10} {search_ef:>10} {recall:>8.3f} {p50:>8.2f} {p95:>8.2f} {build_seconds:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import random
+from datetime import timedelta
+
+import numpy as np
+import pytest
+import srt
+
+from chunk_transcripts import merge_subtitle_lines, merge_subtitle_columns
+from fast_srt import parse_srt_columns
+
+WORDS = ['the', 'podcast', 'episode', 'history', 'Rome', 'café', 'naïve', 'war', 'and', 'empire']
+ENDINGS = ['', '', '', '.', '!', '?', ',', '. ', '?  ']
+
+def random_transcript(rng, n):
+    subtitles = []
+    start = 0
+    for index in range(1, n + 1):
+        start += rng.choice([0, 100, 500, 1500, 2500, 4500])
+        end = start + rng.randint(500, 6000)
+        words = [rng.choice(WORDS) for _ in range(rng.randint(1, 25))]
+        content = ' '.join(words) + rng.choice(ENDINGS)
+        subtitles.append(srt.Subtitle(index, timedelta(milliseconds=start), timedelta(milliseconds=end), content))
+        start = end
+    return srt.compose(subtitles, reindex=False)
+
+@pytest.mark.parametrize('seed', range(30))
+def test_columns_match_subtitle_lines(seed):
+    rng = random.Random(seed)
+    content = random_transcript(rng, rng.randint(1, 400))
+    target, maximum = rng.choice([(500, 800), (100, 150), (50, 60), (2000, 4000)])
+    expected = merge_subtitle_lines(list(srt.parse(content)), target, maximum)
+    actual = merge_subtitle_columns(parse_srt_columns(content), target, maximum)
+    assert actual == expected
+
+def test_ascii_transcript_with_trailing_whitespace():
+    content = random_transcript(random.Random(99), 200).replace('café', 'cafe').replace('naïve', 'naive')
+    assert content.isascii()
+    subtitles = list(srt.parse(content))
+    assert merge_subtitle_columns(parse_srt_columns(content)) == merge_subtitle_lines(subtitles)
+
+def chunk_ranges(transcript, chunks):
+    """Map each chunk back to the (first, last) subtitles it covers."""
+    starts = transcript.start_ms.tolist()
+    ends = transcript.end_ms.tolist()
+    return [(starts.index(round(chunk['start_time'].total_seconds() * 1000)),
+             ends.index(round(chunk['end_time'].total_seconds() * 1000)))
+            for chunk in chunks]
+
+@pytest.mark.parametrize('seed', range(20))
+def test_token_chunks_with_overlap(seed):
+    rng = random.Random(seed)
+    transcript = parse_srt_columns(random_transcript(rng, rng.randint(1, 300)))
+    # Word counts stand in for the tokenizer's counts
+    sizes = [len(text.split()) for text in transcript.contents()]
+    target, maximum, overlap = rng.choice([(160, 238, 32), (40, 60, 10), (20, 30, 25)])
+    chunks = merge_subtitle_columns(transcript, target, maximum, sizes=sizes, hard_max=True, overlap=overlap)
+    ranges = chunk_ranges(transcript, chunks)
+
+    # Every subtitle is covered, in order, with no gaps
+    assert ranges[0][0] == 0
+    assert ranges[-1][1] == len(transcript) - 1
+    for (first, last), (next_first, next_last) in zip(ranges, ranges[1:]):
+        assert first < next_first <= last + 1
+        assert next_last > last
+        # The repeated tail of the previous chunk fits in the overlap
+        assert sum(sizes[next_first:last + 1]) <= overlap
+    for chunk, (first, last) in zip(chunks, ranges):
+        # Only a single subtitle bigger than the limit may exceed it
+        assert sum(sizes[first:last + 1]) <= maximum or first == last
+        assert chunk['text'] == ' '.join(transcript.contents()[first:last + 1])
+
+def test_tokens_strategy(monkeypatch):
+    import chunk_transcripts
+
+    monkeypatch.setattr(chunk_transcripts, 'count_tokens',
+                        lambda texts: np.array([len(text.split()) for text in texts]))
+    transcript = parse_srt_columns(random_transcript(random.Random(7), 400))
+    sizes = [len(text.split()) for text in transcript.contents()]
+    chunks = chunk_transcripts.chunk_by_tokens(transcript)
+    limit = chunk_transcripts.max_tokens - chunk_transcripts.SPECIAL_TOKENS
+    for first, last in chunk_ranges(transcript, chunks):
+        assert sum(sizes[first:last + 1]) <= limit
+    assert len(chunks) > 1
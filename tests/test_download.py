@@ -0,0 +1,156 @@
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from libPodSemSearch import create_host_session, download_file
+
+AUDIO = bytes(range(256)) * 400
+
+class AudioHandler(BaseHTTPRequestHandler):
+    audio = AUDIO
+    etag = '"v1"'
+    honour_range = True
+    # Answer every Range request from the start of the file, as 206
+    misreport_range = False
+    requests_seen = []
+    if_ranges_seen = []
+
+    def do_GET(self):
+        range_header = self.headers.get('Range')
+        type(self).requests_seen.append(range_header)
+        type(self).if_ranges_seen.append(self.headers.get('If-Range'))
+        if_range = self.headers.get('If-Range')
+        match = re.match(r'bytes=(\d+)-$', range_header or '')
+        if match and self.honour_range and if_range in (None, self.etag):
+            start = 0 if self.misreport_range else int(match.group(1))
+            if start >= len(self.audio):
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{len(self.audio)}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            body = self.audio[start:]
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{len(self.audio) - 1}/{len(self.audio)}')
+        else:
+            body = self.audio
+            self.send_response(200)
+        self.send_header('ETag', self.etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    AudioHandler.audio = AUDIO
+    AudioHandler.etag = '"v1"'
+    AudioHandler.honour_range = True
+    AudioHandler.misreport_range = False
+    AudioHandler.requests_seen = []
+    AudioHandler.if_ranges_seen = []
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), AudioHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/episode.mp3"
+    httpd.shutdown()
+    httpd.server_close()
+
+def test_fresh_download(server, tmp_path):
+    audio_path = tmp_path / 'episode.mp3'
+    written = download_file(create_host_session(1), server, str(audio_path), chunk_size=4096)
+    assert written == len(AUDIO)
+    assert audio_path.read_bytes() == AUDIO
+    assert not (tmp_path / 'episode.mp3.part').exists()
+    assert not (tmp_path / 'episode.mp3.part.validator').exists()
+    assert AudioHandler.requests_seen == [None]
+
+def test_resume_from_part_file(server, tmp_path):
+    audio_path = tmp_path / 'episode.mp3'
+    (tmp_path / 'episode.mp3.part').write_bytes(AUDIO[:30000])
+    written = download_file(create_host_session(1), server, str(audio_path), chunk_size=4096)
+    assert written == len(AUDIO) - 30000
+    assert audio_path.read_bytes() == AUDIO
+    assert AudioHandler.requests_seen == ['bytes=30000-']
+
+def test_server_ignoring_range_restarts(server, tmp_path):
+    AudioHandler.honour_range = False
+    audio_path = tmp_path / 'episode.mp3'
+    (tmp_path / 'episode.mp3.part').write_bytes(b'stale' * 100)
+    written = download_file(create_host_session(1), server, str(audio_path), chunk_size=4096)
+    assert written == len(AUDIO)
+    assert audio_path.read_bytes() == AUDIO
+
+def test_complete_part_file_is_finished_on_416(server, tmp_path):
+    audio_path = tmp_path / 'episode.mp3'
+    (tmp_path / 'episode.mp3.part').write_bytes(AUDIO)
+    assert download_file(create_host_session(1), server, str(audio_path)) == 0
+    assert audio_path.read_bytes() == AUDIO
+
+def test_oversized_part_file_is_discarded(server, tmp_path):
+    audio_path = tmp_path / 'episode.mp3'
+    (tmp_path / 'episode.mp3.part').write_bytes(AUDIO + b'extra')
+    assert download_file(create_host_session(1), server, str(audio_path)) == len(AUDIO)
+    assert audio_path.read_bytes() == AUDIO
+    assert AudioHandler.requests_seen == [f'bytes={len(AUDIO) + 5}-', None]
+
+class InterruptedSession:
+    """Session whose first response body stops after `limit` bytes."""
+
+    def __init__(self, limit):
+        self.session = create_host_session(1)
+        self.limit = limit
+
+    def get(self, url, **kwargs):
+        response = self.session.get(url, **kwargs)
+        if self.limit is not None:
+            limit, self.limit = self.limit, None
+            chunks = response.iter_content
+
+            def iter_content(chunk_size=1):
+                sent = 0
+                for data in chunks(chunk_size=chunk_size):
+                    yield data[:limit - sent]
+                    sent += len(data)
+                    if sent >= limit:
+                        raise ConnectionError("connection reset")
+
+            response.iter_content = iter_content
+        return response
+
+def test_resume_sends_if_range(server, tmp_path):
+    audio_path = tmp_path / 'episode.mp3'
+    session = InterruptedSession(limit=20000)
+    with pytest.raises(ConnectionError):
+        download_file(session, server, str(audio_path), chunk_size=4096)
+    assert (tmp_path / 'episode.mp3.part.validator').read_text() == '"v1"'
+    partial = (tmp_path / 'episode.mp3.part').stat().st_size
+    assert 0 < partial < len(AUDIO)
+    download_file(session, server, str(audio_path), chunk_size=4096)
+    assert audio_path.read_bytes() == AUDIO
+    assert AudioHandler.requests_seen == [None, f'bytes={partial}-']
+    assert AudioHandler.if_ranges_seen == [None, '"v1"']
+
+def test_changed_file_is_fetched_whole(server, tmp_path):
+    audio_path = tmp_path / 'episode.mp3'
+    (tmp_path / 'episode.mp3.part').write_bytes(AUDIO[:30000])
+    (tmp_path / 'episode.mp3.part.validator').write_text('"v1"')
+    AudioHandler.audio = bytes(reversed(AUDIO))
+    AudioHandler.etag = '"v2"'
+    written = download_file(create_host_session(1), server, str(audio_path), chunk_size=4096)
+    assert written == len(AUDIO)
+    assert audio_path.read_bytes() == bytes(reversed(AUDIO))
+    assert AudioHandler.if_ranges_seen == ['"v1"']
+
+def test_mismatched_content_range_restarts(server, tmp_path):
+    AudioHandler.misreport_range = True
+    audio_path = tmp_path / 'episode.mp3'
+    (tmp_path / 'episode.mp3.part').write_bytes(AUDIO[:30000])
+    written = download_file(create_host_session(1), server, str(audio_path), chunk_size=4096)
+    assert written == len(AUDIO)
+    assert audio_path.read_bytes() == AUDIO
+    assert AudioHandler.requests_seen == ['bytes=30000-', None]
@@ -0,0 +1,10 @@
+import os
+
+from embedding_cache import THREAD_LIMIT_VARS, limit_threads
+
+
+def test_limit_threads_sets_environment(monkeypatch):
+    for var in THREAD_LIMIT_VARS:
+        monkeypatch.setenv(var, '16')
+    limit_threads(3)
+    assert {var: os.environ[var] for var in THREAD_LIMIT_VARS} == {var: '3' for var in THREAD_LIMIT_VARS}
@@ -0,0 +1,26 @@
+import logging
+import time
+
+import libPodSemSearch
+from libPodSemSearch import consolidate_feeds
+
+def test_time_saved_by_conditional_requests(monkeypatch, caplog):
+    def fetch_feed(feed_url, validators=None):
+        if validators:
+            return 304, validators, None
+        time.sleep(0.2)
+        return 200, {'etag': f'"{feed_url}"', 'modified': None}, {}
+
+    monkeypatch.setattr(libPodSemSearch, 'fetch_feed', fetch_feed)
+    feeds = ['https://example.com/a.xml', 'https://example.com/b.xml']
+    _, feed_state = consolidate_feeds(feeds)
+    assert all(feed_state[url]['fetch_seconds'] >= 0.2 for url in feeds)
+
+    # The second run only gets 304s and saves roughly the earlier fetch times
+    monkeypatch.setattr(libPodSemSearch, 'load_feed_state', lambda state_file: feed_state)
+    with caplog.at_level(logging.INFO, logger='tscript_logger'):
+        consolidate_feeds(feeds, state_file='feed_state.json')
+    message = next(record.message for record in caplog.records if 'conditional requests saved' in record.message)
+    assert message.startswith('2 feeds not modified')
+    saved = float(message.split('about ')[1].split('s ')[0])
+    assert 0.3 <= saved <= 0.5
@@ -0,0 +1,48 @@
+import queue
+
+from pipeline import _DONE, build_work_items, finish_stage, start_stage
+
+def record(title):
+    return (title, '', f'https://example.com/{title}.mp3', '')
+
+def test_new_episodes_go_first_then_newest_backlog():
+    records = {
+        '20200101_old.srt': record('old'),
+        '20230101_middle.srt': record('middle'),
+        '20240101_recent.srt': record('recent'),
+    }
+    episode_dict = {'new': {'filename': '20240601_new.srt', 'url': 'https://example.com/new.mp3', 'title': 'new'}}
+    items = build_work_items(episode_dict, {}, records)
+    assert [item['basename'] for item in items] == [
+        '20240601_new', '20240101_recent', '20230101_middle', '20200101_old']
+
+def test_searchable_episodes_are_skipped():
+    records = {'20200101_old.srt': record('old'), '20210101_half.srt': record('half')}
+    state = {
+        '20200101_old': {'transcribed': 'done', 'es_indexed': 'done', 'chroma_indexed': 'done'},
+        '20210101_half': {'transcribed': 'done', 'es_indexed': 'done'},
+    }
+    items = build_work_items({}, state, records)
+    assert [item['basename'] for item in items] == ['20210101_half']
+    assert not items[0]['needs_download'] and not items[0]['needs_transcribe']
+
+def test_stage_exceptions_are_reported():
+    in_queue = queue.Queue()
+    out_queue = queue.Queue()
+    for basename in ('a', 'b', 'c'):
+        in_queue.put({'basename': basename})
+    in_queue.put(_DONE)
+    failed = []
+
+    def work(item):
+        if item['basename'] == 'b':
+            raise ConnectionError("Elasticsearch is down")
+        return item
+
+    threads = start_stage('index', work, in_queue, out_queue, 2, on_error=lambda item: failed.append(item['basename']))
+    finish_stage(threads, out_queue)
+    forwarded = []
+    while (item := out_queue.get()) is not _DONE:
+        forwarded.append(item['basename'])
+    assert failed == ['b']
+    assert sorted(forwarded) == ['a', 'c']
@@ -0,0 +1,89 @@
+from contextlib import contextmanager
+
+import pytest
+
+import config
+import libPodSemSearch
+from libPodSemSearch import get_pending_downloads, mark_stages
+
+class FakeStateTable:
+    """In-memory stand-in for the pipeline_state table."""
+
+    def __init__(self):
+        self.rows = {}
+        self.result = []
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=None):
+        if 'SELECT 1 FROM pipeline_state' in sql:
+            self.result = [(1,)] if any(stage in ('downloaded', 'transcribed')
+                                        for _, stage in self.rows) else []
+        elif 'SELECT basename, stage, status' in sql:
+            self.result = [(basename, stage, status) for (basename, stage), status in self.rows.items()]
+        else:
+            self.result = []
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def fetchall(self):
+        return self.result
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def state_table(monkeypatch, tmp_path):
+    table = FakeStateTable()
+
+    @contextmanager
+    def db_connection():
+        yield table
+
+    def execute_values(cursor, sql, rows, page_size=None):
+        for basename, stage, status, content_hash, seconds in rows:
+            table.rows[(basename, stage)] = status
+
+    monkeypatch.setattr(libPodSemSearch, 'db_connection', db_connection)
+    monkeypatch.setattr(libPodSemSearch, 'execute_values', execute_values)
+    monkeypatch.setattr(libPodSemSearch, '_pipeline_state_ready', False)
+    audio_dir = tmp_path / 'audio'
+    tscript_dir = tmp_path / 'transcripts'
+    audio_dir.mkdir()
+    tscript_dir.mkdir()
+    monkeypatch.setattr(config, 'audio_dir', str(audio_dir))
+    monkeypatch.setattr(config, 'tscript_dir', str(tscript_dir))
+    return table, audio_dir, tscript_dir
+
+def test_indexer_marks_before_first_fetch(state_table, monkeypatch):
+    table, audio_dir, tscript_dir = state_table
+    records = {}
+    for name in ('20200101_old', '20210101_older'):
+        (tscript_dir / f"{name}.srt").write_text("1\n00:00:00,000 --> 00:00:01,000\nHello\n")
+        records[f"{name}.srt"] = (name, '', f'https://example.com/{name}.mp3', '')
+    (audio_dir / '20220101_pending.mp3').write_bytes(b'audio')
+    records['20220101_pending.srt'] = ('pending', '', 'https://example.com/pending.mp3', '')
+    monkeypatch.setattr(libPodSemSearch, 'get_episode_records', lambda filenames=None: records)
+
+    # An indexer run is the first thing to touch the state table
+    mark_stages([('20200101_old', None, None), ('20210101_older', None, None)], 'es_indexed')
+
+    assert table.rows[('20200101_old', 'transcribed')] == 'done'
+    assert table.rows[('20220101_pending', 'downloaded')] == 'done'
+    assert get_pending_downloads(str(audio_dir), str(tscript_dir)) == []
+
+def test_new_episodes_are_still_pending(state_table, monkeypatch):
+    table, audio_dir, tscript_dir = state_table
+    (tscript_dir / '20200101_old.srt').write_text("1\n00:00:00,000 --> 00:00:01,000\nHello\n")
+    records = {
+        '20200101_old.srt': ('old', '', 'https://example.com/old.mp3', ''),
+        '20240101_new.srt': ('new', '', 'https://example.com/new.mp3', ''),
+    }
+    monkeypatch.setattr(libPodSemSearch, 'get_episode_records', lambda filenames=None: records)
+    pending = get_pending_downloads(str(audio_dir), str(tscript_dir))
+    assert [episode['title'] for episode in pending] == ['new']
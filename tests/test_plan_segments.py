@@ -0,0 +1,32 @@
+from libPodSemSearch import plan_segments
+
+def check_contiguous(segments, duration):
+    assert segments[0][0] == 0.0
+    assert segments[-1][1] == duration
+    for (_, end), (start, _) in zip(segments, segments[1:]):
+        assert end == start
+
+def test_cuts_snap_to_nearby_silence():
+    segments = plan_segments(1800, [(590, 594), (1210, 1212)], segment_length=600, search_window=60)
+    assert segments == [(0.0, 592.0), (592.0, 1211.0), (1211.0, 1800)]
+
+def test_cut_falls_on_ideal_point_without_silence():
+    segments = plan_segments(1300, [], segment_length=600)
+    assert segments == [(0.0, 600), (600, 1300)]
+
+def test_short_episode_is_one_segment():
+    assert plan_segments(500, [(250, 251)], segment_length=600) == [(0.0, 500)]
+
+def test_short_segments_terminate():
+    # Segments no longer than the search window used to loop forever,
+    # picking the same silence again and again
+    segments = plan_segments(1000, [(99, 101)], segment_length=60)
+    check_contiguous(segments, 1000)
+    assert all(end - start >= 30 for start, end in segments[:-1])
+    assert 100.0 in [end for _, end in segments]
+
+def test_segments_with_many_silences():
+    silences = [(t, t + 0.5) for t in range(0, 3600, 7)]
+    segments = plan_segments(3600, silences, segment_length=45, search_window=60)
+    check_contiguous(segments, 3600)
+    assert all(end > start for start, end in segments)
@@ -0,0 +1,109 @@
+import threading
+import time
+
+import pytest
+
+import transcribe_worker
+
+class FakeQueue:
+    """In-memory stand-in for the transcription_jobs table."""
+
+    def __init__(self, basenames):
+        self.queued = [{'basename': name, 'audio_url': f'https://example.com/{name}.mp3', 'attempts': 1}
+                       for name in basenames]
+        self.completed = {}
+        self.failed = {}
+        self.renewals = 0
+        self.lease_held = True
+        self.lock = threading.Lock()
+
+    def claim(self, worker_id, lease_seconds, max_attempts):
+        with self.lock:
+            return self.queued.pop(0) if self.queued else None
+
+    def renew(self, basename, worker_id, lease_seconds):
+        self.renewals += 1
+        return self.lease_held
+
+    def complete(self, basename, worker_id, transcript):
+        self.completed[basename] = transcript
+        return True
+
+    def fail(self, basename, worker_id, error, max_attempts):
+        self.failed[basename] = error
+
+@pytest.fixture
+def fake_queue(monkeypatch):
+    fake = FakeQueue(['20240101_a', '20240102_b', '20240103_c'])
+    monkeypatch.setattr(transcribe_worker, 'claim_transcription_job', fake.claim)
+    monkeypatch.setattr(transcribe_worker, 'renew_transcription_lease', fake.renew)
+    monkeypatch.setattr(transcribe_worker, 'complete_transcription_job', fake.complete)
+    monkeypatch.setattr(transcribe_worker, 'fail_transcription_job', fake.fail)
+
+    def download(session, url, audio_path, **kwargs):
+        with open(audio_path, 'wb') as f:
+            f.write(url.encode())
+        return len(url)
+
+    monkeypatch.setattr(transcribe_worker, 'download_file', download)
+    return fake
+
+def transcribe_ok(audio_file, output_path, wav_path):
+    with open(audio_file) as audio, open(output_path, 'w') as f:
+        f.write(f"1\n00:00:00,000 --> 00:00:01,000\n{audio.read()}\n")
+    return True
+
+def test_worker_drains_the_queue(fake_queue, monkeypatch):
+    monkeypatch.setattr(transcribe_worker, 'get_transcribe_fn', lambda **settings: transcribe_ok)
+    assert transcribe_worker.run_worker(exit_when_empty=True) == 3
+    assert sorted(fake_queue.completed) == ['20240101_a', '20240102_b', '20240103_c']
+    assert 'https://example.com/20240102_b.mp3' in fake_queue.completed['20240102_b']
+    assert fake_queue.failed == {}
+
+def test_failed_transcription_is_reported(fake_queue, monkeypatch):
+    def transcribe(audio_file, output_path, wav_path):
+        return 'b.mp3' not in open(audio_file).read() and transcribe_ok(audio_file, output_path, wav_path)
+
+    monkeypatch.setattr(transcribe_worker, 'get_transcribe_fn', lambda **settings: transcribe)
+    assert transcribe_worker.run_worker(exit_when_empty=True) == 2
+    assert list(fake_queue.failed) == ['20240102_b']
+    assert '20240102_b' not in fake_queue.completed
+
+def test_lost_lease_discards_the_result(fake_queue, monkeypatch):
+    monkeypatch.setattr(transcribe_worker, 'WORK_QUEUE_LEASE_SECONDS', 0.03)
+    fake_queue.lease_held = False
+
+    def slow_transcribe(audio_file, output_path, wav_path):
+        # Outlast a few lease renewals
+        time.sleep(0.1)
+        return transcribe_ok(audio_file, output_path, wav_path)
+
+    job = fake_queue.claim('worker', 0, 0)
+    assert not transcribe_worker.process_job(job, 'worker', slow_transcribe, session=None)
+    assert fake_queue.renewals >= 1
+    assert fake_queue.completed == {}
+
+def test_claim_errors_do_not_stop_the_worker(fake_queue, monkeypatch):
+    claim = fake_queue.claim
+    errors = ['server closed the connection unexpectedly']
+
+    def flaky_claim(*args):
+        if errors:
+            raise ConnectionError(errors.pop())
+        return claim(*args)
+
+    monkeypatch.setattr(transcribe_worker, 'claim_transcription_job', flaky_claim)
+    monkeypatch.setattr(transcribe_worker, 'WORK_QUEUE_POLL_SECONDS', 0)
+    monkeypatch.setattr(transcribe_worker, 'get_transcribe_fn', lambda **settings: transcribe_ok)
+    assert transcribe_worker.run_worker(exit_when_empty=True) == 3
+
+def test_server_settings_are_passed_explicitly(fake_queue, monkeypatch):
+    seen = []
+
+    def get_transcribe_fn(**settings):
+        seen.append(settings)
+        return transcribe_ok
+
+    monkeypatch.setattr(transcribe_worker, 'get_transcribe_fn', get_transcribe_fn)
+    transcribe_worker.run_worker(True, True, 'http://gpu-box:8080')
+    assert seen == [{'server_enabled': True, 'server_url': 'http://gpu-box:8080'}]
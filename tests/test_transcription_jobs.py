@@ -0,0 +1,100 @@
+import threading
+import time
+
+import pytest
+
+import libPodSemSearch
+from libPodSemSearch import run_transcription_jobs
+
+@pytest.fixture(autouse=True)
+def no_ffprobe(monkeypatch):
+    monkeypatch.setattr(libPodSemSearch, 'get_audio_duration', lambda audio_file: 60.0)
+
+def make_jobs(tmp_path, count):
+    jobs = []
+    for i in range(count):
+        audio_file = tmp_path / f"episode{i}.mp3"
+        audio_file.write_bytes(b'audio')
+        jobs.append({
+            'audio_file': str(audio_file),
+            'output_path': str(tmp_path / f"episode{i}.srt"),
+            'wav_path': str(tmp_path / f"episode{i}.wav"),
+        })
+    return jobs
+
+def write_transcript(output_path):
+    with open(output_path, 'w') as f:
+        f.write("1\n00:00:00,000 --> 00:00:01,000\nHello\n")
+
+def test_successful_jobs_are_cleaned_up(tmp_path):
+    jobs = make_jobs(tmp_path, 3)
+    completed = []
+
+    def transcribe(audio_file, output_path, wav_path):
+        write_transcript(output_path)
+        return True
+
+    successful, failed, stats = run_transcription_jobs(
+        jobs, transcribe, workers=2, retry_delay=0,
+        on_complete=lambda job, success, seconds: completed.append((job['audio_file'], success)))
+    assert sorted(successful) == ['episode0.mp3', 'episode1.mp3', 'episode2.mp3']
+    assert failed == []
+    assert stats['audio_seconds'] == 180.0
+    assert all(success for _, success in completed) and len(completed) == 3
+    assert not list(tmp_path.glob('*.mp3'))
+    assert len(list(tmp_path.glob('*.srt'))) == 3
+
+def test_failures_are_retried(tmp_path):
+    jobs = make_jobs(tmp_path, 2)
+    attempts = {}
+    lock = threading.Lock()
+
+    def transcribe(audio_file, output_path, wav_path):
+        with lock:
+            attempts[audio_file] = attempts.get(audio_file, 0) + 1
+            attempt = attempts[audio_file]
+        if 'episode0' in audio_file and attempt < 2:
+            # An empty transcript counts as a failure and is removed
+            open(output_path, 'w').close()
+            return True
+        if 'episode1' in audio_file:
+            return False
+        write_transcript(output_path)
+        return True
+
+    successful, failed, _ = run_transcription_jobs(jobs, transcribe, workers=2, retries=2, retry_delay=0)
+    assert successful == ['episode0.mp3']
+    assert failed == ['episode1.mp3']
+    assert attempts == {jobs[0]['audio_file']: 2, jobs[1]['audio_file']: 3}
+    # Failed jobs keep their audio for the next run and leave no transcript
+    assert (tmp_path / 'episode1.mp3').exists()
+    assert not (tmp_path / 'episode1.srt').exists()
+
+def test_exceptions_count_as_failures(tmp_path):
+    jobs = make_jobs(tmp_path, 1)
+
+    def transcribe(audio_file, output_path, wav_path):
+        raise RuntimeError("whisper crashed")
+
+    successful, failed, _ = run_transcription_jobs(jobs, transcribe, retry_delay=0)
+    assert successful == [] and failed == ['episode0.mp3']
+
+def test_jobs_run_in_parallel(tmp_path):
+    jobs = make_jobs(tmp_path, 4)
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def transcribe(audio_file, output_path, wav_path):
+        with lock:
+            running.append(audio_file)
+            peak.append(len(running))
+        time.sleep(0.1)
+        with lock:
+            running.remove(audio_file)
+        write_transcript(output_path)
+        return True
+
+    successful, _, _ = run_transcription_jobs(jobs, transcribe, workers=4, retry_delay=0)
+    assert len(successful) == 4
+    assert max(peak) > 1
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+# Transcription worker for the Postgres-backed job queue. Run this on any
+# machine that can reach the database: it claims a queued episode, downloads
+# the audio from the episode URL, transcribes it with the configured backend
+# and stores the SRT back in the queue. fetchtoTscript.py --distributed
+# queues the jobs and collects the finished transcripts.
+
+import os
+import argparse
+import socket
+import tempfile
+import threading
+import time
+import multiprocessing
+from urllib.parse import urlparse
+
+from libPodSemSearch import (
+    logger,
+    create_host_session,
+    download_file,
+    get_transcribe_fn,
+    verify_transcript,
+    claim_transcription_job,
+    renew_transcription_lease,
+    complete_transcription_job,
+    fail_transcription_job,
+    setup_work_queue,
+    close_db_pool,
+)
+from config import (
+    DOWNLOAD_CHUNK_SIZE,
+    DOWNLOAD_TIMEOUT,
+    WORK_QUEUE_LEASE_SECONDS,
+    WORK_QUEUE_MAX_ATTEMPTS,
+    WORK_QUEUE_POLL_SECONDS,
+)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Transcribe episodes from the shared Postgres job queue')
+    parser.add_argument('--processes', type=int, default=1,
+                      help='Number of worker processes to run on this machine (default: 1)')
+    parser.add_argument('--exit-when-empty', action='store_true',
+                      help='Exit once no jobs are available instead of polling')
+    parser.add_argument('--server', action='store_true',
+                      help='Use remote transcription server instead of local transcription')
+    parser.add_argument('--server-url', type=str,
+                      help='URL of the transcription server')
+    return parser.parse_args()
+
+def keep_lease(basename, worker_id, stop_event, lost_event):
+    """Renew the job's lease until stop_event is set, flagging lost_event if it is taken away."""
+    while not stop_event.wait(WORK_QUEUE_LEASE_SECONDS / 3):
+        try:
+            if not renew_transcription_lease(basename, worker_id, WORK_QUEUE_LEASE_SECONDS):
+                logger.error(f"Lost the lease on {basename}")
+                lost_event.set()
+                return
+        except Exception as e:
+            logger.error(f"Error renewing lease on {basename}: {str(e)}")
+
+def process_job(job, worker_id, transcribe_fn, session):
+    """Download, transcribe and store one claimed job."""
+    basename = job['basename']
+    stop_event = threading.Event()
+    lost_event = threading.Event()
+    heartbeat = threading.Thread(target=keep_lease, args=(basename, worker_id, stop_event, lost_event), daemon=True)
+    heartbeat.start()
+
+    try:
+        with tempfile.TemporaryDirectory(prefix='transcribe_') as work_dir:
+            extension = os.path.splitext(urlparse(job['audio_url']).path)[1] or '.mp3'
+            audio_path = os.path.join(work_dir, f"audio{extension}")
+            output_path = os.path.join(work_dir, 'audio.srt')
+            wav_path = os.path.join(work_dir, 'audio.wav')
+
+            download_file(session, job['audio_url'], audio_path,
+                          chunk_size=DOWNLOAD_CHUNK_SIZE, timeout=DOWNLOAD_TIMEOUT)
+            if not transcribe_fn(audio_path, output_path, wav_path) or not verify_transcript(output_path):
+                raise RuntimeError("Transcription produced no output")
+            if lost_event.is_set():
+                return False
+
+            with open(output_path, 'r', encoding='utf-8') as f:
+                transcript = f.read()
+        return complete_transcription_job(basename, worker_id, transcript)
+    except Exception as e:
+        logger.error(f"Failed to transcribe {basename}: {str(e)}")
+        fail_transcription_job(basename, worker_id, str(e), WORK_QUEUE_MAX_ATTEMPTS)
+        return False
+    finally:
+        stop_event.set()
+        heartbeat.join()
+
+def run_worker(exit_when_empty=False, server=None, server_url=None):
+    """
+    Claim and process jobs until the queue is empty (or forever).
+
+    server and server_url select the transcription backend as in
+    get_transcribe_fn. They are passed in rather than set on config so they
+    reach worker processes however those are started.
+    """
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    transcribe_fn = get_transcribe_fn(server_enabled=server, server_url=server_url)
+    session = create_host_session(1)
+    completed = 0
+    start_time = time.monotonic()
+
+    try:
+        while True:
+            try:
+                job = claim_transcription_job(worker_id, WORK_QUEUE_LEASE_SECONDS, WORK_QUEUE_MAX_ATTEMPTS)
+            except Exception as e:
+                # A database restart or network blip shouldn't end the worker
+                logger.error(f"{worker_id} could not claim a job: {str(e)}")
+                time.sleep(WORK_QUEUE_POLL_SECONDS)
+                continue
+            if job is None:
+                if exit_when_empty:
+                    break
+                time.sleep(WORK_QUEUE_POLL_SECONDS)
+                continue
+
+            logger.info(f"{worker_id} claimed {job['basename']} (attempt {job['attempts']})")
+            if process_job(job, worker_id, transcribe_fn, session):
+                completed += 1
+                logger.info(f"{worker_id} finished {job['basename']}")
+    finally:
+        session.close()
+
+    logger.info(f"{worker_id} transcribed {completed} episodes in {time.monotonic() - start_time:.0f}s")
+    return completed
+
+def main():
+    args = parse_args()
+    worker_args = (args.exit_when_empty, True if args.server else None, args.server_url)
+
+    setup_work_queue()
+
+    if args.processes <= 1:
+        run_worker(*worker_args)
+        return
+
+    # Each process gets its own connection pool and claims jobs independently;
+    # close ours first so children don't inherit its sockets
+    close_db_pool()
+    processes = [
+        multiprocessing.Process(target=run_worker, args=worker_args)
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+if __name__ == "__main__":
+    main()